@@ -0,0 +1,237 @@
+"""
+Помесячные партиции холодной истории
+Месяцы старше горизонта (SCM_ARCHIVE_HORIZON_MONTHS) выгружаются из таблиц
+внедрений, мер поддержки и закупок в сжатые файлы - каталог на месяц
+(Parquet/ZSTD через DuckDB, без него - CSV/gzip) - и удаляются из базы:
+таблицы и их индексы покрывают только горизонт. Сводные таблицы и
+kpi_monthly архивные месяцы сохраняют, поэтому итоги за всю историю не
+меняются; исходные строки архива читаются по запросу (read_period) только
+из файлов нужных месяцев
+
+Запуск: python archive.py [--horizon 24] [--query implementations --from 2023-01 --to 2023-06]
+"""
+
+import os
+import glob
+import logging
+import argparse
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from database import DB_PATH, ConnectionManager, drop_rollup_triggers, create_rollup_triggers, \
+    drop_kpi_triggers, create_kpi_triggers, bump_data_version
+from storage import apply_column_types, duckdb_columns
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_DIR = os.environ.get('SCM_ARCHIVE_DIR', 'scm_archive')
+# Горизонт в полных месяцах до текущего; по умолчанию покрывает максимальный период дашборда
+ARCHIVE_HORIZON_MONTHS = int(os.environ.get('SCM_ARCHIVE_HORIZON_MONTHS', 24))
+
+# Архивируемые таблицы: таблица -> (столбец даты, формат даты).
+# Даты ISO сравниваются по индексу диапазоном, даты 'ДД.ММ.ГГГГ' (закупки ЕИС) - по месяцу
+ARCHIVE_TABLES = {
+    'implementations': ('date_go_live', 'iso'),
+    'support_measures': ('approval_date', 'iso'),
+    'real_procurements': ('publication_date', 'dmy')
+}
+
+def _month_sql(table):
+    """Выражение месяца 'YYYY-MM' строки таблицы"""
+    column, date_format = ARCHIVE_TABLES[table]
+    if date_format == 'dmy':
+        return f"substr({column}, 7, 4) || '-' || substr({column}, 4, 2)"
+    return f'substr({column}, 1, 7)'
+
+def _month_condition(table, month):
+    """Условие отбора строк месяца и его параметры"""
+    column, date_format = ARCHIVE_TABLES[table]
+    if date_format == 'dmy':
+        return f'{_month_sql(table)} = ?', [month]
+    return f'{column} >= ? AND {column} < ?', [f'{month}-01', f'{np.datetime64(month, "M") + 1}-01']
+
+def archive_boundary(horizon_months=ARCHIVE_HORIZON_MONTHS, as_of=None):
+    """Первый месяц горизонта 'YYYY-MM': более ранние месяцы архивируются"""
+    current = np.datetime64(as_of or date.today().isoformat(), 'M')
+    return str(current - horizon_months)
+
+def _write_part(conn, table, frame, path):
+    """Запись части партиции в сжатый файл; возвращает путь файла"""
+    try:
+        import duckdb
+    except ImportError:
+        path += '.csv.gz'
+        frame.to_csv(path, index=False, compression='gzip')
+        return path
+    
+    path += '.parquet'
+    # Явные типы столбцов, как в выгрузке хранилища DuckDB: части одной таблицы не расходятся по схеме
+    select = ', '.join(f'CAST({name} AS {column_type}) AS {name}' for name, column_type in duckdb_columns(conn, table))
+    with duckdb.connect() as duck:
+        duck.register('archive_part', frame)
+        duck.execute(f"COPY (SELECT {select} FROM archive_part) TO '{path.replace(chr(39), chr(39) * 2)}' "
+                     f"(FORMAT PARQUET, COMPRESSION ZSTD)")
+    return path
+
+def cold_months(conn, table, boundary):
+    """Месяцы строк таблицы раньше boundary 'YYYY-MM' по возрастанию"""
+    column, date_format = ARCHIVE_TABLES[table]
+    if date_format == 'iso':
+        # Поиск месяцев по индексу даты
+        months = [month for month, in conn.execute(f'''
+            SELECT DISTINCT {_month_sql(table)} FROM {table}
+            WHERE {column} < ? AND {column} IS NOT NULL
+        ''', [f'{boundary}-01'])]
+    else:
+        months = [month for month, in conn.execute(f'''
+            SELECT DISTINCT {_month_sql(table)} FROM {table}
+            WHERE {column} GLOB '[0-9][0-9].[0-9][0-9].[0-9][0-9][0-9][0-9]*'
+        ''') if month < boundary]
+    return sorted(months)
+
+def archive_cold_partitions(conn, horizon_months=ARCHIVE_HORIZON_MONTHS, archive_dir=ARCHIVE_DIR, as_of=None):
+    """Выгрузка месяцев старше горизонта в архив и удаление их строк из базы
+    
+    Каждый месяц выгружается и удаляется в своей транзакции: файл пишется
+    до удаления строк, а прерванная выгрузка перезаписывает ту же часть при
+    следующем запуске. Строки, догруженные в уже архивный месяц, при
+    следующем запуске добавляются к его партиции новой частью. Триггеры
+    сводных таблиц и KPI на время удаления снимаются - архивные месяцы
+    остаются в rollup_* и kpi_monthly. Возвращает {таблица: строк в архиве}.
+    """
+    boundary = archive_boundary(horizon_months, as_of)
+    cold = {table: cold_months(conn, table, boundary) for table in ARCHIVE_TABLES}
+    archived = {}
+    # Триггеры снимаются, только если есть что выгружать: обычный запуск их не трогает
+    if not any(cold.values()):
+        return archived
+    
+    drop_rollup_triggers(conn)
+    drop_kpi_triggers(conn)
+    try:
+        for table, months in cold.items():
+            for month in months:
+                condition, params = _month_condition(table, month)
+                frame = pd.read_sql_query(f'SELECT * FROM {table} WHERE {condition}', conn, params=params)
+                if frame.empty:
+                    continue
+                
+                partition = os.path.join(archive_dir, table, month)
+                os.makedirs(partition, exist_ok=True)
+                parts = conn.execute(
+                    'SELECT parts FROM archive_partitions WHERE table_name = ? AND month = ?', (table, month)
+                ).fetchone()
+                parts = parts[0] if parts else 0
+                _write_part(conn, table, frame, os.path.join(partition, f'part-{parts:05d}'))
+                
+                conn.execute(f'DELETE FROM {table} WHERE {condition}', params)
+                conn.execute('''
+                    INSERT INTO archive_partitions (table_name, month, path, rows, parts)
+                    VALUES (?, ?, ?, ?, 1)
+                    ON CONFLICT (table_name, month) DO UPDATE SET
+                        rows = rows + excluded.rows, parts = parts + 1, archived_at = CURRENT_TIMESTAMP
+                ''', (table, month, partition, len(frame)))
+                conn.commit()
+                archived[table] = archived.get(table, 0) + len(frame)
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        # Если процесс прервется до этого места, триггеры восстановит database.create_schema
+        create_rollup_triggers(conn)
+        create_kpi_triggers(conn)
+        conn.commit()
+    
+    if archived:
+        bump_data_version(conn)
+        conn.commit()
+        logger.info(f"В архив до {boundary} выгружено строк: {archived}")
+    return archived
+
+def archived_months(conn, table):
+    """Архивные месяцы таблицы"""
+    return [month for month, in conn.execute(
+        'SELECT month FROM archive_partitions WHERE table_name = ? ORDER BY month', (table,)
+    )]
+
+def read_archive(table, start=None, end=None, archive_dir=ARCHIVE_DIR):
+    """Строки архива таблицы за месяцы start..end 'YYYY-MM' (включительно)
+    
+    Читаются только каталоги месяцев из диапазона.
+    """
+    files = [
+        path
+        for partition in sorted(glob.glob(os.path.join(archive_dir, table, '*')))
+        if (not start or os.path.basename(partition) >= start) and (not end or os.path.basename(partition) <= end)
+        for path in sorted(glob.glob(os.path.join(partition, 'part-*')))
+    ]
+    frames = []
+    parquet = [path for path in files if path.endswith('.parquet')]
+    if parquet:
+        import duckdb
+        
+        with duckdb.connect() as duck:
+            frames.append(duck.execute('SELECT * FROM read_parquet(?, union_by_name = true)', [parquet]).df())
+    frames += [pd.read_csv(path, compression='gzip') for path in files if path.endswith('.csv.gz')]
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+def read_period(database, table, start=None, end=None, archive_dir=ARCHIVE_DIR):
+    """Строки таблицы за месяцы start..end 'YYYY-MM': архивные партиции периода и строки из базы"""
+    frames = []
+    with database.reader() as conn:
+        if any((not start or month >= start) and (not end or month <= end) for month in archived_months(conn, table)):
+            frames.append(read_archive(table, start, end, archive_dir))
+        
+        column, date_format = ARCHIVE_TABLES[table]
+        conditions = []
+        params = []
+        if date_format == 'iso':
+            if start:
+                conditions.append(f'{column} >= ?')
+                params.append(f'{start}-01')
+            if end:
+                conditions.append(f'{column} < ?')
+                params.append(f'{np.datetime64(end, "M") + 1}-01')
+        else:
+            if start:
+                conditions.append(f'{_month_sql(table)} >= ?')
+                params.append(start)
+            if end:
+                conditions.append(f'{_month_sql(table)} <= ?')
+                params.append(end)
+        where = f' WHERE {" AND ".join(conditions)}' if conditions else ''
+        frames.append(pd.read_sql_query(f'SELECT * FROM {table}{where}', conn, params=params))
+    
+    frames = [frame for frame in frames if not frame.empty]
+    if not frames:
+        return pd.DataFrame()
+    # Даты архива и базы - строки ISO; типы (в том числе даты) приводятся к общим
+    return apply_column_types(pd.concat(frames, ignore_index=True))
+
+def main():
+    parser = argparse.ArgumentParser(description='Архивирование холодной истории SCM Dashboard')
+    parser.add_argument('--db', default=DB_PATH, help='Путь к базе SQLite')
+    parser.add_argument('--archive-dir', default=ARCHIVE_DIR, help='Каталог архива')
+    parser.add_argument('--horizon', type=int, default=ARCHIVE_HORIZON_MONTHS, help='Горизонт в месяцах')
+    parser.add_argument('--as-of', help='Дата отсчета YYYY-MM-DD (по умолчанию сегодня)')
+    parser.add_argument('--query', choices=list(ARCHIVE_TABLES), help='Прочитать таблицу за период вместо архивирования')
+    parser.add_argument('--from', dest='start', help='Первый месяц периода YYYY-MM')
+    parser.add_argument('--to', dest='end', help='Последний месяц периода YYYY-MM')
+    args = parser.parse_args()
+    
+    logging.basicConfig(level=logging.INFO)
+    database = ConnectionManager(args.db)
+    if args.query:
+        df = read_period(database, args.query, args.start, args.end, args.archive_dir)
+        print(f"{args.query}: {len(df):,} строк")
+        print(df.head().to_string())
+    else:
+        with database.writer() as conn:
+            archived = archive_cold_partitions(conn, args.horizon, args.archive_dir, args.as_of)
+        print(f"Выгружено в архив: {archived or 'нечего архивировать'}")
+    database.close()
+
+if __name__ == '__main__':
+    main()
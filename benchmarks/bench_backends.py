@@ -0,0 +1,73 @@
+"""
+Бенчмарк хранилищ: SQLite против DuckDB поверх Parquet
+Время запросов дашборда (queries.dashboard_queries) в обоих хранилищах на
+синтетических базах 1M/10M внедрений
+
+Запуск: python benchmarks/bench_backends.py [--sizes 1000000 10000000] [--repeat 5] [--skip ...]
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import ConnectionManager
+from queries import dashboard_queries
+from storage import SQLiteBackend, DuckDBBackend
+from synthetic_data import load_synthetic_data
+
+def build_database(path, n):
+    """Синтетическая база: n внедрений и n/10 мер поддержки"""
+    database = ConnectionManager(path)
+    started = time.perf_counter()
+    with database.writer() as conn:
+        load_synthetic_data(conn, n, n // 10, seed=42, as_of='2025-01-01')
+    print(f"База {n:,} строк построена за {time.perf_counter() - started:.1f} с")
+    return database
+
+def measure(backend, query, params, repeat):
+    """Лучшее из repeat время запроса и число строк результата"""
+    best = float('inf')
+    rows = 0
+    for _ in range(repeat):
+        started = time.perf_counter()
+        rows = len(backend.read(query, params))
+        best = min(best, time.perf_counter() - started)
+    return rows, best
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000000, 10000000])
+    parser.add_argument('--repeat', type=int, default=5, help='Число повторов каждого запроса')
+    # SELECT * за период на 10M строк требует нескольких ГБ памяти на результат
+    parser.add_argument('--skip', nargs='*', default=[], help='Пропустить запросы с этими именами')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        for n in args.sizes:
+            database = build_database(os.path.join(workdir, f'bench_{n}.db'), n)
+
+            started = time.perf_counter()
+            duckdb_backend = DuckDBBackend(database, parquet_dir=os.path.join(workdir, f'parquet_{n}'))
+            print(f"Выгрузка в Parquet: {time.perf_counter() - started:.1f} с")
+            backends = [SQLiteBackend(database), duckdb_backend]
+
+            print(f"{'Запрос':<26}{'Строк':>10}{'SQLite, мс':>13}{'DuckDB, мс':>13}{'ускорение':>12}")
+            for name, (query, params) in dashboard_queries().items():
+                if name in args.skip:
+                    continue
+                (rows, sqlite_time), (_, duckdb_time) = [
+                    measure(backend, query, params, args.repeat) for backend in backends
+                ]
+                print(f"{name:<26}{rows:>10,}{sqlite_time * 1000:>13.1f}{duckdb_time * 1000:>13.1f}"
+                      f"{sqlite_time / duckdb_time:>11.1f}x")
+            print()
+
+            duckdb_backend.close()
+            database.close()
+
+if __name__ == '__main__':
+    main()
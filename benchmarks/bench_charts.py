@@ -0,0 +1,52 @@
+"""
+Бенчмарк подготовки графиков
+Время построения и сериализации линейного графика и размер JSON для
+браузера: весь ряд через px.line против charts.line_chart (LTTB + WebGL)
+
+Запуск: python benchmarks/bench_charts.py [--sizes 1000 100000 1000000] [--max-points 2000]
+"""
+
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+import pandas as pd
+import plotly.express as px
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from charts import line_chart
+
+def series(n, seed=42):
+    """Почасовой ряд из n точек со случайным блужданием"""
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'date': pd.date_range('2020-01-01', periods=n, freq='h'),
+        'value': np.cumsum(rng.normal(size=n))
+    })
+
+def measure(build):
+    """Время построения и сериализации графика и размер JSON в КБ"""
+    started = time.perf_counter()
+    payload = build().to_json()
+    return time.perf_counter() - started, len(payload.encode('utf-8')) / 1024
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 100000, 1000000])
+    parser.add_argument('--max-points', type=int, default=2000, help='Точек после прореживания')
+    args = parser.parse_args()
+
+    print(f"{'Точек':>10}{'px.line, мс':>14}{'КБ':>10}{'line_chart, мс':>17}{'КБ':>10}")
+    for n in args.sizes:
+        df = series(n)
+        full_time, full_size = measure(lambda: px.line(df, x='date', y='value'))
+        sampled_time, sampled_size = measure(
+            lambda: line_chart(df, 'date', 'value', 'bench', max_points=args.max_points)
+        )
+        print(f"{n:>10,}{full_time * 1000:>14.1f}{full_size:>10,.0f}{sampled_time * 1000:>17.1f}{sampled_size:>10,.0f}")
+
+if __name__ == '__main__':
+    main()
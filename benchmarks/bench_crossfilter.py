@@ -0,0 +1,125 @@
+"""
+Бенчмарк перекрестной фильтрации
+Время пересчета всех графиков внедрений (crossfilter.CrossfilterIndex)
+при разных сочетаниях фильтров против масок pandas по строковым столбцам,
+и время построения индекса по таблице в базе (как при запуске дашборда)
+
+Запуск: python benchmarks/bench_crossfilter.py [--rows 5000000] [--db-rows 1000000] [--repeat 5]
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from crossfilter import CrossfilterIndex
+from database import ConnectionManager
+from queries import CHART_QUERIES
+from synthetic_data import REGIONS, INDUSTRIES, VENDORS, SCM_CLASSES, STATUSES, load_synthetic_data
+
+DOMESTIC_VENDORS = ['1C', 'Логика', 'Галактика', 'Битрикс24', 'АйТи']
+
+CHARTS = [chart for chart, spec in CHART_QUERIES.items() if spec['source'] == 'implementations']
+
+# Сочетания фильтров: имя -> (начало периода, фильтры)
+CASES = {
+    'без фильтров': (None, {}),
+    'период': ('2024-01', {}),
+    'период + регион': ('2024-01', {'region_name': ['Москва']}),
+    'период + 3 измерения': ('2024-01', {'region_name': ['Москва', 'Казань'], 'vendor_name': ['1C', 'SAP'],
+                                         'class_scm': ['WMS']}),
+    'все измерения': ('2023-06', {'region_name': REGIONS[:4], 'industry_name': INDUSTRIES[:3],
+                                  'vendor_name': VENDORS[:5], 'class_scm': SCM_CLASSES[:3],
+                                  'status': ['go-live', 'pilot_ok'], 'is_domestic': [1]})
+}
+
+def synthetic_frame(rows, seed=42):
+    """Внедрения со случайными измерениями за три года"""
+    rng = np.random.default_rng(seed)
+
+    def choice(values):
+        return pd.Categorical.from_codes(rng.integers(0, len(values), size=rows), categories=sorted(values))
+
+    vendors = choice(VENDORS)
+    return pd.DataFrame({
+        'region_name': choice(REGIONS),
+        'industry_name': choice(INDUSTRIES),
+        'vendor_name': vendors,
+        'class_scm': choice(SCM_CLASSES),
+        'status': choice(STATUSES),
+        # Признак отечественного ПО определяется вендором, как в реальных данных
+        'is_domestic': np.isin(np.asarray(vendors), DOMESTIC_VENDORS).astype(np.int64),
+        'date_go_live': np.datetime64('2022-01-01') + rng.integers(0, 1095, size=rows).astype('timedelta64[D]'),
+        'capex': rng.integers(500000, 50000000, size=rows),
+        'revenue_uplift': rng.integers(1000000, 20000000, size=rows),
+        'opex_delta': rng.integers(-500000, 2000000, size=rows)
+    })
+
+def pandas_charts(df, period_start, filters):
+    """Те же графики масками pandas по строковым столбцам"""
+    mask = np.ones(len(df), dtype=bool)
+    if period_start:
+        mask &= df['date_go_live'].to_numpy() >= np.datetime64(period_start, 'M')
+    for column, values in filters.items():
+        mask &= df[column].isin(values).to_numpy()
+    selected = df[mask]
+    for group in ('region_name', 'industry_name'):
+        selected.groupby(group, observed=True).agg(
+            impl_count=('capex', 'size'), domestic=('is_domestic', 'sum'),
+            capex=('capex', 'sum'), revenue_uplift=('revenue_uplift', 'sum')
+        )
+    return len(selected)
+
+def best_of(repeat, func):
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+def database_build_time(rows, repeat):
+    """Лучшее из repeat время CrossfilterIndex.from_database по синтетической базе из rows внедрений"""
+    with tempfile.TemporaryDirectory() as workdir:
+        database = ConnectionManager(os.path.join(workdir, 'bench.db'))
+        with database.writer() as conn:
+            load_synthetic_data(conn, rows, rows // 10, seed=42, as_of='2025-01-01')
+        index = CrossfilterIndex.from_database(database)
+        build_time = best_of(repeat, lambda: CrossfilterIndex.from_database(database))
+        database.close()
+    return index, build_time
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=5000000)
+    parser.add_argument('--db-rows', type=int, default=1000000, help='Внедрений в базе для построения индекса (0 - пропустить)')
+    parser.add_argument('--repeat', type=int, default=5, help='Число повторов каждого сочетания')
+    args = parser.parse_args()
+
+    if args.db_rows:
+        index, build_time = database_build_time(args.db_rows, min(args.repeat, 3))
+        print(f"Индекс по базе {args.db_rows:,} строк (from_database): {index.cells:,} ячеек, "
+              f"{index.nbytes / 2 ** 20:.1f} МБ, построен за {build_time:.1f} с")
+
+    df = synthetic_frame(args.rows)
+    # Строковые столбцы, как после чтения из базы без компактных типов
+    strings = df.astype({column: object for column in ['region_name', 'industry_name', 'vendor_name', 'class_scm', 'status']})
+    started = time.perf_counter()
+    index = CrossfilterIndex.from_frame(df)
+    print(f"Индекс по DataFrame {args.rows:,} строк (from_frame): {index.cells:,} ячеек, {index.nbytes / 2 ** 20:.1f} МБ, "
+          f"построен за {time.perf_counter() - started:.1f} с")
+
+    print(f"{'Фильтры':<24}{'графиков':>10}{'индекс, мс':>13}{'pandas, мс':>13}")
+    for name, (period_start, filters) in CASES.items():
+        index_time = best_of(args.repeat, lambda: [index.chart(chart, period_start, filters) for chart in CHARTS])
+        pandas_time = best_of(args.repeat, lambda: pandas_charts(strings, period_start, filters))
+        print(f"{name:<24}{len(CHARTS):>10}{index_time * 1000:>13.1f}{pandas_time * 1000:>13.1f}")
+
+if __name__ == '__main__':
+    main()
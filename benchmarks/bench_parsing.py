@@ -0,0 +1,64 @@
+"""
+Бенчмарк разбора HTML-страниц коннекторов
+Скорость разбора (записей в секунду) сохраненных страниц из fixtures/
+для каждого парсера, с частичным разбором (SoupStrainer) и без него
+
+Запуск: python benchmarks/bench_parsing.py [--repeat 20]
+"""
+
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data_sources import ReestrPOConnector, EISConnector, GISPConnector
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+PARSERS = ['html.parser', 'lxml']
+
+# Коннектор, страница и функция разбора для каждого источника
+CASES = {
+    'Реестр ПО': (ReestrPOConnector, 'reestr_solutions.html', lambda c, page: c.parse_solutions(page)),
+    'ЕИС': (EISConnector, 'eis_results.html', lambda c, page: c.parse_procurements(page, 'WMS')[0]),
+    'ГИСП': (GISPConnector, 'gisp_measures.html', lambda c, page: c.parse_measures(page))
+}
+
+def load_fixture(name):
+    with open(os.path.join(FIXTURES_DIR, name), 'rb') as f:
+        return f.read()
+
+def measure(connector, parse, page, repeat):
+    """Лучшее из repeat время разбора страницы и число записей"""
+    best = float('inf')
+    records = 0
+    for _ in range(repeat):
+        started = time.perf_counter()
+        records = len(parse(connector, page))
+        best = min(best, time.perf_counter() - started)
+    return records, best
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=20, help='Число повторов для каждой комбинации')
+    args = parser.parse_args()
+
+    print(f"{'Источник':<12}{'Парсер':<14}{'Разбор':<12}{'Записей':>9}{'мс/стр.':>10}{'записей/с':>12}")
+    for source, (connector_cls, fixture, parse) in CASES.items():
+        page = load_fixture(fixture)
+        for html_parser in PARSERS:
+            for restricted in (False, True):
+                connector = connector_cls(html_parser=html_parser, restricted_parsing=restricted)
+                try:
+                    records, elapsed = measure(connector, parse, page, args.repeat)
+                except Exception as e:
+                    print(f"{source:<12}{html_parser:<14}недоступен: {e}")
+                    break
+                mode = 'частичный' if restricted else 'полный'
+                print(f"{source:<12}{html_parser:<14}{mode:<12}{records:>9}"
+                      f"{elapsed * 1000:>10.2f}{records / elapsed:>12,.0f}")
+
+if __name__ == '__main__':
+    main()
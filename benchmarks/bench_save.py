@@ -0,0 +1,83 @@
+"""
+Бенчмарк записи в базу: построчный путь против пакетного
+Сравнивает прежний save_to_database (cursor.execute на каждую запись)
+с пакетной записью DatabaseSink в одной транзакции на 10k/100k/1M строк
+
+Запуск: python benchmarks/bench_save.py [--sizes 10000 100000 1000000]
+"""
+
+import os
+import sys
+import time
+import sqlite3
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data_sources import REAL_TABLES, create_real_data_tables, natural_key, save_records, upsert_sql
+
+def make_procurements(n):
+    """Синтетические закупки с уникальными URL"""
+    return [
+        {
+            'title': f'Поставка WMS для учреждения {i}',
+            'url': f'https://zakupki.gov.ru/epz/order/notice/view.html?regNumber={i:019d}',
+            'customer': f'ГБУ "Учреждение {i % 5000}"',
+            'price': float(100000 + i % 900000),
+            'publication_date': f'{i % 28 + 1:02d}.{i % 12 + 1:02d}.2024',
+            'keyword': 'WMS',
+            'source': 'eis'
+        }
+        for i in range(n)
+    ]
+
+def save_per_row(conn, data):
+    """Прежний путь записи: отдельный execute на каждую запись, коммит в конце"""
+    cursor = conn.cursor()
+    for key, (table, columns, _) in REAL_TABLES.items():
+        sql = upsert_sql(key)
+        seen = set()
+        for record in data[key]:
+            record_key = natural_key(key, record)
+            if record_key in seen:
+                continue
+            seen.add(record_key)
+            cursor.execute(sql, tuple(record[column] for column in columns))
+    conn.commit()
+
+def save_bulk(conn, data):
+    """Пакетная запись через DatabaseSink (как DataAggregator.save_to_database)"""
+    save_records(conn, data)
+
+def run(save, n, workdir):
+    """Время записи n закупок в новую файловую базу"""
+    path = os.path.join(workdir, f'bench_{save.__name__}_{n}.db')
+    conn = sqlite3.connect(path)
+    create_real_data_tables(conn)
+    data = {key: [] for key in REAL_TABLES}
+    data['procurements'] = make_procurements(n)
+
+    started = time.perf_counter()
+    save(conn, data)
+    elapsed = time.perf_counter() - started
+
+    rows = conn.execute('SELECT COUNT(*) FROM real_procurements').fetchone()[0]
+    conn.close()
+    assert rows == n, f'записано {rows} строк из {n}'
+    return elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000])
+    args = parser.parse_args()
+
+    print(f"{'Строк':>10}{'построчно, с':>16}{'строк/с':>12}{'пакетно, с':>14}{'строк/с':>12}{'ускорение':>12}")
+    with tempfile.TemporaryDirectory() as workdir:
+        for n in args.sizes:
+            per_row = run(save_per_row, n, workdir)
+            bulk = run(save_bulk, n, workdir)
+            print(f"{n:>10,}{per_row:>16.2f}{n / per_row:>12,.0f}{bulk:>14.2f}{n / bulk:>12,.0f}{per_row / bulk:>11.1f}x")
+
+if __name__ == '__main__':
+    main()
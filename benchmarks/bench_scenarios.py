@@ -0,0 +1,64 @@
+"""
+Бенчмарк сценариев бюджета поддержки
+Время расчета показателей N распределений бюджета: одной пачкой
+(scenarios.ScenarioModel.evaluate) против цикла по распределениям,
+и время оптимизатора против перебора сетки распределений
+
+Запуск: python benchmarks/bench_scenarios.py [--sizes 1000 10000 100000] [--programs 4]
+"""
+
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scenarios import ScenarioModel, grid_search
+
+def synthetic_model(programs, seed=42):
+    """Модель по случайным мерам поддержки, как в synthetic_data"""
+    rng = np.random.default_rng(seed)
+    size = 500 * programs
+    support = pd.DataFrame({
+        'program_name': rng.integers(0, programs, size=size).astype(str),
+        'amount_rub': rng.integers(1000000, 10000000, size=size),
+        'cost_per_impl': rng.integers(500000, 5000000, size=size),
+        'roi_pct': rng.uniform(50, 200, size=size)
+    })
+    return ScenarioModel.from_frame(support, impl_total=700 * programs)
+
+def timed(func):
+    started = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - started
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--programs', type=int, default=4)
+    args = parser.parse_args()
+
+    model = synthetic_model(args.programs)
+    rng = np.random.default_rng(0)
+    print(f"{'Распределений':>14}{'пачкой, мс':>13}{'циклом, мс':>13}")
+    for n in args.sizes:
+        allocations = rng.dirichlet(np.ones(args.programs), size=n) * model.baseline_budget
+        _, batch_time = timed(lambda: model.evaluate(allocations))
+        _, loop_time = timed(lambda: [model.evaluate(allocation) for allocation in allocations])
+        print(f"{n:>14,}{batch_time * 1000:>13.1f}{loop_time * 1000:>13.1f}")
+
+    budget = model.baseline_budget
+    (best, grid, results), grid_time = timed(lambda: grid_search(model, budget))
+    optimum, optimize_time = timed(lambda: model.optimize(budget))
+    _, frontier_time = timed(lambda: model.optimize(np.linspace(0, 2 * budget, 1000)))
+    print(f"Сетка {len(grid):,} распределений: {grid_time * 1000:.1f} мс, "
+          f"эффект {results['econ_effect'].max() / 1e9:,.3f} млрд ₽")
+    print(f"Оптимизатор: {optimize_time * 1000:.1f} мс, эффект {model.evaluate(optimum)['econ_effect'] / 1e9:,.3f} млрд ₽; "
+          f"1 000 бюджетов: {frontier_time * 1000:.1f} мс")
+
+if __name__ == '__main__':
+    main()
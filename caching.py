@@ -0,0 +1,154 @@
+"""
+Кэш результатов запросов и графиков дашборда
+LRU-кэши на процесс с ограничением по памяти и статистикой попаданий;
+ключ включает версию данных, поэтому после загрузки новые запросы
+не получают результатов прежней версии
+"""
+
+import os
+import sys
+import inspect
+import threading
+from functools import wraps
+from collections import OrderedDict
+
+import pandas as pd
+
+QUERY_CACHE_MAX_MB = float(os.environ.get('SCM_QUERY_CACHE_MB', 256))
+FIGURE_CACHE_MAX_MB = float(os.environ.get('SCM_FIGURE_CACHE_MB', 64))
+
+def sizeof(value):
+    """Оценка памяти значения в байтах (DataFrame - с учетом содержимого строк,
+    массивы и индексы - по атрибуту nbytes)"""
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return int(value.memory_usage(deep=True).sum())
+    nbytes = getattr(value, 'nbytes', None)
+    if nbytes is not None:
+        return int(nbytes)
+    return sys.getsizeof(value)
+
+class LRUCache:
+    """Потокобезопасный LRU-кэш с ограничением суммарного размера значений
+    
+    Значение больше лимита не кэшируется. Статистика: попадания, промахи,
+    вытеснения, число записей и занятый объем.
+    """
+    
+    def __init__(self, max_bytes, max_entries=None):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+    
+    def get(self, key, default=None):
+        with self.lock:
+            if key not in self.entries:
+                self.misses += 1
+                return default
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return self.entries[key][0]
+    
+    def put(self, key, value):
+        size = sizeof(value)
+        with self.lock:
+            if key in self.entries:
+                self.bytes -= self.entries.pop(key)[1]
+            if size > self.max_bytes:
+                return
+            self.entries[key] = (value, size)
+            self.bytes += size
+            while self.bytes > self.max_bytes or (self.max_entries and len(self.entries) > self.max_entries):
+                _, (_, evicted_size) = self.entries.popitem(last=False)
+                self.bytes -= evicted_size
+                self.evictions += 1
+    
+    def discard(self, predicate):
+        """Удаление записей, ключи которых удовлетворяют predicate"""
+        with self.lock:
+            for key in [key for key in self.entries if predicate(key)]:
+                self.bytes -= self.entries.pop(key)[1]
+    
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.bytes = 0
+    
+    def stats(self):
+        with self.lock:
+            requests = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / requests if requests else 0.0,
+                'evictions': self.evictions,
+                'entries': len(self.entries),
+                'bytes': self.bytes,
+                'max_bytes': self.max_bytes
+            }
+
+# Кэш запросов на процесс: модуль импортируется один раз и переживает перезапуски скрипта Streamlit
+QUERY_CACHE = LRUCache(int(QUERY_CACHE_MAX_MB * 2 ** 20))
+# Кэш сериализованных графиков (JSON Plotly): одинаковый вид страницы у разных сессий не строится заново
+FIGURE_CACHE = LRUCache(int(FIGURE_CACHE_MAX_MB * 2 ** 20))
+
+def cached_query(version, cache=QUERY_CACHE):
+    """Декоратор кэширования функции загрузки данных
+    
+    Ключ - имя функции, аргументы и текущая версия данных version();
+    аргументы с именем на "_" (соединение, хранилище) в ключ не входят,
+    как в st.cache_data. При смене версии записи прежних версий удаляются.
+    Возвращаемые DataFrame общие для всех сессий - их нельзя изменять.
+    """
+    def decorate(func):
+        signature = inspect.signature(func)
+        name = f'{func.__module__}.{func.__qualname__}'
+        
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            arguments = tuple(
+                (arg, _freeze(value)) for arg, value in bound.arguments.items() if not arg.startswith('_')
+            )
+            data_version = version()
+            key = (name, arguments, data_version)
+            
+            missing = object()
+            value = cache.get(key, missing)
+            if value is missing:
+                cache.discard(lambda cached: isinstance(cached, tuple) and cached[0] == name and cached[2] != data_version)
+                value = func(*args, **kwargs)
+                cache.put(key, value)
+            return value
+        return wrapper
+    return decorate
+
+def cached_figure(name, state, version, build, cache=FIGURE_CACHE):
+    """Сериализованный график name для значений входов state и версии данных version
+    
+    build() строит JSON графика при промахе. Ключ - имя графика, значения
+    входов (период, фильтры) и версия данных; при смене версии графики
+    прежних версий удаляются.
+    """
+    key = (name, _freeze(state), version)
+    payload = cache.get(key)
+    if payload is None:
+        cache.discard(lambda cached: isinstance(cached, tuple) and cached[0] == name and cached[2] != version)
+        payload = build()
+        cache.put(key, payload)
+    return payload
+
+def _freeze(value):
+    """Хешируемое представление аргумента (словари и списки фильтров)"""
+    if isinstance(value, dict):
+        return tuple(sorted((key, _freeze(item)) for key, item in value.items()))
+    if isinstance(value, set):
+        return tuple(sorted(_freeze(item) for item in value))
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    return value
@@ -0,0 +1,103 @@
+"""
+Подготовка графиков дашборда
+Длинные временные ряды прореживаются на сервере алгоритмом LTTB
+(Largest-Triangle-Three-Buckets) с сохранением экстремумов, а при большом
+числе точек рисуются через WebGL (Scattergl); размер JSON каждого
+графика, отправляемого в браузер, пишется в лог
+
+Настройки: SCM_CHART_MAX_POINTS - точек на ряд после прореживания,
+SCM_WEBGL_THRESHOLD - число точек, начиная с которого используется WebGL
+"""
+
+import os
+import logging
+
+import numpy as np
+import plotly.express as px
+
+logger = logging.getLogger(__name__)
+
+CHART_MAX_POINTS = int(os.environ.get('SCM_CHART_MAX_POINTS', 2000))
+WEBGL_THRESHOLD = int(os.environ.get('SCM_WEBGL_THRESHOLD', 1000))
+
+def _numeric(values):
+    """Значения оси как float (даты - в наносекундах)"""
+    values = np.asarray(values)
+    if np.issubdtype(values.dtype, np.datetime64):
+        return values.astype('datetime64[ns]').astype(np.int64).astype(float)
+    return values.astype(float)
+
+def lttb_indices(x, y, threshold):
+    """Индексы точек, оставляемых LTTB, плюс глобальные минимум и максимум y
+    
+    Первая и последняя точки сохраняются; остальные делятся на threshold - 2
+    корзины, из каждой берется точка, образующая наибольший треугольник
+    с выбранной точкой предыдущей корзины и средним следующей.
+    """
+    x = _numeric(x)
+    y = _numeric(y)
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    
+    # Границы корзин внутренних точек 1..n-2
+    edges = np.linspace(1, n - 1, threshold - 1).astype(int)
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+    
+    previous = 0
+    for bucket in range(threshold - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        # Средняя точка следующей корзины (для последней - последняя точка ряда)
+        if bucket + 2 < len(edges):
+            next_start, next_end = edges[bucket + 1], edges[bucket + 2]
+            next_x, next_y = x[next_start:next_end].mean(), y[next_start:next_end].mean()
+        else:
+            next_x, next_y = x[-1], y[-1]
+        
+        # Удвоенная площадь треугольника для всех точек корзины сразу
+        areas = np.abs(
+            (x[previous] - next_x) * (y[start:end] - y[previous])
+            - (x[previous] - x[start:end]) * (next_y - y[previous])
+        )
+        previous = start + int(np.argmax(areas))
+        selected[bucket + 1] = previous
+    
+    # Экстремумы ряда остаются на графике, даже если LTTB их не выбрал
+    return np.union1d(selected, [int(np.argmin(y)), int(np.argmax(y))])
+
+def downsample(df, x, y, max_points=CHART_MAX_POINTS):
+    """Строки df для отрисовки ряда y(x): не больше max_points точек LTTB и экстремумы"""
+    df = df.dropna(subset=[x, y]).sort_values(x)
+    if len(df) <= max_points:
+        return df
+    return df.iloc[lttb_indices(df[x].to_numpy(), df[y].to_numpy(), max_points)]
+
+def line_chart(df, x, y, title, labels=None, max_points=CHART_MAX_POINTS, webgl_threshold=WEBGL_THRESHOLD, **options):
+    """Линейный график с прореживанием ряда и WebGL для больших рядов"""
+    points = len(df)
+    df = downsample(df, x, y, max_points)
+    if len(df) < points:
+        logger.info(f"График '{title}': {points:,} точек прорежено до {len(df):,}")
+    render_mode = 'webgl' if len(df) >= webgl_threshold else 'svg'
+    return px.line(df, x=x, y=y, title=title, labels=labels, render_mode=render_mode, **options)
+
+def payload_size(fig):
+    """Размер JSON графика, который получит браузер, в байтах"""
+    return len(fig.to_json().encode('utf-8'))
+
+def _trace_points(trace):
+    # Круговые диаграммы хранят точки в values, остальные графики - в x
+    for attribute in ('values', 'x'):
+        values = getattr(trace, attribute, None)
+        if values is not None:
+            return len(values)
+    return 0
+
+def log_payload(name, fig, payload=None):
+    """Запись в лог числа точек и размера JSON графика (payload - уже сериализованный JSON)"""
+    if logger.isEnabledFor(logging.INFO):
+        points = sum(_trace_points(trace) for trace in fig.data)
+        size = len(payload.encode('utf-8')) if payload is not None else payload_size(fig)
+        logger.info(f"График {name}: {points:,} точек, {size / 1024:,.1f} КБ")
@@ -0,0 +1,263 @@
+"""
+Перекрестная фильтрация внедрений в памяти
+Внедрения сворачиваются в куб: ячейка - сочетание значений измерений
+(регион, отрасль, вендор, класс SCM, статус, отечественное ПО) и месяца
+с числом внедрений и суммами показателей. Значения измерений хранятся
+словарными кодами, ячейки отсортированы по месяцу: период - срез куба,
+фильтры - маска через таблицы допустимых кодов, графики пересчитываются
+np.bincount по ячейкам, без обращения к базе и без сравнения строк
+"""
+
+import time
+import logging
+
+import numpy as np
+import pandas as pd
+
+from queries import CHART_QUERIES
+from storage import apply_column_types
+from kpi_engine import COUNTED_STATUSES
+
+logger = logging.getLogger(__name__)
+
+# Измерения фильтров (столбцы implementations)
+DIMENSIONS = ['region_name', 'industry_name', 'vendor_name', 'class_scm', 'status', 'is_domestic']
+
+# Показатели-суммы: имя -> столбец (или выражение по столбцам) implementations
+SUMS = {
+    'domestic_count': 'is_domestic',
+    'capex': 'capex',
+    'revenue_uplift': 'revenue_uplift',
+    # Экономический эффект, как total_econ_effect в kpi_monthly
+    'econ_effect': 'revenue_uplift + opex_delta'
+}
+
+INDEX_CHUNK_SIZE = 500000
+
+# Месяц 'YYYY-MM-DD' -> номер месяца от 1970-01 (без даты - -1)
+MONTH_SQL = ("COALESCE((CAST(substr(date_go_live, 1, 4) AS INTEGER) - 1970) * 12"
+             " + CAST(substr(date_go_live, 6, 2) AS INTEGER) - 1, -1)")
+
+def month_code(month):
+    """Номер месяца 'YYYY-MM' от 1970-01"""
+    return int(np.datetime64(month[:7], 'M').astype(int))
+
+def _smallest_int(values):
+    return pd.to_numeric(values, downcast='integer')
+
+def _cube(frame):
+    """Свертка строк (коды измерений, month, impl_count и суммы) в ячейки куба"""
+    return frame.groupby(DIMENSIONS + ['month'], sort=False).sum().reset_index()
+
+class CrossfilterIndex:
+    """Куб внедрений для быстрых агрегатов с фильтрами
+    
+    codes - {измерение: код ячейки}, categories - {измерение: значения по
+    возрастанию, код - позиция}, months - номер месяца ячейки (по
+    возрастанию), totals - {impl_count и SUMS: сумма по ячейке}.
+    """
+    
+    def __init__(self, codes, categories, months, totals):
+        self.codes = codes
+        self.categories = categories
+        self.months = months
+        self.totals = totals
+    
+    @classmethod
+    def _from_cells(cls, cells, categories):
+        cells = cells.sort_values('month', kind='stable')
+        codes = {dimension: _smallest_int(cells[dimension].to_numpy()) for dimension in DIMENSIONS}
+        # Суммы в float64 - веса np.bincount без преобразования при каждом запросе
+        totals = {name: cells[name].to_numpy(dtype=np.float64) for name in ['impl_count'] + list(SUMS)}
+        return cls(codes, categories, cells['month'].to_numpy(dtype=np.int16), totals)
+    
+    @classmethod
+    def from_frame(cls, df):
+        """Индекс по DataFrame со столбцами DIMENSIONS, date_go_live и столбцами выражений SUMS"""
+        frame = pd.DataFrame(index=df.index)
+        categories = {}
+        for dimension in DIMENSIONS:
+            column = df[dimension].astype('category')
+            categories[dimension] = list(column.cat.categories)
+            frame[dimension] = column.cat.codes
+        frame['month'] = pd.to_datetime(df['date_go_live']).to_numpy().astype('datetime64[M]').astype(np.int64)
+        frame['impl_count'] = 1
+        for name, column in SUMS.items():
+            frame[name] = df.eval(column).fillna(0).astype(np.int64)
+        return cls._from_cells(_cube(frame), categories)
+    
+    @classmethod
+    def from_database(cls, database, chunk_size=INDEX_CHUNK_SIZE):
+        """Индекс по таблице implementations, прочитанной частями
+        
+        Значения измерений кодируются по мере чтения (pd.factorize части и
+        словарь уже встреченных значений), каждая часть сразу сворачивается
+        в ячейки; в конце ячейки частей сворачиваются вместе, а коды
+        перенумеровываются по возрастанию значений. Память - куб и одна часть.
+        """
+        started = time.perf_counter()
+        # NULL в измерении - отдельное значение '' (как в сводных таблицах), флаг без значения - 0
+        columns = [f"COALESCE({dimension}, {0 if dimension == 'is_domestic' else repr('')})" for dimension in DIMENSIONS]
+        columns += [MONTH_SQL] + [f'COALESCE({column}, 0)' for column in SUMS.values()]
+        
+        seen = {dimension: {} for dimension in DIMENSIONS}
+        parts = []
+        with database.reader() as conn:
+            cursor = conn.execute(f'SELECT {", ".join(columns)} FROM implementations')
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                chunk = pd.DataFrame.from_records(rows, columns=DIMENSIONS + ['month'] + list(SUMS))
+                for dimension in DIMENSIONS:
+                    local_codes, uniques = pd.factorize(chunk[dimension])
+                    mapping = seen[dimension]
+                    lookup = np.array([mapping.setdefault(value, len(mapping)) for value in uniques], dtype=np.int32)
+                    chunk[dimension] = lookup[local_codes]
+                chunk['impl_count'] = 1
+                parts.append(_cube(chunk.astype(np.int64)))
+        
+        columns = DIMENSIONS + ['month', 'impl_count'] + list(SUMS)
+        cells = _cube(pd.concat(parts, ignore_index=True)) if parts else pd.DataFrame(columns=columns, dtype=np.int64)
+        categories = {}
+        for dimension in DIMENSIONS:
+            values = list(seen[dimension])
+            order = sorted(range(len(values)), key=lambda position: values[position])
+            remap = np.empty(len(values), dtype=np.int64)
+            remap[order] = np.arange(len(values))
+            categories[dimension] = [values[position] for position in order]
+            cells[dimension] = remap[cells[dimension].to_numpy(dtype=np.int64)]
+        
+        index = cls._from_cells(cells, categories)
+        logger.info(f"Индекс перекрестной фильтрации: {len(index):,} строк в {index.cells:,} ячейках, "
+                    f"{index.nbytes / 2 ** 20:,.1f} МБ за {time.perf_counter() - started:.1f} с")
+        return index
+    
+    def __len__(self):
+        """Число внедрений в индексе"""
+        return int(self.totals['impl_count'].sum())
+    
+    @property
+    def cells(self):
+        return len(self.months)
+    
+    @property
+    def nbytes(self):
+        """Память массивов индекса в байтах"""
+        arrays = list(self.codes.values()) + list(self.totals.values()) + [self.months]
+        return sum(array.nbytes for array in arrays)
+    
+    def select(self, period_start=None, filters=None):
+        """Ячейки периода (с месяца 'YYYY-MM') и фильтров {измерение: значения}
+        
+        Возвращает начало среза по месяцу и маску ячеек среза (None - все).
+        """
+        start = int(np.searchsorted(self.months, month_code(period_start))) if period_start else 0
+        mask = None
+        for dimension, selected in (filters or {}).items():
+            if selected in (None, [], ()):
+                continue
+            selected = set(selected) if isinstance(selected, (list, tuple, set)) else {selected}
+            # Таблица допустимых кодов: одна выборка по массиву кодов вместо сравнения строк
+            allowed = np.array([value in selected for value in self.categories[dimension]], dtype=bool)
+            codes = self.codes[dimension][start:]
+            dimension_mask = allowed[codes] if len(allowed) else np.zeros(len(codes), dtype=bool)
+            mask = dimension_mask if mask is None else mask & dimension_mask
+        return start, mask
+    
+    def aggregate(self, group_by=(), measures=('impl_count',), period_start=None, filters=None,
+                  order_by=None, limit=None):
+        """Агрегаты в формате queries.build_query: столбцы группы и показатели
+        
+        Поддерживается группировка не более чем по одному измерению.
+        """
+        if len(group_by) > 1:
+            raise ValueError('Группировка индекса поддерживает одно измерение')
+        start, mask = self.select(period_start, filters)
+        
+        if group_by:
+            keys = self.codes[group_by[0]][start:]
+            size = len(self.categories[group_by[0]])
+        else:
+            keys = np.zeros(self.cells - start, dtype=np.int8)
+            size = 1
+        if mask is not None:
+            keys = keys[mask]
+        
+        def total(name):
+            weights = self.totals[name][start:]
+            return np.bincount(keys, weights=weights if mask is None else weights[mask], minlength=size).astype(np.int64)
+        
+        needed = set(measures) | ({'domestic_count'} if 'domestic_share' in measures else set())
+        sums = {name: total(name) for name in ['impl_count'] + list(SUMS) if name == 'impl_count' or name in needed}
+        counts = sums['impl_count']
+        
+        result = {}
+        if group_by:
+            result[group_by[0]] = self.categories[group_by[0]]
+        for measure in measures:
+            if measure == 'domestic_share':
+                # Округление половины вверх, как ROUND в SQLite (np.round - к четному)
+                with np.errstate(divide='ignore', invalid='ignore'):
+                    result[measure] = np.floor(1000.0 * sums['domestic_count'] / counts + 0.5) / 10
+            elif measure in sums:
+                result[measure] = sums[measure]
+            else:
+                raise ValueError(f'Показатель не поддерживается индексом: {measure}')
+        df = pd.DataFrame(result)
+        
+        if group_by:
+            # Как GROUP BY в SQL: только непустые группы
+            df = df[counts > 0]
+        if order_by:
+            column, _, direction = order_by.partition(' ')
+            # Группы - вторым ключом, как в queries.build_query
+            df = df.sort_values([column] + list(group_by), ascending=[direction.upper() != 'DESC'] + [True] * len(group_by))
+        if limit:
+            df = df.head(int(limit))
+        return apply_column_types(df.reset_index(drop=True))
+    
+    def monthly_kpi(self, period_start=None, filters=None):
+        """KPI внедрений по месяцам с фильтрами: столбцы kpi_monthly, которые считаются по внедрениям
+        
+        Как в kpi_engine, засчитываются только внедрения со статусами
+        COUNTED_STATUSES (фильтр статусов сужает их), месяцы без внедрений
+        в результат не входят.
+        """
+        statuses = (filters or {}).get('status') or COUNTED_STATUSES
+        filters = dict(filters or {}, status=[status for status in statuses if status in COUNTED_STATUSES])
+        start, mask = self.select(period_start, filters)
+        
+        months = self.months[start:]
+        first = int(months[0]) if len(months) else 0
+        keys = (months - first).astype(np.int64)
+        if mask is not None:
+            keys = keys[mask]
+        
+        def total(name):
+            weights = self.totals[name][start:]
+            return np.bincount(keys, weights=weights if mask is None else weights[mask])
+        
+        impl_count = total('impl_count')
+        present = np.flatnonzero(impl_count > 0)
+        impl_count = impl_count[present]
+        domestic = total('domestic_count')[present]
+        effect = total('econ_effect')[present]
+        # date_month - последний день месяца, как в kpi_monthly
+        month_start = (present + first).astype('datetime64[M]')
+        return apply_column_types(pd.DataFrame({
+            'date_month': ((month_start + 1).astype('datetime64[D]') - 1).astype(str),
+            'impl_count': impl_count.astype(np.int64),
+            'domestic_impl_count': domestic,
+            'domestic_share_pct': domestic / impl_count * 100,
+            'total_econ_effect': effect,
+            'avg_econ_effect': effect / impl_count
+        }))
+    
+    def chart(self, chart, period_start=None, filters=None):
+        """Данные графика из queries.CHART_QUERIES (по внедрениям) с периодом и фильтрами"""
+        spec = CHART_QUERIES[chart]
+        if spec['source'] != 'implementations':
+            raise ValueError(f'График {chart} строится не по внедрениям')
+        return self.aggregate(spec['group_by'], spec['measures'], period_start, filters,
+                              spec.get('order_by'), spec.get('limit'))
@@ -3,63 +3,241 @@
 Парсинг актуальных данных из государственных источников
 """
 
-import requests
+import os
+import sqlite3
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import pandas as pd
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer
 import json
 from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor, wait, as_completed, FIRST_COMPLETED
+from urllib.parse import urlparse
+import queue
+import threading
 import time
 import logging
+from operator import itemgetter
+
+from http_cache import CachedSession
 
 # Настройка логирования
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Лимиты частоты запросов по хостам: (запросов в секунду, размер "ведра")
+HOST_RATE_LIMITS = {
+    'zakupki.gov.ru': (2.0, 4),
+    'default': (1.0, 2)
+}
+
+# Время жизни кэшированных ответов по источникам (секунды)
+SOURCE_CACHE_TTL = {
+    'reestr_po': 24 * 3600,
+    'eis': 3600,
+    'fedstat': 24 * 3600,
+    'gisp': 12 * 3600
+}
+
+# Коды ответов, при которых источник просит снизить нагрузку
+THROTTLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+class TokenBucket:
+    """Ограничитель частоты запросов (token bucket) с адаптивным замедлением
+    
+    При ответах 429/5xx скорость снижается вдвое (но не ниже min_rate),
+    после успешных ответов плавно возвращается к исходной.
+    """
+    
+    def __init__(self, rate, capacity, min_rate=0.1):
+        self.max_rate = rate
+        self.rate = rate
+        self.min_rate = min_rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+    
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+    
+    def acquire(self):
+        """Ожидание свободного токена перед запросом"""
+        while True:
+            with self.lock:
+                self._refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                delay = (1 - self.tokens) / self.rate
+            time.sleep(delay)
+    
+    def penalize(self, retry_after=None):
+        """Замедление после ответа 429/5xx"""
+        with self.lock:
+            self._refill()
+            self.rate = max(self.min_rate, self.rate / 2)
+            # Retry-After переводим в "долг" по токенам, чтобы все потоки подождали
+            pause = retry_after if retry_after is not None else 1 / self.rate
+            self.tokens = min(self.tokens, 0) - pause * self.rate
+    
+    def reward(self):
+        """Постепенное восстановление скорости после успешного ответа"""
+        with self.lock:
+            self.rate = min(self.max_rate, self.rate + self.max_rate * 0.1)
+
+_rate_limiters = {}
+_rate_limiters_lock = threading.Lock()
+
+def get_rate_limiter(host):
+    """Общий для всех коннекторов ограничитель запросов к хосту"""
+    with _rate_limiters_lock:
+        if host not in _rate_limiters:
+            rate, capacity = HOST_RATE_LIMITS.get(host, HOST_RATE_LIMITS['default'])
+            _rate_limiters[host] = TokenBucket(rate, capacity)
+        return _rate_limiters[host]
+
+def _default_html_parser():
+    """Парсер HTML по умолчанию: SCM_HTML_PARSER из окружения или lxml, если установлен"""
+    if os.environ.get('SCM_HTML_PARSER'):
+        return os.environ['SCM_HTML_PARSER']
+    try:
+        import lxml  # noqa: F401
+        return 'lxml'
+    except ImportError:
+        return 'html.parser'
+
+HTML_PARSER = _default_html_parser()
+
+def parse_html(content, only=None, parser=None):
+    """Разбор HTML выбранным парсером
+    
+    only - SoupStrainer: дерево строится только для совпадающих элементов
+    (таблицы результатов, карточек), остальная страница пропускается.
+    """
+    return BeautifulSoup(content, parser or HTML_PARSER, parse_only=only)
+
+def has_class(css_class):
+    """Условие для SoupStrainer: у элемента есть CSS-класс (в т.ч. среди нескольких)"""
+    def match(value):
+        if not value:
+            return False
+        values = value.split() if isinstance(value, str) else value
+        return css_class in values
+    return match
+
+def find_by_class(element, fields):
+    """Поиск полей карточки за один обход поддерева
+    
+    fields - словарь {CSS-класс: тег}; возвращает первый потомок с этим
+    тегом и классом для каждого найденного класса.
+    """
+    found = {}
+    for child in element.descendants:
+        if child.name is None:
+            continue
+        for css_class in child.get('class') or ():
+            if fields.get(css_class) == child.name and css_class not in found:
+                found[css_class] = child
+        if len(found) == len(fields):
+            break
+    return found
+
+def _text(element):
+    """Текст элемента без пробелов по краям ('' для отсутствующего элемента)"""
+    return element.get_text(strip=True) if element is not None else ''
+
+def _parse_amount(text):
+    """Разбор денежной суммы вида '1 234 567,89 ₽'"""
+    # Очистка и конвертация суммы
+    text = text.replace(' ', '').replace('\xa0', '').replace('₽', '').replace(',', '.')
+    try:
+        return float(text)
+    except ValueError:
+        return 0
+
+def _iso_date(date_text):
+    """Дата 'ДД.ММ.ГГГГ' в формате ISO 'ГГГГ-ММ-ДД' (None, если не разобрана)"""
+    # Разбор срезами строки: вызывается на каждую записываемую запись
+    text = date_text.strip() if isinstance(date_text, str) else ''
+    if (len(text) >= 10 and text[2] == '.' and text[5] == '.'
+            and text[:2].isdigit() and text[3:5].isdigit() and text[6:10].isdigit()):
+        return f'{text[6:10]}-{text[3:5]}-{text[:2]}'
+    return None
+
+def create_session(source, pool_size=10, retries=3, retry_statuses=THROTTLE_STATUS_CODES):
+    """HTTP-сессия коннектора поверх общего дискового кэша ответов
+    
+    Соединения переиспользуются пулом HTTPAdapter на pool_size соединений
+    к хосту; сетевые ошибки и ответы retry_statuses повторяются до retries
+    раз с экспоненциальной задержкой (0.5, 1, 2... с).
+    """
+    session = CachedSession(ttl=SOURCE_CACHE_TTL.get(source, 3600))
+    retry = Retry(
+        total=retries,
+        backoff_factor=0.5,
+        status_forcelist=sorted(retry_statuses),
+        allowed_methods=['GET'],
+        respect_retry_after_header=True,
+        raise_on_status=False
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    session.headers.update({
+        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+    })
+    return session
+
+def _retry_after_seconds(response):
+    """Значение заголовка Retry-After в секундах (если задано числом)"""
+    try:
+        return float(response.headers.get('Retry-After'))
+    except (TypeError, ValueError):
+        return None
+
+def rate_limited_get(session, url, max_retries=3, **kwargs):
+    """GET-запрос с учетом лимита частоты хоста и повтором при 429/5xx"""
+    # Ответ из кэша не нагружает источник и не расходует лимит
+    if getattr(session, 'is_fresh', None) and session.is_fresh(url, kwargs.get('params')):
+        return session.get(url, **kwargs)
+    
+    limiter = get_rate_limiter(urlparse(url).hostname)
+    
+    for attempt in range(max_retries + 1):
+        limiter.acquire()
+        response = session.get(url, **kwargs)
+        
+        if response.status_code not in THROTTLE_STATUS_CODES:
+            limiter.reward()
+            response.raise_for_status()
+            return response
+        
+        limiter.penalize(_retry_after_seconds(response))
+        logger.warning(f"{urlparse(url).hostname} ответил {response.status_code}, "
+                       f"снижаем частоту запросов (попытка {attempt + 1})")
+    
+    response.raise_for_status()
+    return response
+
 class ReestrPOConnector:
     """Коннектор для Реестра российского ПО (Минцифры)"""
     
-    def __init__(self):
+    # Строим дерево только для таблицы решений
+    PARSE_ONLY = SoupStrainer('table', class_=has_class('solutions-table'))
+    
+    def __init__(self, html_parser=None, restricted_parsing=True):
         self.base_url = "https://reestr.digital.gov.ru"
-        self.session = requests.Session()
-        self.session.headers.update({
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-        })
+        self.session = create_session('reestr_po')
+        self.html_parser = html_parser
+        self.restricted_parsing = restricted_parsing
     
     def get_scm_solutions(self):
         """Получение SCM-решений из реестра"""
         try:
-            # Поиск по категории "Управление цепями поставок"
-            search_url = f"{self.base_url}/reestr/search/"
-            params = {
-                'category': 'supply_chain_management',
-                'status': 'active'
-            }
-            
-            response = self.session.get(search_url, params=params, timeout=30)
-            response.raise_for_status()
-            
-            soup = BeautifulSoup(response.content, 'html.parser')
-            solutions = []
-            
-            # Парсинг таблицы решений
-            table = soup.find('table', class_='solutions-table')
-            if table:
-                rows = table.find_all('tr')[1:]  # Пропускаем заголовок
-                
-                for row in rows:
-                    cells = row.find_all('td')
-                    if len(cells) >= 6:
-                        solution = {
-                            'name': cells[0].get_text(strip=True),
-                            'vendor': cells[1].get_text(strip=True),
-                            'version': cells[2].get_text(strip=True),
-                            'registration_date': cells[3].get_text(strip=True),
-                            'status': cells[4].get_text(strip=True),
-                            'category': 'SCM',
-                            'is_domestic': True,
-                            'source': 'reestr_po'
-                        }
-                        solutions.append(solution)
+            solutions = list(self.iter_scm_solutions())
             
             logger.info(f"Получено {len(solutions)} SCM-решений из реестра ПО")
             return solutions
@@ -67,79 +245,101 @@ class ReestrPOConnector:
         except Exception as e:
             logger.error(f"Ошибка получения данных из реестра ПО: {e}")
             return []
+    
+    def iter_scm_solutions(self, since=None):
+        """Генератор SCM-решений из реестра (ошибки не перехватываются)
+        
+        since - дата ISO: отдаются только решения, зарегистрированные
+        не раньше нее (инкрементальная загрузка по водяной метке).
+        """
+        # Поиск по категории "Управление цепями поставок"
+        search_url = f"{self.base_url}/reestr/search/"
+        params = {
+            'category': 'supply_chain_management',
+            'status': 'active'
+        }
+        
+        response = self.session.get(search_url, params=params, timeout=30)
+        response.raise_for_status()
+        
+        for solution in self.parse_solutions(response.content):
+            registered = _iso_date(solution['registration_date'])
+            if since and registered and registered < since:
+                continue
+            yield solution
+    
+    def parse_solutions(self, content):
+        """Разбор страницы реестра в список решений"""
+        soup = parse_html(content, self.PARSE_ONLY if self.restricted_parsing else None, self.html_parser)
+        solutions = []
+        
+        # Парсинг таблицы решений
+        table = soup.find('table', class_='solutions-table')
+        if table:
+            rows = table.find_all('tr')[1:]  # Пропускаем заголовок
+            
+            for row in rows:
+                cells = row.find_all('td')
+                if len(cells) >= 6:
+                    solution = {
+                        'name': cells[0].get_text(strip=True),
+                        'vendor': cells[1].get_text(strip=True),
+                        'version': cells[2].get_text(strip=True),
+                        'registration_date': cells[3].get_text(strip=True),
+                        'status': cells[4].get_text(strip=True),
+                        'category': 'SCM',
+                        'is_domestic': True,
+                        'source': 'reestr_po'
+                    }
+                    solutions.append(solution)
+        
+        return solutions
 
 class EISConnector:
     """Коннектор для ЕИС (Единая информационная система в сфере закупок)"""
     
-    def __init__(self):
+    # Ключевые слова для поиска SCM-закупок
+    KEYWORDS = [
+        "управление цепями поставок",
+        "SCM",
+        "WMS",
+        "TMS",
+        "логистическое программное обеспечение",
+        "складское управление"
+    ]
+    
+    # Строим дерево только для карточек результатов поиска
+    PARSE_ONLY = SoupStrainer('div', class_=has_class('search-registry-entry-block'))
+    
+    # CSS-классы полей карточки закупки
+    TITLE_CLASS = 'registry-entry__body-title'
+    CUSTOMER_CLASS = 'registry-entry__body-value'
+    PRICE_CLASS = 'price-block__value'
+    DATE_CLASS = 'data-block__value'
+    ITEM_FIELDS = {
+        TITLE_CLASS: 'a',
+        CUSTOMER_CLASS: 'div',
+        PRICE_CLASS: 'div',
+        DATE_CLASS: 'div'
+    }
+    
+    def __init__(self, max_pages=20, records_per_page=50, page_concurrency=4,
+                 html_parser=None, restricted_parsing=True):
         self.base_url = "https://zakupki.gov.ru"
-        self.session = requests.Session()
-        self.session.headers.update({
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-        })
+        # Ответы 429/5xx повторяет rate_limited_get с замедлением token bucket
+        self.session = create_session('eis', pool_size=page_concurrency * 2, retry_statuses=())
+        self.max_pages = max_pages
+        self.records_per_page = records_per_page
+        self.page_concurrency = page_concurrency
+        self.html_parser = html_parser
+        self.restricted_parsing = restricted_parsing
+        # Ключевые слова, обход которых в последнем запуске прервался ошибкой
+        self.incomplete_keywords = set()
     
-    def get_scm_procurements(self, days_back=30):
+    def get_scm_procurements(self, days_back=30, max_pages=None):
         """Получение закупок SCM-решений"""
         try:
-            # Поиск по ключевым словам SCM
-            keywords = [
-                "управление цепями поставок",
-                "SCM",
-                "WMS",
-                "TMS", 
-                "логистическое программное обеспечение",
-                "складское управление"
-            ]
-            
-            all_procurements = []
-            
-            for keyword in keywords:
-                search_url = f"{self.base_url}/epz/opendata/search/results.html"
-                params = {
-                    'searchString': keyword,
-                    'morphology': 'on',
-                    'search-filter': 'Дате+размещения',
-                    'sortBy': 'BY_RELEVANCE_DESC',
-                    'pageNumber': 1,
-                    'sortDirection': 'false',
-                    'recordsPerPage': '_10',
-                    'showLots': 'on',
-                    'fz44': 'on',
-                    'fz223': 'on',
-                    'ppRf615': 'on',
-                    'fz94': 'on'
-                }
-                
-                response = self.session.get(search_url, params=params, timeout=30)
-                response.raise_for_status()
-                
-                soup = BeautifulSoup(response.content, 'html.parser')
-                
-                # Парсинг результатов поиска
-                procurement_items = soup.find_all('div', class_='search-registry-entry-block')
-                
-                for item in procurement_items:
-                    try:
-                        title_elem = item.find('a', class_='registry-entry__body-title')
-                        if not title_elem:
-                            continue
-                            
-                        procurement = {
-                            'title': title_elem.get_text(strip=True),
-                            'url': f"{self.base_url}{title_elem.get('href', '')}",
-                            'customer': item.find('div', class_='registry-entry__body-value').get_text(strip=True) if item.find('div', class_='registry-entry__body-value') else '',
-                            'price': self._extract_price(item),
-                            'publication_date': self._extract_date(item),
-                            'keyword': keyword,
-                            'source': 'eis'
-                        }
-                        all_procurements.append(procurement)
-                        
-                    except Exception as e:
-                        logger.warning(f"Ошибка парсинга закупки: {e}")
-                        continue
-                
-                time.sleep(1)  # Задержка между запросами
+            all_procurements = list(self.iter_scm_procurements(days_back, max_pages))
             
             logger.info(f"Получено {len(all_procurements)} закупок SCM из ЕИС")
             return all_procurements
@@ -148,66 +348,178 @@ class EISConnector:
             logger.error(f"Ошибка получения данных из ЕИС: {e}")
             return []
     
-    def _extract_price(self, item):
-        """Извлечение цены из элемента закупки"""
-        price_elem = item.find('div', class_='price-block__value')
-        if price_elem:
-            price_text = price_elem.get_text(strip=True)
-            # Очистка и конвертация цены
-            price_text = price_text.replace(' ', '').replace('₽', '').replace(',', '.')
+    def iter_scm_procurements(self, days_back=30, max_pages=None, since=None):
+        """Генератор закупок SCM-решений, по мере загрузки страниц
+        
+        Результаты поиска отсортированы по дате размещения (новые первыми)
+        и обходятся постранично: по каждому ключевому слову одновременно
+        запрашивается до page_concurrency страниц. Обход слова прекращается
+        на неполной странице, на закупках старше days_back дней или по
+        достижении max_pages. Частоту запросов ограничивает общий для хоста
+        token bucket.
+        
+        since - водяные метки {ключевое слово: дата ISO}: по слову с меткой
+        обход останавливается на закупках старше нее.
+        """
+        max_pages = max_pages or self.max_pages
+        default_cutoff = datetime.now() - timedelta(days=days_back) if days_back else None
+        cutoffs = {}
+        for keyword in self.KEYWORDS:
+            watermark = (since or {}).get(keyword)
+            cutoff = datetime.strptime(watermark, '%Y-%m-%d') if watermark else None
+            if default_cutoff and (cutoff is None or cutoff < default_cutoff):
+                cutoff = default_cutoff
+            cutoffs[keyword] = cutoff
+        
+        # Состояние обхода по каждому ключевому слову
+        next_page = {keyword: 1 for keyword in self.KEYWORDS}
+        stopped = set()
+        self.incomplete_keywords = set()
+        
+        with ThreadPoolExecutor(max_workers=self.page_concurrency * 2, thread_name_prefix='eis') as executor:
+            futures = {}
+            
+            def submit_next(keyword):
+                page_number = next_page[keyword]
+                if keyword in stopped or page_number > max_pages:
+                    return
+                next_page[keyword] += 1
+                future = executor.submit(self._fetch_page, keyword, page_number, cutoffs[keyword])
+                futures[future] = (keyword, page_number)
+            
+            for keyword in self.KEYWORDS:
+                for _ in range(self.page_concurrency):
+                    submit_next(keyword)
+            
+            while futures:
+                done, _ = wait(list(futures), return_when=FIRST_COMPLETED)
+                for future in done:
+                    keyword, page_number = futures.pop(future)
+                    try:
+                        procurements, exhausted = future.result()
+                    except Exception as e:
+                        logger.warning(f"Ошибка загрузки страницы {page_number} ЕИС по запросу '{keyword}': {e}")
+                        procurements, exhausted = [], True
+                        self.incomplete_keywords.add(keyword)
+                    
+                    if exhausted:
+                        stopped.add(keyword)
+                    submit_next(keyword)
+                    yield from procurements
+    
+    def _search_params(self, keyword, page_number, cutoff):
+        """Параметры поискового запроса ЕИС"""
+        params = {
+            'searchString': keyword,
+            'morphology': 'on',
+            'search-filter': 'Дате+размещения',
+            'sortBy': 'PUBLISH_DATE',
+            'pageNumber': page_number,
+            'sortDirection': 'false',
+            'recordsPerPage': f'_{self.records_per_page}',
+            'showLots': 'on',
+            'fz44': 'on',
+            'fz223': 'on',
+            'ppRf615': 'on',
+            'fz94': 'on'
+        }
+        if cutoff:
+            params['publishDateFrom'] = cutoff.strftime('%d.%m.%Y')
+        return params
+    
+    def _fetch_page(self, keyword, page_number, cutoff):
+        """Загрузка и разбор одной страницы результатов
+        
+        Возвращает (закупки, признак окончания выдачи).
+        """
+        search_url = f"{self.base_url}/epz/opendata/search/results.html"
+        response = rate_limited_get(
+            self.session, search_url,
+            params=self._search_params(keyword, page_number, cutoff),
+            timeout=30
+        )
+        
+        procurements, items_count, reached_cutoff = self.parse_procurements(response.content, keyword, cutoff)
+        
+        exhausted = reached_cutoff or items_count < self.records_per_page
+        return procurements, exhausted
+    
+    def parse_procurements(self, content, keyword, cutoff=None):
+        """Разбор страницы результатов поиска ЕИС
+        
+        Возвращает (закупки, число карточек на странице, встречены ли
+        закупки старше cutoff). Каждое поле карточки ищется один раз.
+        """
+        soup = parse_html(content, self.PARSE_ONLY if self.restricted_parsing else None, self.html_parser)
+        
+        # Парсинг результатов поиска
+        procurement_items = soup.find_all('div', class_='search-registry-entry-block')
+        procurements = []
+        reached_cutoff = False
+        
+        for item in procurement_items:
             try:
-                return float(price_text)
-            except:
-                return 0
-        return 0
+                fields = find_by_class(item, self.ITEM_FIELDS)
+                title_elem = fields.get(self.TITLE_CLASS)
+                if title_elem is None:
+                    continue
+                
+                publication_date = _text(fields.get(self.DATE_CLASS))
+                published = self._parse_date(publication_date)
+                if cutoff and published and published < cutoff:
+                    reached_cutoff = True
+                    continue
+                
+                procurement = {
+                    'title': title_elem.get_text(strip=True),
+                    'url': f"{self.base_url}{title_elem.get('href', '')}",
+                    'customer': _text(fields.get(self.CUSTOMER_CLASS)),
+                    'price': _parse_amount(_text(fields.get(self.PRICE_CLASS))),
+                    'publication_date': publication_date,
+                    'keyword': keyword,
+                    'source': 'eis'
+                }
+                procurements.append(procurement)
+                
+            except Exception as e:
+                logger.warning(f"Ошибка парсинга закупки: {e}")
+                continue
+        
+        return procurements, len(procurement_items), reached_cutoff
     
-    def _extract_date(self, item):
-        """Извлечение даты из элемента закупки"""
-        date_elem = item.find('div', class_='data-block__value')
-        if date_elem:
-            return date_elem.get_text(strip=True)
-        return ''
+    def _parse_date(self, date_text):
+        """Разбор даты размещения в формате ДД.ММ.ГГГГ"""
+        try:
+            return datetime.strptime(date_text[:10], '%d.%m.%Y')
+        except ValueError:
+            return None
 
 class FedstatConnector:
     """Коннектор для Федстат (ЕМИСС)"""
     
-    def __init__(self):
+    # Индикаторы развития ИТ
+    INDICATORS = [
+        'IT_INVESTMENT',  # Инвестиции в ИТ
+        'SOFTWARE_PRODUCTION',  # Производство ПО
+        'DIGITAL_ECONOMY',  # Цифровая экономика
+        'IT_EMPLOYMENT'  # Занятость в ИТ
+    ]
+    
+    def __init__(self, indicators=None, regions=None, max_workers=8, retries=3):
         self.base_url = "https://fedstat.ru"
         self.api_url = "https://fedstat.ru/api"
-        self.session = requests.Session()
-        self.session.headers.update({
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-        })
+        self.indicators = list(indicators or self.INDICATORS)
+        # None - показатель запрашивается целиком, без разбивки по регионам
+        self.regions = list(regions) if regions else [None]
+        self.max_workers = max_workers
+        self.session = create_session('fedstat', pool_size=max_workers, retries=retries)
+        # Показатели, часть запросов по которым в последнем запуске не удалась
+        self.incomplete_indicators = set()
     
     def get_it_indicators(self):
         """Получение показателей ИТ-отрасли"""
         try:
-            # Индикаторы развития ИТ
-            indicators = [
-                'IT_INVESTMENT',  # Инвестиции в ИТ
-                'SOFTWARE_PRODUCTION',  # Производство ПО
-                'DIGITAL_ECONOMY',  # Цифровая экономика
-                'IT_EMPLOYMENT'  # Занятость в ИТ
-            ]
-            
-            data = []
-            
-            for indicator in indicators:
-                url = f"{self.api_url}/indicator/{indicator}"
-                response = self.session.get(url, timeout=30)
-                response.raise_for_status()
-                
-                indicator_data = response.json()
-                
-                for item in indicator_data.get('data', []):
-                    data.append({
-                        'indicator': indicator,
-                        'year': item.get('year'),
-                        'value': item.get('value'),
-                        'unit': item.get('unit'),
-                        'region': item.get('region', 'Российская Федерация'),
-                        'source': 'fedstat'
-                    })
+            data = list(self.iter_it_indicators())
             
             logger.info(f"Получено {len(data)} показателей из Федстат")
             return data
@@ -215,55 +527,99 @@ class FedstatConnector:
         except Exception as e:
             logger.error(f"Ошибка получения данных из Федстат: {e}")
             return []
+    
+    def iter_it_indicators(self, since=None):
+        """Генератор значений показателей ИТ-отрасли
+        
+        Пары (показатель, регион) запрашиваются параллельно через общий пул
+        соединений; ошибка одного запроса не отменяет остальные, а
+        показатель попадает в incomplete_indicators.
+        
+        since - водяные метки {'показатель|регион': год}: значения пары с
+        меткой отдаются только за этот год и позже; метка выбирается по
+        региону каждого значения (запрос без региона возвращает все регионы),
+        значения регионов без метки отдаются полностью.
+        """
+        since = since or {}
+        self.incomplete_indicators = set()
+        tasks = [(indicator, region) for indicator in self.indicators for region in self.regions]
+        
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(tasks)), thread_name_prefix='fedstat') as executor:
+            futures = {
+                executor.submit(self._fetch_indicator, indicator, region, since): (indicator, region)
+                for indicator, region in tasks
+            }
+            
+            for future in as_completed(futures):
+                indicator, region = futures[future]
+                try:
+                    records = future.result()
+                except Exception as e:
+                    logger.warning(f"Ошибка получения показателя {indicator}"
+                                   f"{f' ({region})' if region else ''} из Федстат: {e}")
+                    self.incomplete_indicators.add(indicator)
+                    continue
+                yield from records
+    
+    def _fetch_indicator(self, indicator, region=None, since=None):
+        """Значения одного показателя (по одному региону, если он задан)
+        
+        since - водяные метки {'показатель|регион': год}, см. iter_it_indicators.
+        """
+        url = f"{self.api_url}/indicator/{indicator}"
+        params = {'region': region} if region else None
+        response = self.session.get(url, params=params, timeout=30)
+        response.raise_for_status()
+        
+        indicator_data = response.json()
+        since = since or {}
+        records = []
+        
+        for item in indicator_data.get('data', []):
+            item_region = item.get('region', region or FEDSTAT_DEFAULT_REGION)
+            min_year = int(since.get(watermark_partition(indicator, item_region)) or 0)
+            try:
+                if min_year and int(item.get('year')) < min_year:
+                    continue
+            except (TypeError, ValueError):
+                pass
+            records.append({
+                'indicator': indicator,
+                'year': item.get('year'),
+                'value': item.get('value'),
+                'unit': item.get('unit'),
+                'region': item_region,
+                'source': 'fedstat'
+            })
+        
+        return records
 
 class GISPConnector:
     """Коннектор для ГИСП (Государственная информационная система промышленности)"""
     
-    def __init__(self):
+    # Строим дерево только для карточек мер поддержки
+    PARSE_ONLY = SoupStrainer('div', class_=has_class('measure-card'))
+    
+    # CSS-классы полей карточки меры поддержки
+    TITLE_CLASS = 'measure-title'
+    CARD_FIELDS = {
+        TITLE_CLASS: 'h3',
+        'measure-description': 'div',
+        'measure-amount': 'div',
+        'measure-deadline': 'div',
+        'measure-requirements': 'div'
+    }
+    
+    def __init__(self, html_parser=None, restricted_parsing=True):
         self.base_url = "https://gisp.gov.ru"
-        self.session = requests.Session()
-        self.session.headers.update({
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-        })
+        self.session = create_session('gisp')
+        self.html_parser = html_parser
+        self.restricted_parsing = restricted_parsing
     
     def get_support_measures(self):
         """Получение мер поддержки для ИТ-отрасли"""
         try:
-            # Поиск мер поддержки для ИТ
-            search_url = f"{self.base_url}/measures"
-            params = {
-                'category': 'it',
-                'status': 'active'
-            }
-            
-            response = self.session.get(search_url, params=params, timeout=30)
-            response.raise_for_status()
-            
-            soup = BeautifulSoup(response.content, 'html.parser')
-            measures = []
-            
-            # Парсинг карточек мер поддержки
-            measure_cards = soup.find_all('div', class_='measure-card')
-            
-            for card in measure_cards:
-                try:
-                    title_elem = card.find('h3', class_='measure-title')
-                    if not title_elem:
-                        continue
-                    
-                    measure = {
-                        'title': title_elem.get_text(strip=True),
-                        'description': self._extract_description(card),
-                        'amount': self._extract_amount(card),
-                        'deadline': self._extract_deadline(card),
-                        'requirements': self._extract_requirements(card),
-                        'source': 'gisp'
-                    }
-                    measures.append(measure)
-                    
-                except Exception as e:
-                    logger.warning(f"Ошибка парсинга меры поддержки: {e}")
-                    continue
+            measures = list(self.iter_support_measures())
             
             logger.info(f"Получено {len(measures)} мер поддержки из ГИСП")
             return measures
@@ -272,151 +628,638 @@ class GISPConnector:
             logger.error(f"Ошибка получения данных из ГИСП: {e}")
             return []
     
-    def _extract_description(self, card):
-        """Извлечение описания меры поддержки"""
-        desc_elem = card.find('div', class_='measure-description')
-        return desc_elem.get_text(strip=True) if desc_elem else ''
-    
-    def _extract_amount(self, card):
-        """Извлечение суммы поддержки"""
-        amount_elem = card.find('div', class_='measure-amount')
-        if amount_elem:
-            amount_text = amount_elem.get_text(strip=True)
-            # Очистка и конвертация суммы
-            amount_text = amount_text.replace(' ', '').replace('₽', '').replace(',', '.')
+    def iter_support_measures(self):
+        """Генератор мер поддержки для ИТ-отрасли"""
+        # Поиск мер поддержки для ИТ
+        search_url = f"{self.base_url}/measures"
+        params = {
+            'category': 'it',
+            'status': 'active'
+        }
+        
+        response = self.session.get(search_url, params=params, timeout=30)
+        response.raise_for_status()
+        
+        yield from self.parse_measures(response.content)
+    
+    def parse_measures(self, content):
+        """Разбор страницы ГИСП в список мер поддержки"""
+        soup = parse_html(content, self.PARSE_ONLY if self.restricted_parsing else None, self.html_parser)
+        measures = []
+        
+        # Парсинг карточек мер поддержки
+        measure_cards = soup.find_all('div', class_='measure-card')
+        
+        for card in measure_cards:
             try:
-                return float(amount_text)
-            except:
-                return 0
-        return 0
+                fields = find_by_class(card, self.CARD_FIELDS)
+                title_elem = fields.get(self.TITLE_CLASS)
+                if title_elem is None:
+                    continue
+                
+                measure = {
+                    'title': title_elem.get_text(strip=True),
+                    'description': _text(fields.get('measure-description')),
+                    'amount': _parse_amount(_text(fields.get('measure-amount'))),
+                    'deadline': _text(fields.get('measure-deadline')),
+                    'requirements': _text(fields.get('measure-requirements')),
+                    'source': 'gisp'
+                }
+                measures.append(measure)
+                
+            except Exception as e:
+                logger.warning(f"Ошибка парсинга меры поддержки: {e}")
+                continue
+        
+        return measures
+
+# Таблицы реальных данных: ключ данных -> (таблица, столбцы, естественный ключ)
+REAL_TABLES = {
+    'solutions': ('real_solutions', (
+        'name', 'vendor', 'version', 'registration_date', 'status', 'category', 'is_domestic', 'source'
+    ), ('name', 'vendor', 'version')),
+    'procurements': ('real_procurements', (
+        'title', 'url', 'customer', 'price', 'publication_date', 'keyword', 'source'
+    ), ('url',)),
+    'indicators': ('real_indicators', (
+        'indicator', 'year', 'value', 'unit', 'region', 'source'
+    ), ('indicator', 'year', 'region')),
+    'support_measures': ('real_support_measures', (
+        'title', 'description', 'amount', 'deadline', 'requirements', 'source'
+    ), ('title', 'source'))
+}
+
+def upsert_sql(key):
+    """INSERT ... ON CONFLICT DO UPDATE по естественному ключу таблицы"""
+    table, columns, key_columns = REAL_TABLES[key]
+    updates = ',\n            '.join(
+        f'{column} = excluded.{column}' for column in columns if column not in key_columns
+    )
+    return f'''
+        INSERT INTO {table} ({', '.join(columns)})
+        VALUES ({', '.join('?' * len(columns))})
+        ON CONFLICT ({', '.join(key_columns)}) DO UPDATE SET
+            {updates}
+    '''
+
+def natural_key(key, record):
+    """Естественный ключ записи для дедупликации"""
+    return tuple(record[column] for column in REAL_TABLES[key][2])
+
+def _tuple_getter(columns):
+    """itemgetter, всегда возвращающий кортеж (в т.ч. для одного столбца)"""
+    if len(columns) == 1:
+        column = columns[0]
+        return lambda record: (record[column],)
+    return itemgetter(*columns)
+
+# Водяные метки инкрементальной загрузки:
+# ключ данных -> (источник, поля раздела метки (пусто - один раздел), поле значения)
+WATERMARK_FIELDS = {
+    'solutions': ('reestr_po', (), 'registration_date'),
+    'procurements': ('eis', ('keyword',), 'publication_date'),
+    # Регионы показателя публикуют данные в разное время - у каждого своя метка
+    'indicators': ('fedstat', ('indicator', 'region'), 'year')
+}
+
+# Регион показателя Федстат, запрошенного без региона
+FEDSTAT_DEFAULT_REGION = 'Российская Федерация'
+
+def watermark_partition(*values):
+    """Раздел водяной метки по значениям полей раздела ('показатель|регион')"""
+    return '|'.join(str(value) for value in values)
+
+def watermark_value(key, record):
+    """Значение водяной метки записи: дата ISO или год (None, если не разобрано)"""
+    value = record.get(WATERMARK_FIELDS[key][2])
+    if key == 'indicators':
+        try:
+            return f"{int(value):04d}"
+        except (TypeError, ValueError):
+            return None
+    return _iso_date(value)
+
+def get_watermarks(conn, source):
+    """Водяные метки источника: {раздел: значение}"""
+    rows = conn.execute(
+        'SELECT partition_key, watermark FROM ingest_watermarks WHERE source = ?', (source,)
+    ).fetchall()
+    return dict(rows)
+
+def save_watermarks(conn, source, watermarks):
+    """Сдвиг водяных меток источника вперед (назад метки не двигаются)"""
+    conn.executemany('''
+        INSERT INTO ingest_watermarks (source, partition_key, watermark)
+        VALUES (?, ?, ?)
+        ON CONFLICT (source, partition_key) DO UPDATE SET
+            watermark = MAX(watermark, excluded.watermark),
+            updated_at = CURRENT_TIMESTAMP
+    ''', [(source, partition, value) for partition, value in watermarks.items()])
+    conn.commit()
+
+# Предел числа параметров в одном запросе для старых сборок SQLite
+SQLITE_MAX_VARIABLES = 999
+
+def configure_connection(conn):
+    """PRAGMA для массовой записи: WAL, умеренная синхронизация, крупный кэш страниц"""
+    if conn.in_transaction:
+        conn.commit()
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    conn.execute('PRAGMA cache_size=-65536')  # 64 МБ
+    conn.execute('PRAGMA temp_store=MEMORY')
+
+class DatabaseSink:
+    """Пакетная запись записей в таблицы реальных данных
+    
+    Записи копятся в буфере по каждой таблице и пишутся через executemany
+    пачками по batch_size строк в явной транзакции. При commit_every=None
+    вся загрузка идет одной транзакцией (коммит при закрытии), иначе
+    коммит выполняется каждые commit_every пачек. Память ограничена
+    размером буферов, а не объемом выгрузки.
+    
+    Записи без естественного ключа или с недостающими полями, а также
+    строки, отвергнутые базой, не прерывают загрузку, а учитываются в
+    stats[таблица]['rejected'] вместе с числом вставленных и обновленных.
+    Повторы записи в одной пачке отбрасываются (duplicates), повторы из
+    прежних пачек обновляют строку через ON CONFLICT (updated).
+    """
+    
+    def __init__(self, conn, batch_size=500, commit_every=10, track_watermarks=True):
+        self.conn = conn
+        self.batch_size = batch_size
+        self.commit_every = commit_every
+        self.buffers = {key: [] for key in REAL_TABLES}
+        self.stats = {
+            key: {'inserted': 0, 'updated': 0, 'rejected': 0, 'duplicates': 0}
+            for key in REAL_TABLES
+        }
+        # Естественные ключи записей в буфере (одна закупка находится по нескольким словам);
+        # очищаются при записи пачки - память не растет с объемом загрузки
+        self.seen = {key: set() for key in REAL_TABLES}
+        self.getters = {
+            key: (_tuple_getter(key_columns), _tuple_getter(columns))
+            for key, (_, columns, key_columns) in REAL_TABLES.items()
+        }
+        self.batches_since_commit = 0
+        # Таблицы, пустые до первой пачки: в их первой пачке все строки - новые
+        self.empty_tables = {
+            key for key, (table, _, _) in REAL_TABLES.items()
+            if conn.execute(f'SELECT NOT EXISTS (SELECT 1 FROM {table})').fetchone()[0]
+        }
+        # Максимальные значения водяных меток среди записанных записей
+        self.watermarks = {key: {} for key in WATERMARK_FIELDS} if track_watermarks else {}
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            # Незакоммиченные пачки отбрасываются, ранее закоммиченные остаются
+            self.conn.rollback()
+    
+    def add(self, key, record):
+        """Добавление записи источника (ключ из REAL_TABLES)"""
+        get_key, get_row = self.getters[key]
+        try:
+            record_key = get_key(record)
+            row = get_row(record)
+        except (KeyError, TypeError) as e:
+            logger.warning(f"Отклонена запись {key}: нет поля {e}")
+            self.stats[key]['rejected'] += 1
+            return
+        
+        if None in record_key or '' in record_key:
+            self.stats[key]['rejected'] += 1
+            return
+        if record_key in self.seen[key]:
+            self.stats[key]['duplicates'] += 1
+            return
+        self.seen[key].add(record_key)
+        
+        buffer = self.buffers[key]
+        buffer.append(row)
+        
+        if key in self.watermarks:
+            value = watermark_value(key, record)
+            partition = watermark_partition(*(record[field] for field in WATERMARK_FIELDS[key][1]))
+            if value and value > self.watermarks[key].get(partition, ''):
+                self.watermarks[key][partition] = value
+        if len(buffer) >= self.batch_size:
+            self.flush(key)
+    
+    def add_many(self, key, records):
+        """Добавление записей из любого итерируемого объекта"""
+        for record in records:
+            self.add(key, record)
     
-    def _extract_deadline(self, card):
-        """Извлечение срока подачи заявок"""
-        deadline_elem = card.find('div', class_='measure-deadline')
-        return deadline_elem.get_text(strip=True) if deadline_elem else ''
+    def _begin(self):
+        if not self.conn.in_transaction:
+            self.conn.execute('BEGIN')
     
-    def _extract_requirements(self, card):
-        """Извлечение требований"""
-        req_elem = card.find('div', class_='measure-requirements')
-        return req_elem.get_text(strip=True) if req_elem else ''
+    def _count_existing(self, key, rows):
+        """Сколько строк пачки уже есть в таблице (по естественному ключу)"""
+        table, columns, key_columns = REAL_TABLES[key]
+        positions = [columns.index(column) for column in key_columns]
+        keys = [tuple(row[i] for i in positions) for row in rows]
+        
+        placeholder = f"({', '.join('?' * len(key_columns))})"
+        chunk_size = SQLITE_MAX_VARIABLES // len(key_columns)
+        existing = 0
+        for start in range(0, len(keys), chunk_size):
+            chunk = keys[start:start + chunk_size]
+            existing += self.conn.execute(f'''
+                SELECT COUNT(*) FROM {table}
+                WHERE ({', '.join(key_columns)}) IN (VALUES {', '.join([placeholder] * len(chunk))})
+            ''', [value for chunk_key in chunk for value in chunk_key]).fetchone()[0]
+        return existing
+    
+    def _write_rows(self, key, rows):
+        """Построчная запись пачки, в которой база отвергла часть строк"""
+        sql = upsert_sql(key)
+        written = 0
+        for row in rows:
+            self.conn.execute('SAVEPOINT sink_row')
+            try:
+                self.conn.execute(sql, row)
+                written += 1
+            except sqlite3.Error as e:
+                self.conn.execute('ROLLBACK TO sink_row')
+                logger.warning(f"Отклонена строка {REAL_TABLES[key][0]}: {e}")
+            self.conn.execute('RELEASE sink_row')
+        return written
+    
+    def flush(self, key):
+        """Запись буфера таблицы одной пачкой"""
+        buffer = self.buffers[key]
+        if not buffer:
+            return
+        
+        self._begin()
+        existing = 0 if key in self.empty_tables else self._count_existing(key, buffer)
+        
+        self.conn.execute('SAVEPOINT sink_batch')
+        try:
+            self.conn.executemany(upsert_sql(key), buffer)
+            written = len(buffer)
+        except sqlite3.Error:
+            self.conn.execute('ROLLBACK TO sink_batch')
+            written = self._write_rows(key, buffer)
+        self.conn.execute('RELEASE sink_batch')
+        
+        stats = self.stats[key]
+        updated = min(existing, written)
+        stats['updated'] += updated
+        stats['inserted'] += written - updated
+        stats['rejected'] += len(buffer) - written
+        buffer.clear()
+        self.seen[key].clear()
+        # Следующие пачки могут повторять записанные строки - их считает _count_existing
+        self.empty_tables.discard(key)
+        
+        self.batches_since_commit += 1
+        if self.commit_every and self.batches_since_commit >= self.commit_every:
+            self.commit()
+    
+    def commit(self):
+        self.conn.commit()
+        self.batches_since_commit = 0
+    
+    def close(self):
+        """Запись остатков буферов и финальный коммит; возвращает статистику"""
+        for key in self.buffers:
+            self.flush(key)
+        self.commit()
+        logger.info(f"Запись в базу: {self.stats}")
+        return self.stats
 
 class DataAggregator:
     """Агрегатор данных из всех источников"""
     
-    def __init__(self):
+    # Таймауты по умолчанию (секунды) на каждый источник и на весь сбор
+    SOURCE_TIMEOUTS = {
+        'solutions': 60,
+        'procurements': 120,
+        'indicators': 60,
+        'support_measures': 60
+    }
+    TOTAL_TIMEOUT = 180
+    
+    # Размер порции записей, передаваемой из потока источника в поток записи
+    STREAM_CHUNK_SIZE = 100
+    
+    def __init__(self, source_timeouts=None, total_timeout=None):
         self.reestr = ReestrPOConnector()
         self.eis = EISConnector()
         self.fedstat = FedstatConnector()
         self.gisp = GISPConnector()
+        self.source_timeouts = dict(self.SOURCE_TIMEOUTS, **(source_timeouts or {}))
+        self.total_timeout = total_timeout or self.TOTAL_TIMEOUT
     
-    def collect_all_data(self):
-        """Сбор данных из всех источников"""
-        logger.info("Начинаем сбор данных из всех источников...")
+    def _sources(self):
+        """Описание источников: ключ результата -> (название, функция сбора)
         
-        all_data = {
-            'solutions': [],
-            'procurements': [],
-            'indicators': [],
-            'support_measures': []
+        Сбор идет через генераторы iter_*: в отличие от get_*, они не
+        перехватывают ошибки, и недоступный источник получает статус 'error',
+        а не 'empty'.
+        """
+        return {
+            'solutions': ('реестра ПО', lambda: list(self.reestr.iter_scm_solutions())),
+            'procurements': ('ЕИС', lambda: list(self.eis.iter_scm_procurements())),
+            'indicators': ('Федстат', lambda: list(self.fedstat.iter_it_indicators())),
+            'support_measures': ('ГИСП', lambda: list(self.gisp.iter_support_measures()))
+        }
+    
+    def _stream_sources(self, since=None):
+        """Генераторы источников для потоковой загрузки (since - водяные метки)"""
+        since = since or {}
+        return {
+            'solutions': ('реестра ПО', lambda: self.reestr.iter_scm_solutions(
+                since=since.get('solutions', {}).get(''))),
+            'procurements': ('ЕИС', lambda: self.eis.iter_scm_procurements(
+                since=since.get('procurements'))),
+            'indicators': ('Федстат', lambda: self.fedstat.iter_it_indicators(
+                since=since.get('indicators'))),
+            'support_measures': ('ГИСП', self.gisp.iter_support_measures)
         }
+    
+    def collect_all_data(self, concurrent=True):
+        """Сбор данных из всех источников
         
-        try:
-            # Сбор данных из реестра ПО
-            logger.info("Сбор данных из реестра ПО...")
-            all_data['solutions'] = self.reestr.get_scm_solutions()
-            
-            # Сбор данных из ЕИС
-            logger.info("Сбор данных из ЕИС...")
-            all_data['procurements'] = self.eis.get_scm_procurements()
-            
-            # Сбор данных из Федстат
-            logger.info("Сбор данных из Федстат...")
-            all_data['indicators'] = self.fedstat.get_it_indicators()
-            
-            # Сбор данных из ГИСП
-            logger.info("Сбор данных из ГИСП...")
-            all_data['support_measures'] = self.gisp.get_support_measures()
-            
+        По умолчанию источники опрашиваются параллельно, и время сбора
+        определяется самым медленным из них. Результат всегда содержит
+        все ключи (частичные данные при ошибках и таймаутах), а в
+        all_data['status'] - статус сбора по каждому источнику.
+        """
+        logger.info("Начинаем сбор данных из всех источников...")
+        
+        if concurrent:
+            all_data = self._collect_concurrent()
+        else:
+            all_data = self._collect_sequential()
+        
+        failed = [key for key, status in all_data['status'].items() if status['status'] != 'ok']
+        if failed:
+            logger.warning(f"Сбор данных завершен с проблемами в источниках: {', '.join(failed)}")
+        else:
             logger.info("Сбор данных завершен успешно")
-            return all_data
-            
-        except Exception as e:
-            logger.error(f"Ошибка при сборе данных: {e}")
-            return all_data
+        return all_data
+    
+    def _empty_result(self):
+        """Пустой результат сбора со статусом 'pending' для каждого источника"""
+        all_data = {key: [] for key in self._sources()}
+        all_data['status'] = {
+            key: {'status': 'pending', 'records': 0, 'elapsed': 0.0, 'error': None}
+            for key in self._sources()
+        }
+        return all_data
+    
+    def _store_result(self, all_data, key, records, elapsed):
+        """Сохранение результата источника и его статуса"""
+        all_data[key] = records or []
+        all_data['status'][key].update({
+            'status': 'ok' if records else 'empty',
+            'records': len(all_data[key]),
+            'elapsed': round(elapsed, 2)
+        })
+    
+    def _store_error(self, all_data, key, status, error, elapsed):
+        """Фиксация ошибки или таймаута источника"""
+        all_data['status'][key].update({
+            'status': status,
+            'error': str(error),
+            'elapsed': round(elapsed, 2)
+        })
+    
+    def _collect_sequential(self):
+        """Последовательный сбор данных (источники опрашиваются по очереди)"""
+        all_data = self._empty_result()
+        
+        for key, (title, fetch) in self._sources().items():
+            logger.info(f"Сбор данных из {title}...")
+            started = time.monotonic()
+            try:
+                self._store_result(all_data, key, fetch(), time.monotonic() - started)
+            except Exception as e:
+                logger.error(f"Ошибка при сборе данных из {title}: {e}")
+                self._store_error(all_data, key, 'error', e, time.monotonic() - started)
+        
+        return all_data
     
-    def save_to_database(self, conn, data):
-        """Сохранение собранных данных в базу"""
+    def _collect_concurrent(self):
+        """Параллельный сбор данных в пуле потоков с таймаутами"""
+        all_data = self._empty_result()
+        sources = self._sources()
+        
+        started = time.monotonic()
+        total_deadline = started + self.total_timeout
+        executor = ThreadPoolExecutor(max_workers=len(sources), thread_name_prefix='collector')
+        
         try:
-            cursor = conn.cursor()
-            
-            # Сохранение решений
-            for solution in data['solutions']:
-                cursor.execute('''
-                    INSERT OR REPLACE INTO real_solutions 
-                    (name, vendor, version, registration_date, status, category, is_domestic, source)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                ''', (
-                    solution['name'],
-                    solution['vendor'],
-                    solution['version'],
-                    solution['registration_date'],
-                    solution['status'],
-                    solution['category'],
-                    solution['is_domestic'],
-                    solution['source']
-                ))
+            futures = {}
+            for key, (title, fetch) in sources.items():
+                logger.info(f"Сбор данных из {title}...")
+                futures[executor.submit(fetch)] = key
             
-            # Сохранение закупок
-            for procurement in data['procurements']:
-                cursor.execute('''
-                    INSERT OR REPLACE INTO real_procurements
-                    (title, url, customer, price, publication_date, keyword, source)
-                    VALUES (?, ?, ?, ?, ?, ?, ?)
-                ''', (
-                    procurement['title'],
-                    procurement['url'],
-                    procurement['customer'],
-                    procurement['price'],
-                    procurement['publication_date'],
-                    procurement['keyword'],
-                    procurement['source']
-                ))
-            
-            # Сохранение индикаторов
-            for indicator in data['indicators']:
-                cursor.execute('''
-                    INSERT OR REPLACE INTO real_indicators
-                    (indicator, year, value, unit, region, source)
-                    VALUES (?, ?, ?, ?, ?, ?)
-                ''', (
-                    indicator['indicator'],
-                    indicator['year'],
-                    indicator['value'],
-                    indicator['unit'],
-                    indicator['region'],
-                    indicator['source']
-                ))
+            deadlines = {
+                future: min(started + self.source_timeouts[key], total_deadline)
+                for future, key in futures.items()
+            }
+            pending = set(futures)
             
-            # Сохранение мер поддержки
-            for measure in data['support_measures']:
-                cursor.execute('''
-                    INSERT OR REPLACE INTO real_support_measures
-                    (title, description, amount, deadline, requirements, source)
-                    VALUES (?, ?, ?, ?, ?, ?)
-                ''', (
-                    measure['title'],
-                    measure['description'],
-                    measure['amount'],
-                    measure['deadline'],
-                    measure['requirements'],
-                    measure['source']
-                ))
+            while pending:
+                now = time.monotonic()
+                
+                # Источники, превысившие свой таймаут, помечаем и больше не ждем
+                expired = {future for future in pending if deadlines[future] <= now}
+                for future in expired:
+                    key = futures[future]
+                    logger.error(f"Превышено время ожидания данных из {sources[key][0]}")
+                    self._store_error(all_data, key, 'timeout', 'превышено время ожидания', now - started)
+                    future.cancel()
+                pending -= expired
+                if not pending:
+                    break
+                
+                timeout = min(deadlines[future] for future in pending) - now
+                done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+                
+                for future in done:
+                    key = futures[future]
+                    elapsed = time.monotonic() - started
+                    try:
+                        self._store_result(all_data, key, future.result(), elapsed)
+                    except Exception as e:
+                        logger.error(f"Ошибка при сборе данных из {sources[key][0]}: {e}")
+                        self._store_error(all_data, key, 'error', e, elapsed)
+        finally:
+            # Зависшие запросы не блокируют возврат частичного результата
+            executor.shutdown(wait=False, cancel_futures=True)
+        
+        return all_data
+    
+    def stream_to_database(self, conn, batch_size=500, commit_every=10, incremental=True, progress=None):
+        """Потоковая загрузка всех источников в базу
+        
+        Генераторы источников работают параллельно в отдельных потоках и
+        передают записи через ограниченную очередь; запись в базу идет в
+        текущем потоке через DatabaseSink. Ни один источник не держится в
+        памяти целиком. Возвращает статус загрузки по каждому источнику.
+        
+        При incremental=True источники запрашивают только записи не старше
+        сохраненных водяных меток, а после успешной загрузки метки
+        сдвигаются к самым свежим записанным значениям.
+        
+        progress - необязательная функция, которой не чаще раза в полсекунды
+        передается текущий статус источников.
+        """
+        logger.info("Начинаем потоковую загрузку данных из всех источников...")
+        since = {}
+        if incremental:
+            since = {key: get_watermarks(conn, source) for key, (source, _, _) in WATERMARK_FIELDS.items()}
+        sources = self._stream_sources(since)
+        status = self._empty_result()['status']
+        records = queue.Queue(maxsize=max(1, batch_size * 4 // self.STREAM_CHUNK_SIZE))
+        stop = threading.Event()
+        started = time.monotonic()
+        total_deadline = started + self.total_timeout
+        
+        def produce(key, title, iterate):
+            deadline = min(started + self.source_timeouts[key], total_deadline)
+            produced = 0
             
-            conn.commit()
-            logger.info("Данные успешно сохранены в базу")
+            def put(chunk):
+                # Ожидание места в очереди с проверкой остановки и таймаута
+                while True:
+                    if stop.is_set() or time.monotonic() > deadline:
+                        raise TimeoutError('превышено время ожидания')
+                    try:
+                        records.put((key, chunk), timeout=0.5)
+                        return
+                    except queue.Full:
+                        continue
             
-        except Exception as e:
-            logger.error(f"Ошибка сохранения данных: {e}")
+            try:
+                # Записи передаются небольшими порциями, чтобы не платить за очередь на каждую
+                chunk = []
+                for record in iterate():
+                    chunk.append(record)
+                    if len(chunk) >= self.STREAM_CHUNK_SIZE:
+                        put(chunk)
+                        produced += len(chunk)
+                        chunk = []
+                if chunk:
+                    put(chunk)
+                    produced += len(chunk)
+                status[key]['status'] = 'ok' if produced else 'empty'
+            except TimeoutError as e:
+                logger.error(f"Превышено время ожидания данных из {title}")
+                status[key].update({'status': 'timeout', 'error': str(e)})
+            except Exception as e:
+                logger.error(f"Ошибка при загрузке данных из {title}: {e}")
+                status[key].update({'status': 'error', 'error': str(e)})
+            finally:
+                status[key]['elapsed'] = round(time.monotonic() - started, 2)
+        
+        producers = [
+            threading.Thread(target=produce, args=(key, title, iterate), name=f'stream-{key}', daemon=True)
+            for key, (title, iterate) in sources.items()
+        ]
+        for producer in producers:
+            producer.start()
+        
+        configure_connection(conn)
+        reported = 0.0
+        try:
+            with DatabaseSink(conn, batch_size, commit_every) as sink:
+                while any(producer.is_alive() for producer in producers) or not records.empty():
+                    now = time.monotonic()
+                    if now > total_deadline:
+                        break
+                    if progress and now - reported >= 0.5:
+                        progress(status)
+                        reported = now
+                    try:
+                        key, chunk = records.get(timeout=0.2)
+                    except queue.Empty:
+                        continue
+                    sink.add_many(key, chunk)
+                    status[key]['records'] += len(chunk)
+        finally:
+            # Останавливаем источники, которые еще не закончили
+            stop.set()
+        
+        for key in sources:
+            if status[key]['status'] == 'pending':
+                status[key].update({'status': 'timeout', 'error': 'превышено время ожидания'})
+        
+        # Метки сдвигаются только для полностью загруженных источников
+        for key, (source, _, _) in WATERMARK_FIELDS.items():
+            if status[key]['status'] != 'ok':
+                continue
+            watermarks = sink.watermarks[key]
+            # Обход ключевого слова мог прерваться после части страниц. Запрос пары
+            # показатель-регион либо отдал все значения, либо ни одного: метки
+            # показателей есть только у полученных пар, отбирать их не нужно
+            if key == 'procurements':
+                watermarks = {keyword: value for keyword, value in watermarks.items()
+                              if keyword not in self.eis.incomplete_keywords}
+            save_watermarks(conn, source, watermarks)
+        
+        if progress:
+            progress(status)
+        
+        logger.info(f"Потоковая загрузка завершена: {status}")
+        return status
+    
+    def save_to_database(self, conn, data, batch_size=1000):
+        """Сохранение собранных данных в базу (см. save_records)"""
+        return save_records(conn, data, batch_size)
+
+def save_records(conn, data, batch_size=1000):
+    """Сохранение собранных данных {ключ: записи} в базу
+    
+    Все таблицы пишутся пакетами в одной транзакции: при сбое базы
+    ничего не сохраняется, отдельные некорректные записи отклоняются.
+    Возвращает статистику вставленных/обновленных/отклоненных строк
+    по таблицам (None при ошибке).
+    """
+    try:
+        configure_connection(conn)
+        with DatabaseSink(conn, batch_size, commit_every=None, track_watermarks=False) as sink:
+            for key in REAL_TABLES:
+                sink.add_many(key, data.get(key, []))
+        
+        logger.info("Данные успешно сохранены в базу")
+        return sink.stats
+        
+    except Exception as e:
+        logger.error(f"Ошибка сохранения данных, транзакция отменена: {e}")
+        return None
+
+def create_natural_key_index(conn, table, key_columns):
+    """Уникальный индекс по естественному ключу
+    
+    Для таблиц, созданных до появления индекса, сначала удаляются
+    накопившиеся дубликаты (остается самая свежая запись).
+    """
+    index_name = f'ux_{table}_natural_key'
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = ?", (index_name,)
+    ).fetchone()
+    if exists:
+        return
+    
+    columns = ', '.join(key_columns)
+    removed = conn.execute(f'''
+        DELETE FROM {table}
+        WHERE id NOT IN (SELECT MAX(id) FROM {table} GROUP BY {columns})
+    ''').rowcount
+    if removed:
+        logger.info(f"Удалено {removed} дубликатов из {table}")
+    conn.execute(f'CREATE UNIQUE INDEX {index_name} ON {table} ({columns})')
 
 def create_real_data_tables(conn):
     """Создание таблиц для реальных данных"""
@@ -481,4 +1324,19 @@ def create_real_data_tables(conn):
         )
     ''')
     
+    # Уникальные индексы по естественным ключам
+    for key, (table, _, key_columns) in REAL_TABLES.items():
+        create_natural_key_index(conn, table, key_columns)
+    
+    # Водяные метки инкрементальной загрузки по источникам
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS ingest_watermarks (
+            source TEXT,
+            partition_key TEXT,
+            watermark TEXT,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (source, partition_key)
+        )
+    ''')
+    
     conn.commit()
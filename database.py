@@ -0,0 +1,559 @@
+"""
+Схема и миграции локальной базы данных SCM Dashboard
+Таблицы дашборда, версионируемые миграции (PRAGMA user_version)
+и проверка планов запросов дашборда
+"""
+
+import sys
+import queue
+import sqlite3
+import logging
+import threading
+from contextlib import contextmanager
+
+from data_sources import create_real_data_tables, configure_connection
+
+logger = logging.getLogger(__name__)
+
+# Файл локальной базы данных
+DB_PATH = 'scm_dashboard.db'
+
+# Запросы дашборда: используются приложением и проверкой планов запросов.
+# Запросы общие для хранилищ SQLite и DuckDB: у агрегатов есть имена (иначе столбцы
+# называются по правилам каждой СУБД), а порядок строк однозначен (с ключом таблицы)
+KPI_QUERY = '''
+    SELECT * FROM kpi_monthly
+    WHERE date_month >= ?
+    ORDER BY date_month
+'''
+
+IMPLEMENTATIONS_QUERY = '''
+    SELECT * FROM implementations
+    WHERE date_go_live >= ?
+    ORDER BY date_go_live, impl_id
+'''
+
+SUPPORT_QUERY = 'SELECT * FROM support_measures ORDER BY approval_date, support_id'
+
+# Типичные запросы дашборда с параметрами для EXPLAIN QUERY PLAN
+# (запросы графиков строит queries.py, см. queries.dashboard_queries)
+DASHBOARD_QUERIES = {
+    'kpi_period': (KPI_QUERY, ['2024-01-01']),
+    'implementations_period': (IMPLEMENTATIONS_QUERY, ['2024-01-01']),
+    'support_by_date': (SUPPORT_QUERY, []),
+    'region_filter': ('''
+        SELECT COUNT(*) AS impl_count FROM implementations
+        WHERE region_name = ? AND date_go_live >= ?
+    ''', ['Москва', '2024-01-01']),
+    'industry_filter': ('''
+        SELECT COUNT(*) AS impl_count FROM implementations
+        WHERE industry_name = ? AND date_go_live >= ?
+    ''', ['Логистика', '2024-01-01']),
+    'vendor_filter': ('''
+        SELECT COUNT(*) AS impl_count FROM implementations
+        WHERE vendor_name = ? AND date_go_live >= ?
+    ''', ['1C', '2024-01-01']),
+    'domestic_filter': ('''
+        SELECT COUNT(*) AS impl_count FROM implementations
+        WHERE is_domestic = ? AND date_go_live >= ?
+    ''', [1, '2024-01-01']),
+    'support_period': ('''
+        SELECT program_name, COUNT(*) AS measure_count, SUM(amount_rub) AS amount_rub, AVG(roi_pct) AS roi_pct
+        FROM support_measures WHERE approval_date >= ?
+        GROUP BY program_name ORDER BY program_name
+    ''', ['2024-01-01'])
+}
+
+# Помесячные сводные таблицы, поддерживаемые триггерами при вставке/изменении/удалении строк:
+# имя -> (исходная таблица, столбец даты, измерения, {показатель: столбец}).
+# Первый показатель - число строк (столбец None), по нему удаляются пустые группы
+ROLLUPS = {
+    'rollup_region_monthly': ('implementations', 'date_go_live', ['region_name'], {
+        'impl_count': None, 'domestic_count': 'is_domestic', 'capex_sum': 'capex'
+    }),
+    'rollup_industry_monthly': ('implementations', 'date_go_live', ['industry_name'], {
+        'impl_count': None, 'domestic_count': 'is_domestic', 'capex_sum': 'capex',
+        'revenue_uplift_sum': 'revenue_uplift'
+    }),
+    'rollup_vendor_monthly': ('implementations', 'date_go_live', ['vendor_name', 'class_scm'], {
+        'impl_count': None, 'domestic_count': 'is_domestic', 'capex_sum': 'capex',
+        'revenue_uplift_sum': 'revenue_uplift'
+    }),
+    'rollup_program_monthly': ('support_measures', 'approval_date', ['program_name'], {
+        'measure_count': None, 'amount_sum': 'amount_rub', 'roi_sum': 'roi_pct'
+    })
+}
+
+def _rollup_exprs(rollup, prefix=''):
+    """Выражения месяца, измерений и показателей одной строки исходной таблицы"""
+    _, date_column, dimensions, measures = ROLLUPS[rollup]
+    month = f"substr({prefix}{date_column}, 1, 7)"
+    # NULL в ключе группы дал бы дубликаты вместо обновления - заменяем пустой строкой
+    dims = [f"COALESCE({prefix}{column}, '')" for column in dimensions]
+    values = ['1' if column is None else f'COALESCE({prefix}{column}, 0)' for column in measures.values()]
+    return month, dims, values
+
+def rollup_table_sql(rollup):
+    _, _, dimensions, measures = ROLLUPS[rollup]
+    columns = ', '.join([f"{column} TEXT NOT NULL DEFAULT ''" for column in dimensions] +
+                        [f'{measure} REAL NOT NULL DEFAULT 0' for measure in measures])
+    return f'''
+        CREATE TABLE IF NOT EXISTS {rollup} (
+            month TEXT NOT NULL,
+            {columns},
+            PRIMARY KEY (month, {', '.join(dimensions)})
+        )
+    '''
+
+def rollup_trigger_sql(rollup):
+    """Триггеры, переносящие вставку, изменение и удаление строк в сводную таблицу"""
+    source, date_column, dimensions, measures = ROLLUPS[rollup]
+    key = ', '.join(['month'] + dimensions)
+    count_measure = next(iter(measures))
+    
+    def add(prefix):
+        month, dims, values = _rollup_exprs(rollup, prefix)
+        updates = ', '.join(f'{measure} = {measure} + excluded.{measure}' for measure in measures)
+        # WHERE обязателен: без него ON CONFLICT после SELECT разбирается неоднозначно
+        return f'''
+            INSERT INTO {rollup} ({key}, {', '.join(measures)})
+            SELECT {', '.join([month] + dims + values)}
+            WHERE {prefix}{date_column} IS NOT NULL
+            ON CONFLICT ({key}) DO UPDATE SET {updates};
+        '''
+    
+    def subtract(prefix):
+        month, dims, values = _rollup_exprs(rollup, prefix)
+        updates = ', '.join(f'{measure} = {measure} - {value}' for measure, value in zip(measures, values))
+        where = ' AND '.join(f'{column} = {expr}' for column, expr in zip(['month'] + dimensions, [month] + dims))
+        return f'''
+            UPDATE {rollup} SET {updates} WHERE {where};
+            DELETE FROM {rollup} WHERE {where} AND {count_measure} <= 0;
+        '''
+    
+    return [
+        f'CREATE TRIGGER IF NOT EXISTS {rollup}_insert AFTER INSERT ON {source} BEGIN {add("NEW.")} END',
+        f'CREATE TRIGGER IF NOT EXISTS {rollup}_delete AFTER DELETE ON {source} BEGIN {subtract("OLD.")} END',
+        f'''CREATE TRIGGER IF NOT EXISTS {rollup}_update AFTER UPDATE ON {source}
+           BEGIN {subtract("OLD.")} {add("NEW.")} END'''
+    ]
+
+def rollup_rebuild_sql(rollup):
+    """Пересчет сводной таблицы целиком по исходной"""
+    source, date_column, dimensions, measures = ROLLUPS[rollup]
+    month, dims, values = _rollup_exprs(rollup)
+    sums = [f'SUM({value})' for value in values]
+    # Архивные месяцы (archive.py) сводная таблица сохраняет: их строк в исходной таблице уже нет
+    archived = f"SELECT month FROM archive_partitions WHERE table_name = '{source}'"
+    return [
+        f'DELETE FROM {rollup} WHERE month NOT IN ({archived})',
+        f'''INSERT INTO {rollup} (month, {', '.join(dimensions)}, {', '.join(measures)})
+           SELECT {', '.join([month] + dims + sums)} FROM {source}
+           WHERE {date_column} IS NOT NULL AND {month} NOT IN ({archived})
+           GROUP BY {', '.join(str(i) for i in range(1, len(dimensions) + 2))}'''
+    ]
+
+def rebuild_rollups(conn):
+    """Пересчет всех сводных таблиц в одной транзакции"""
+    with conn:
+        for rollup in ROLLUPS:
+            for statement in rollup_rebuild_sql(rollup):
+                conn.execute(statement)
+
+def drop_rollup_triggers(conn):
+    for rollup in ROLLUPS:
+        for event in ('insert', 'delete', 'update'):
+            conn.execute(f'DROP TRIGGER IF EXISTS {rollup}_{event}')
+
+def create_rollup_triggers(conn):
+    for rollup in ROLLUPS:
+        for statement in rollup_trigger_sql(rollup):
+            conn.execute(statement)
+
+# Исходные таблицы помесячных KPI: таблица -> (столбец даты, столбцы, от которых зависят KPI).
+# Триггеры отмечают месяцы измененных строк в kpi_dirty_months, kpi_engine пересчитывает только их
+KPI_SOURCES = {
+    'implementations': ('date_go_live', ['status', 'vendor_name', 'is_domestic', 'revenue_uplift', 'opex_delta']),
+    'support_measures': ('approval_date', ['program_name', 'amount_rub', 'cost_per_impl'])
+}
+
+# Таблицы с триггерами отметки месяцев (реестр ПО влияет на все месяцы внедрений его вендора)
+KPI_TRIGGER_TABLES = list(KPI_SOURCES) + ['real_solutions']
+
+def kpi_trigger_sql():
+    """Триггеры, отмечающие в kpi_dirty_months месяцы, KPI которых изменились"""
+    statements = []
+    for table, (date_column, columns) in KPI_SOURCES.items():
+        def mark(prefix):
+            return f'''
+                INSERT OR IGNORE INTO kpi_dirty_months (month)
+                SELECT substr({prefix}{date_column}, 1, 7) WHERE {prefix}{date_column} IS NOT NULL;
+            '''
+        statements += [
+            f'CREATE TRIGGER IF NOT EXISTS kpi_dirty_{table}_insert AFTER INSERT ON {table} BEGIN {mark("NEW.")} END',
+            f'CREATE TRIGGER IF NOT EXISTS kpi_dirty_{table}_delete AFTER DELETE ON {table} BEGIN {mark("OLD.")} END',
+            f'''CREATE TRIGGER IF NOT EXISTS kpi_dirty_{table}_update
+               AFTER UPDATE OF {", ".join([date_column] + columns)} ON {table}
+               BEGIN {mark("OLD.")} {mark("NEW.")} END'''
+        ]
+    
+    # Вендор в реестре отечественного ПО меняет долю локальных компонентов во всех его месяцах
+    def mark_vendor(prefix):
+        return f'''
+            INSERT OR IGNORE INTO kpi_dirty_months (month)
+            SELECT DISTINCT substr(date_go_live, 1, 7) FROM implementations
+            WHERE vendor_name = {prefix}vendor AND date_go_live IS NOT NULL;
+        '''
+    statements += [
+        f'CREATE TRIGGER IF NOT EXISTS kpi_dirty_real_solutions_insert AFTER INSERT ON real_solutions BEGIN {mark_vendor("NEW.")} END',
+        f'CREATE TRIGGER IF NOT EXISTS kpi_dirty_real_solutions_delete AFTER DELETE ON real_solutions BEGIN {mark_vendor("OLD.")} END',
+        # Повторная загрузка реестра обновляет строки теми же значениями - такие обновления не отмечаются
+        f'''CREATE TRIGGER IF NOT EXISTS kpi_dirty_real_solutions_update AFTER UPDATE ON real_solutions
+           WHEN OLD.vendor IS NOT NEW.vendor OR OLD.is_domestic IS NOT NEW.is_domestic
+           BEGIN {mark_vendor("OLD.")} {mark_vendor("NEW.")} END'''
+    ]
+    return statements
+
+def kpi_mark_all_sql(tables=tuple(KPI_SOURCES)):
+    """Отметка всех месяцев tables и уже рассчитанных месяцев kpi_monthly для пересчета"""
+    statements = [
+        f'''INSERT OR IGNORE INTO kpi_dirty_months (month)
+           SELECT DISTINCT substr({KPI_SOURCES[table][0]}, 1, 7) FROM {table}
+           WHERE {KPI_SOURCES[table][0]} IS NOT NULL'''
+        for table in tables if table in KPI_SOURCES
+    ]
+    # Месяцы, из которых строки удалены целиком, тоже пересчитываются (их KPI удаляются)
+    statements.append('''INSERT OR IGNORE INTO kpi_dirty_months (month)
+        SELECT substr(date_month, 1, 7) FROM kpi_monthly''')
+    return statements
+
+def drop_kpi_triggers(conn):
+    for table in KPI_TRIGGER_TABLES:
+        for event in ('insert', 'delete', 'update'):
+            conn.execute(f'DROP TRIGGER IF EXISTS kpi_dirty_{table}_{event}')
+
+def create_kpi_triggers(conn):
+    for statement in kpi_trigger_sql():
+        conn.execute(statement)
+
+@contextmanager
+def bulk_load(conn, tables=('implementations', 'support_measures')):
+    """Массовая загрузка без построчного обслуживания индексов и сводных таблиц
+    
+    На время загрузки снимаются триггеры сводных таблиц и KPI и вторичные
+    индексы tables; после нее (в том числе при ошибке) индексы строятся заново
+    одной сортировкой, триггеры восстанавливаются, сводные таблицы
+    пересчитываются одним проходом по исходным, а все месяцы tables
+    отмечаются для пересчета KPI (kpi_engine.refresh_kpi_monthly).
+    """
+    placeholders = ', '.join('?' * len(tables))
+    indexes = conn.execute(f'''
+        SELECT name, sql FROM sqlite_master
+        WHERE type = 'index' AND sql IS NOT NULL AND tbl_name IN ({placeholders})
+    ''', tables).fetchall()
+    
+    drop_rollup_triggers(conn)
+    drop_kpi_triggers(conn)
+    for name, _ in indexes:
+        conn.execute(f'DROP INDEX IF EXISTS {name}')
+    conn.commit()
+    try:
+        yield conn
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        for _, sql in indexes:
+            conn.execute(sql)
+        create_rollup_triggers(conn)
+        create_kpi_triggers(conn)
+        rebuild_rollups(conn)
+        for statement in kpi_mark_all_sql(tables):
+            conn.execute(statement)
+        # Статистика планировщика по выборке строк, а не по всей таблице
+        conn.execute('PRAGMA analysis_limit = 1000')
+        conn.execute('ANALYZE')
+        conn.commit()
+
+# Миграции схемы: (версия, описание, SQL-команды); применяются по возрастанию версии
+MIGRATIONS = [
+    (1, 'Индексы для запросов дашборда', [
+        # Период и сортировка по дате ввода в эксплуатацию
+        'CREATE INDEX IF NOT EXISTS idx_impl_go_live ON implementations (date_go_live)',
+        # Покрывающие индексы для сводок по регионам и отраслям за период
+        '''CREATE INDEX IF NOT EXISTS idx_impl_go_live_region
+           ON implementations (date_go_live, region_name, is_domestic, capex)''',
+        '''CREATE INDEX IF NOT EXISTS idx_impl_go_live_industry
+           ON implementations (date_go_live, industry_name, is_domestic, capex, revenue_uplift)''',
+        # Фильтры по измерениям в сочетании с периодом
+        'CREATE INDEX IF NOT EXISTS idx_impl_region ON implementations (region_name, date_go_live)',
+        'CREATE INDEX IF NOT EXISTS idx_impl_industry ON implementations (industry_name, date_go_live)',
+        'CREATE INDEX IF NOT EXISTS idx_impl_vendor ON implementations (vendor_name, date_go_live)',
+        'CREATE INDEX IF NOT EXISTS idx_impl_domestic ON implementations (is_domestic, date_go_live)',
+        # Меры поддержки: сортировка и период по дате одобрения
+        '''CREATE INDEX IF NOT EXISTS idx_support_approval
+           ON support_measures (approval_date, program_name, amount_rub, roi_pct)''',
+        'ANALYZE'
+    ]),
+    (2, 'Помесячные сводные таблицы по регионам, отраслям, вендорам и программам', [
+        statement
+        for rollup in ROLLUPS
+        for statement in [rollup_table_sql(rollup)] + rollup_trigger_sql(rollup) + rollup_rebuild_sql(rollup)
+    ]),
+    (3, 'Служебная таблица meta со счетчиком версии данных', [
+        'CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER)',
+        "INSERT OR IGNORE INTO meta (key, value) VALUES ('data_version', 0)"
+    ]),
+    # KPI прежних версий содержали случайные показатели - все месяцы пересчитываются
+    (4, 'Очередь месяцев для инкрементального пересчета KPI', [
+        'CREATE TABLE IF NOT EXISTS kpi_dirty_months (month TEXT PRIMARY KEY) WITHOUT ROWID'
+    ] + kpi_trigger_sql() + kpi_mark_all_sql())
+]
+
+def get_data_version(conn):
+    """Текущая версия данных (растет с каждой загрузкой)"""
+    row = conn.execute("SELECT value FROM meta WHERE key = 'data_version'").fetchone()
+    return row[0] if row else 0
+
+def bump_data_version(conn):
+    """Увеличение версии данных; вызывается загрузкой в ее транзакции
+    
+    Версия входит в ключи кэша запросов: после загрузки кэшированные
+    результаты прежней версии больше не выдаются.
+    """
+    conn.execute("UPDATE meta SET value = value + 1 WHERE key = 'data_version'")
+
+def create_dashboard_tables(conn):
+    """Таблицы синтетических данных дашборда"""
+    cursor = conn.cursor()
+    
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS implementations (
+            impl_id INTEGER PRIMARY KEY,
+            org_name TEXT,
+            solution_name TEXT,
+            vendor_name TEXT,
+            class_scm TEXT,
+            region_name TEXT,
+            industry_name TEXT,
+            date_go_live DATE,
+            status TEXT,
+            is_domestic BOOLEAN,
+            capex INTEGER,
+            revenue_uplift INTEGER,
+            opex_delta INTEGER,
+            inv_turnover_delta REAL,
+            lead_time_delta REAL,
+            penalties_delta INTEGER
+        )
+    ''')
+    
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS kpi_monthly (
+            date_month DATE PRIMARY KEY,
+            year INTEGER,
+            quarter INTEGER,
+            impl_count INTEGER,
+            domestic_impl_count INTEGER,
+            domestic_share_pct REAL,
+            total_econ_effect INTEGER,
+            avg_econ_effect REAL,
+            support_count INTEGER,
+            total_support_amount INTEGER,
+            support_coverage_pct REAL,
+            isi_index REAL
+        )
+    ''')
+    
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS support_measures (
+            support_id INTEGER PRIMARY KEY,
+            program_name TEXT,
+            measure_type TEXT,
+            recipient_name TEXT,
+            amount_rub INTEGER,
+            approval_date DATE,
+            disbursement_date DATE,
+            roi_pct REAL,
+            cost_per_impl INTEGER
+        )
+    ''')
+    
+    conn.commit()
+
+def create_archive_table(conn):
+    """Учет архивных помесячных партиций (archive.py): таблица, месяц, каталог, строк и частей"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS archive_partitions (
+            table_name TEXT,
+            month TEXT,
+            path TEXT,
+            rows INTEGER,
+            parts INTEGER,
+            archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (table_name, month)
+        )
+    ''')
+    conn.commit()
+
+def apply_migrations(conn):
+    """Применение миграций новее текущей PRAGMA user_version"""
+    current = conn.execute('PRAGMA user_version').fetchone()[0]
+    for version, description, statements in MIGRATIONS:
+        if version <= current:
+            continue
+        logger.info(f"Миграция схемы {version}: {description}")
+        for statement in statements:
+            conn.execute(statement)
+        # PRAGMA не принимает параметры; version - целое из MIGRATIONS
+        conn.execute(f'PRAGMA user_version = {int(version)}')
+        conn.commit()
+
+def restore_triggers(conn):
+    """Восстановление триггеров сводных таблиц и KPI, потерянных прерванным процессом
+    
+    Триггеры снимаются на время массовой загрузки и архивирования; если
+    процесс завершился до их восстановления, изменения после этого прошли
+    мимо rollup_* и kpi_dirty_months. Поэтому при восстановлении сводные
+    таблицы пересчитываются, а все месяцы отмечаются для пересчета KPI.
+    Возвращает True, если каких-то триггеров не было.
+    """
+    expected = {f'{rollup}_{event}' for rollup in ROLLUPS for event in ('insert', 'delete', 'update')}
+    expected |= {f'kpi_dirty_{table}_{event}' for table in KPI_TRIGGER_TABLES for event in ('insert', 'delete', 'update')}
+    existing = {name for name, in conn.execute("SELECT name FROM sqlite_master WHERE type = 'trigger'")}
+    if expected <= existing:
+        return False
+    
+    logger.warning(f"Нет триггеров: {', '.join(sorted(expected - existing))}; сводные таблицы пересчитываются")
+    create_rollup_triggers(conn)
+    create_kpi_triggers(conn)
+    rebuild_rollups(conn)
+    for statement in kpi_mark_all_sql():
+        conn.execute(statement)
+    conn.commit()
+    return True
+
+def create_schema(conn):
+    """Создание всех таблиц, применение миграций и восстановление потерянных триггеров"""
+    create_dashboard_tables(conn)
+    create_real_data_tables(conn)
+    # До миграций: пересчет сводных таблиц исключает архивные месяцы
+    create_archive_table(conn)
+    apply_migrations(conn)
+    restore_triggers(conn)
+
+class ConnectionManager:
+    """Соединения с базой на весь процесс
+    
+    Схема создается один раз при создании менеджера. Запросы дашборда идут
+    через пул соединений только для чтения, запись (загрузка данных) - через
+    единственное соединение-писатель под блокировкой. Соединения не привязаны
+    к потоку: Streamlit выполняет сессии в разных потоках, но каждое соединение
+    в каждый момент используется одним потоком.
+    """
+    
+    def __init__(self, db_path=DB_PATH, pool_size=8, timeout=30):
+        self.db_path = db_path
+        self.timeout = timeout
+        self.readers = queue.LifoQueue(maxsize=pool_size)
+        self.write_lock = threading.Lock()
+        
+        self.write_conn = self.connect()
+        # WAL: читатели не блокируются на время транзакций писателя
+        configure_connection(self.write_conn)
+        create_schema(self.write_conn)
+    
+    def connect(self, read_only=False):
+        """Новое соединение (для чтения - в режиме mode=ro)"""
+        if read_only:
+            conn = sqlite3.connect(f'file:{self.db_path}?mode=ro', uri=True,
+                                   timeout=self.timeout, check_same_thread=False)
+            conn.execute('PRAGMA query_only = ON')
+            return conn
+        return sqlite3.connect(self.db_path, timeout=self.timeout, check_same_thread=False)
+    
+    @contextmanager
+    def reader(self):
+        """Соединение для чтения из пула; по выходе возвращается в пул"""
+        try:
+            conn = self.readers.get_nowait()
+        except queue.Empty:
+            conn = self.connect(read_only=True)
+        try:
+            yield conn
+        finally:
+            # Незавершенное чтение держало бы снимок WAL и мешало контрольным точкам
+            if conn.in_transaction:
+                conn.rollback()
+            try:
+                self.readers.put_nowait(conn)
+            except queue.Full:
+                conn.close()
+    
+    def data_version(self):
+        with self.reader() as conn:
+            return get_data_version(conn)
+    
+    @contextmanager
+    def writer(self):
+        """Единственное соединение для записи; фиксация по выходе, откат при ошибке"""
+        with self.write_lock:
+            try:
+                yield self.write_conn
+                if self.write_conn.in_transaction:
+                    self.write_conn.commit()
+            except Exception:
+                if self.write_conn.in_transaction:
+                    self.write_conn.rollback()
+                raise
+    
+    def close(self):
+        while True:
+            try:
+                self.readers.get_nowait().close()
+            except queue.Empty:
+                break
+        with self.write_lock:
+            self.write_conn.close()
+
+def check_query_plans(conn, queries=None):
+    """Проверка, что запросы дашборда используют индексы
+    
+    Возвращает {запрос: (план, список проблем)}; проблема - полный
+    просмотр исходной таблицы или сортировка строк во временном B-дереве.
+    """
+    report = {}
+    for name, (query, params) in (queries or DASHBOARD_QUERIES).items():
+        plan = [row[-1] for row in conn.execute(f'EXPLAIN QUERY PLAN {query}', params)]
+        problems = []
+        for step in plan:
+            # Сводные таблицы малы по построению (месяцы x группы), их просмотр допустим
+            if step.startswith('SCAN') and 'INDEX' not in step and not step.startswith('SCAN rollup_'):
+                problems.append(f'полный просмотр: {step}')
+            # Сортировка результата группировки идет по группам, а не по строкам - допустима
+            if 'USE TEMP B-TREE FOR ORDER BY' in step and 'GROUP BY' not in query.upper():
+                problems.append(f'сортировка без индекса: {step}')
+        report[name] = (plan, problems)
+    return report
+
+def main():
+    """Проверка планов запросов: python database.py [путь к базе]"""
+    logging.basicConfig(level=logging.INFO)
+    conn = sqlite3.connect(sys.argv[1] if len(sys.argv) > 1 else DB_PATH)
+    create_schema(conn)
+    
+    # Импорт здесь: queries.py сам импортирует этот модуль
+    from queries import dashboard_queries
+    
+    failed = 0
+    for name, (plan, problems) in check_query_plans(conn, dashboard_queries()).items():
+        print(f"{'OK ' if not problems else 'FAIL'} {name}")
+        for step in plan:
+            print(f"     {step}")
+        failed += bool(problems)
+    conn.close()
+    sys.exit(1 if failed else 0)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,216 @@
+"""
+Дисковый HTTP-кэш для коннекторов SCM Dashboard
+Общий для всех сессий кэш ответов с TTL, условной ревалидацией
+(ETag/Last-Modified) и LRU-вытеснением по суммарному размеру
+"""
+
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+import logging
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+logger = logging.getLogger(__name__)
+
+# Расположение и предельный размер кэша (можно переопределить через окружение)
+CACHE_PATH = os.environ.get('SCM_HTTP_CACHE_PATH', '.http_cache.sqlite')
+CACHE_MAX_SIZE = int(os.environ.get('SCM_HTTP_CACHE_MAX_MB', '200')) * 1024 * 1024
+
+def cache_key(method, url, params=None):
+    """Ключ кэша: метод + URL + отсортированные параметры запроса"""
+    if isinstance(params, dict):
+        params = params.items()
+    prepared = requests.Request(method.upper(), url, params=sorted(params or [])).prepare()
+    return hashlib.sha256(f"{prepared.method} {prepared.url}".encode('utf-8')).hexdigest()
+
+class ResponseCache:
+    """Хранилище ответов в SQLite с вытеснением давно не использованных записей"""
+    
+    def __init__(self, path=CACHE_PATH, max_size=CACHE_MAX_SIZE):
+        self.path = path
+        self.max_size = max_size
+        self.lock = threading.Lock()
+        self.stats = {'hits': 0, 'revalidated': 0, 'misses': 0, 'evicted': 0}
+        
+        self.conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                url TEXT,
+                status_code INTEGER,
+                headers TEXT,
+                content BLOB,
+                etag TEXT,
+                last_modified TEXT,
+                fetched_at REAL,
+                accessed_at REAL,
+                size INTEGER
+            )
+        ''')
+        self.conn.execute('CREATE INDEX IF NOT EXISTS idx_responses_accessed ON responses (accessed_at)')
+        self.conn.commit()
+        self.total_size = self.conn.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+    
+    def get(self, key):
+        """Запись кэша по ключу (с отметкой времени обращения) или None"""
+        with self.lock:
+            row = self.conn.execute('''
+                SELECT url, status_code, headers, content, etag, last_modified, fetched_at
+                FROM responses WHERE key = ?
+            ''', (key,)).fetchone()
+            if row is None:
+                return None
+            self.conn.execute('UPDATE responses SET accessed_at = ? WHERE key = ?', (time.time(), key))
+            self.conn.commit()
+        
+        url, status_code, headers, content, etag, last_modified, fetched_at = row
+        return {
+            'url': url,
+            'status_code': status_code,
+            'headers': json.loads(headers),
+            'content': content,
+            'etag': etag,
+            'last_modified': last_modified,
+            'fetched_at': fetched_at
+        }
+    
+    def fetched_at(self, key):
+        """Время последней загрузки/ревалидации записи без чтения тела"""
+        with self.lock:
+            row = self.conn.execute('SELECT fetched_at FROM responses WHERE key = ?', (key,)).fetchone()
+        return row[0] if row else None
+    
+    def set(self, key, response):
+        """Сохранение успешного ответа"""
+        content = response.content
+        now = time.time()
+        with self.lock:
+            old = self.conn.execute('SELECT size FROM responses WHERE key = ?', (key,)).fetchone()
+            self.conn.execute('''
+                INSERT OR REPLACE INTO responses
+                (key, url, status_code, headers, content, etag, last_modified, fetched_at, accessed_at, size)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (
+                key,
+                response.url,
+                response.status_code,
+                json.dumps(dict(response.headers)),
+                content,
+                response.headers.get('ETag'),
+                response.headers.get('Last-Modified'),
+                now,
+                now,
+                len(content)
+            ))
+            self.conn.commit()
+            self.total_size += len(content) - (old[0] if old else 0)
+            if self.total_size > self.max_size:
+                self._evict()
+    
+    def touch(self, key):
+        """Продление свежести записи после ответа 304 Not Modified"""
+        now = time.time()
+        with self.lock:
+            self.conn.execute('UPDATE responses SET fetched_at = ?, accessed_at = ? WHERE key = ?', (now, now, key))
+            self.conn.commit()
+    
+    def _evict(self):
+        """Удаление давно не использованных записей до 90% лимита (под self.lock)"""
+        target = self.max_size * 0.9
+        self.total_size = self.conn.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+        
+        evicted = []
+        for key, size in self.conn.execute('SELECT key, size FROM responses ORDER BY accessed_at'):
+            if self.total_size <= target:
+                break
+            evicted.append((key,))
+            self.total_size -= size
+        
+        self.conn.executemany('DELETE FROM responses WHERE key = ?', evicted)
+        self.conn.commit()
+        self.stats['evicted'] += len(evicted)
+        logger.info(f"HTTP-кэш: вытеснено {len(evicted)} записей")
+    
+    def clear(self):
+        """Полная очистка кэша"""
+        with self.lock:
+            self.conn.execute('DELETE FROM responses')
+            self.conn.commit()
+            self.total_size = 0
+
+_shared_cache = None
+_shared_cache_lock = threading.Lock()
+
+def get_response_cache():
+    """Общий для процесса экземпляр кэша"""
+    global _shared_cache
+    with _shared_cache_lock:
+        if _shared_cache is None:
+            _shared_cache = ResponseCache()
+        return _shared_cache
+
+def _cached_response(entry, request=None):
+    """Сборка requests.Response из записи кэша"""
+    response = requests.Response()
+    response.status_code = entry['status_code']
+    response.headers = CaseInsensitiveDict(entry['headers'])
+    response._content = entry['content']
+    response.url = entry['url']
+    response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+    response.request = request
+    response.from_cache = True
+    return response
+
+class CachedSession(requests.Session):
+    """requests.Session, кэширующая GET-запросы в общем дисковом кэше
+    
+    Свежие (моложе ttl секунд) ответы отдаются без обращения к сети,
+    устаревшие ревалидируются условным запросом If-None-Match /
+    If-Modified-Since, и при ответе 304 используется сохраненное тело.
+    """
+    
+    def __init__(self, ttl=3600, cache=None):
+        super().__init__()
+        self.ttl = ttl
+        self.cache = cache or get_response_cache()
+    
+    def is_fresh(self, url, params=None):
+        """Есть ли свежий ответ в кэше (запрос не пойдет в сеть)"""
+        fetched_at = self.cache.fetched_at(cache_key('GET', url, params))
+        return fetched_at is not None and time.time() - fetched_at < self.ttl
+    
+    def request(self, method, url, params=None, headers=None, **kwargs):
+        if method.upper() != 'GET' or not self.ttl:
+            return super().request(method, url, params=params, headers=headers, **kwargs)
+        
+        key = cache_key(method, url, params)
+        entry = self.cache.get(key)
+        
+        if entry and time.time() - entry['fetched_at'] < self.ttl:
+            self.cache.stats['hits'] += 1
+            return _cached_response(entry)
+        
+        headers = dict(headers or {})
+        if entry:
+            if entry['etag']:
+                headers['If-None-Match'] = entry['etag']
+            if entry['last_modified']:
+                headers['If-Modified-Since'] = entry['last_modified']
+        
+        response = super().request(method, url, params=params, headers=headers, **kwargs)
+        
+        if response.status_code == 304 and entry:
+            self.cache.stats['revalidated'] += 1
+            self.cache.touch(key)
+            return _cached_response(entry, response.request)
+        
+        self.cache.stats['misses'] += 1
+        if response.status_code == 200 and 'no-store' not in response.headers.get('Cache-Control', ''):
+            self.cache.set(key, response)
+        return response
@@ -0,0 +1,146 @@
+"""
+Расчет помесячных KPI (kpi_monthly) по фактам
+Показатели считаются по внедрениям, мерам поддержки и реестру ПО
+(real_solutions) векторно в pandas/NumPy. Пересчитываются только месяцы,
+отмеченные триггерами в kpi_dirty_months, поэтому стоимость обновления
+зависит от объема изменений, а не от всей истории
+"""
+
+import logging
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Статусы, при которых внедрение входит в impl_count (см. README: KPI и метрики)
+COUNTED_STATUSES = ('go-live', 'pilot_ok')
+
+# Программы поддержки НИОКР: их доля в сумме поддержки - компонент R&D_share индекса ИТИ
+RD_PROGRAMS = ('Инновационные проекты',)
+
+# Веса компонентов ИТИ: w1 - доля отечественного ПО, w2 - доля внедрений решений
+# из реестра отечественного ПО (локальные компоненты), w3 - доля поддержки НИОКР.
+# Компонент без данных за месяц не учитывается, веса остальных нормируются
+ISI_WEIGHTS = {
+    'domestic_share': 0.5,
+    'local_components': 0.3,
+    'rd_share': 0.2
+}
+
+# Столбцы kpi_monthly в порядке таблицы
+KPI_COLUMNS = [
+    'date_month', 'year', 'quarter', 'impl_count', 'domestic_impl_count', 'domestic_share_pct',
+    'total_econ_effect', 'avg_econ_effect', 'support_count', 'total_support_amount',
+    'support_coverage_pct', 'isi_index'
+]
+
+def month_ranges(months):
+    """Непрерывные серии месяцев 'YYYY-MM' как полуинтервалы дат [начало, конец)"""
+    values = np.unique(np.asarray(months, dtype='datetime64[M]'))
+    breaks = np.flatnonzero(np.diff(values.astype(int)) != 1) + 1
+    return [(f'{run[0]}-01', f'{run[-1] + 1}-01') for run in np.split(values, breaks) if len(run)]
+
+def _period_condition(column, ranges):
+    """Условие попадания даты в серии месяцев (каждая серия - диапазон по индексу) и параметры"""
+    condition = ' OR '.join(f'({column} >= ? AND {column} < ?)' for _ in ranges)
+    return f'({condition})', [bound for period in ranges for bound in period]
+
+def compute_kpi_monthly(conn, months):
+    """KPI за месяцы 'YYYY-MM' в виде DataFrame со столбцами kpi_monthly
+    
+    Исходные строки агрегируются в SQL по индексам дат только за эти месяцы,
+    производные показатели считаются по столбцам. Месяцы без засчитанных
+    внедрений в результат не входят.
+    """
+    ranges = month_ranges(months)
+    if not ranges:
+        return pd.DataFrame(columns=KPI_COLUMNS)
+    
+    impl_period, impl_params = _period_condition('date_go_live', ranges)
+    implementations = pd.read_sql_query(f'''
+        SELECT substr(date_go_live, 1, 7) AS month,
+               COUNT(*) AS impl_count,
+               SUM(is_domestic) AS domestic_impl_count,
+               SUM(revenue_uplift + opex_delta) AS total_econ_effect,
+               SUM(vendor_name IN (SELECT vendor FROM real_solutions WHERE is_domestic)) AS registry_count
+        FROM implementations
+        WHERE status IN ({", ".join("?" * len(COUNTED_STATUSES))}) AND {impl_period}
+        GROUP BY 1
+    ''', conn, params=list(COUNTED_STATUSES) + impl_params)
+    
+    support_period, support_params = _period_condition('approval_date', ranges)
+    support = pd.read_sql_query(f'''
+        SELECT substr(approval_date, 1, 7) AS month,
+               COUNT(*) AS support_count,
+               SUM(amount_rub) AS total_support_amount,
+               SUM(CAST(amount_rub AS REAL) / NULLIF(cost_per_impl, 0)) AS funded_impls,
+               SUM(CASE WHEN program_name IN ({", ".join("?" * len(RD_PROGRAMS))}) THEN amount_rub ELSE 0 END) AS rd_amount
+        FROM support_measures
+        WHERE {support_period}
+        GROUP BY 1
+    ''', conn, params=list(RD_PROGRAMS) + support_params)
+    
+    registry_size = conn.execute('SELECT COUNT(*) FROM real_solutions WHERE is_domestic').fetchone()[0]
+    
+    kpi = implementations.merge(support, on='month', how='left')
+    support_columns = ['support_count', 'total_support_amount', 'funded_impls', 'rd_amount']
+    kpi[support_columns] = kpi[support_columns].fillna(0)
+    
+    impl_count = kpi['impl_count'].to_numpy(dtype=float)
+    domestic = kpi['domestic_impl_count'].fillna(0).to_numpy(dtype=float)
+    effect = kpi['total_econ_effect'].fillna(0).to_numpy(dtype=float)
+    support_amount = kpi['total_support_amount'].to_numpy(dtype=float)
+    
+    kpi['domestic_impl_count'] = domestic
+    kpi['total_econ_effect'] = effect
+    kpi['domestic_share_pct'] = domestic / impl_count * 100
+    kpi['avg_econ_effect'] = effect / impl_count
+    # Охват: внедрения, которые покрывает сумма поддержки по стоимости внедрения, но не больше всех внедрений
+    kpi['support_coverage_pct'] = np.minimum(impl_count, kpi['funded_impls'].to_numpy(dtype=float)) / impl_count * 100
+    
+    with np.errstate(divide='ignore', invalid='ignore'):
+        components = pd.DataFrame({
+            'domestic_share': domestic / impl_count,
+            'local_components': kpi['registry_count'].to_numpy(dtype=float) / impl_count if registry_size else np.nan,
+            'rd_share': np.where(support_amount > 0, kpi['rd_amount'].to_numpy(dtype=float) / support_amount, np.nan)
+        })
+    weights = pd.Series(ISI_WEIGHTS)
+    kpi['isi_index'] = (components.fillna(0) * weights).sum(axis=1) / (components.notna() * weights).sum(axis=1)
+    
+    # date_month - последний день месяца
+    month_start = kpi['month'].to_numpy(dtype='datetime64[M]')
+    kpi['date_month'] = ((month_start + 1).astype('datetime64[D]') - 1).astype(str)
+    kpi['year'] = month_start.astype('datetime64[Y]').astype(int) + 1970
+    kpi['quarter'] = month_start.astype(int) % 12 // 3 + 1
+    return kpi[KPI_COLUMNS].sort_values('date_month', ignore_index=True)
+
+def refresh_kpi_monthly(conn):
+    """Пересчет KPI месяцев из kpi_dirty_months; возвращает число пересчитанных месяцев
+    
+    Выполняется в текущей транзакции conn (фиксирует вызывающий, вместе с
+    загрузкой и увеличением версии данных).
+    """
+    dirty = [month for month, in conn.execute('SELECT month FROM kpi_dirty_months')]
+    if not dirty:
+        return 0
+    
+    # Некорректные даты в исходных строках дают месяцы, которые нечего пересчитывать;
+    # KPI архивных месяцев (archive.py) сохраняются - их внедрений в базе уже нет
+    parsed = pd.to_datetime(pd.Series(dirty), format='%Y-%m', errors='coerce').dropna()
+    archived = {month for month, in conn.execute(
+        "SELECT month FROM archive_partitions WHERE table_name = 'implementations'"
+    )}
+    months = [month for month in parsed.dt.strftime('%Y-%m') if month not in archived]
+    kpi = compute_kpi_monthly(conn, months)
+    
+    month_ends = ((np.asarray(months, dtype='datetime64[M]') + 1).astype('datetime64[D]') - 1).astype(str)
+    conn.executemany('DELETE FROM kpi_monthly WHERE date_month = ?', [(month,) for month in month_ends.tolist()])
+    conn.executemany(
+        f'INSERT INTO kpi_monthly ({", ".join(KPI_COLUMNS)}) VALUES ({", ".join("?" * len(KPI_COLUMNS))})',
+        kpi.astype(object).where(kpi.notna(), None).itertuples(index=False, name=None)
+    )
+    conn.executemany('DELETE FROM kpi_dirty_months WHERE month = ?', [(month,) for month in dirty])
+    
+    logger.info(f"Пересчитаны KPI за {len(months)} мес. ({len(kpi)} с внедрениями)")
+    return len(months)
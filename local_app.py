@@ -9,11 +9,24 @@ import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 import numpy as np
-import sqlite3
 from datetime import datetime, timedelta
-import random
 import os
-from data_sources import DataAggregator, create_real_data_tables
+import json
+import time
+from database import DB_PATH, ConnectionManager, KPI_QUERY, bump_data_version
+from refresh_worker import RefreshWorker, ACTIVE_STATUSES
+from synthetic_data import load_synthetic_data
+from kpi_engine import refresh_kpi_monthly
+from archive import archive_cold_partitions
+from storage import create_storage
+from queries import chart_query, CHART_QUERIES
+from caching import cached_query, cached_figure, QUERY_CACHE, FIGURE_CACHE
+from charts import line_chart, log_payload
+from crossfilter import CrossfilterIndex, DIMENSIONS
+from scenarios import ScenarioModel, grid_search
+
+# st.fragment появился в новых версиях Streamlit (ранее - experimental_fragment)
+_fragment = getattr(st, 'fragment', None) or getattr(st, 'experimental_fragment', None)
 
 # Настройка страницы
 st.set_page_config(
@@ -113,69 +126,19 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-def init_database():
-    """Инициализация локальной базы данных SQLite"""
-    conn = sqlite3.connect('scm_dashboard.db')
-    cursor = conn.cursor()
-    
-    # Создание таблиц для синтетических данных
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS implementations (
-            impl_id INTEGER PRIMARY KEY,
-            org_name TEXT,
-            solution_name TEXT,
-            vendor_name TEXT,
-            class_scm TEXT,
-            region_name TEXT,
-            industry_name TEXT,
-            date_go_live DATE,
-            status TEXT,
-            is_domestic BOOLEAN,
-            capex INTEGER,
-            revenue_uplift INTEGER,
-            opex_delta INTEGER,
-            inv_turnover_delta REAL,
-            lead_time_delta REAL,
-            penalties_delta INTEGER
-        )
-    ''')
-    
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS kpi_monthly (
-            date_month DATE PRIMARY KEY,
-            year INTEGER,
-            quarter INTEGER,
-            impl_count INTEGER,
-            domestic_impl_count INTEGER,
-            domestic_share_pct REAL,
-            total_econ_effect INTEGER,
-            avg_econ_effect REAL,
-            support_count INTEGER,
-            total_support_amount INTEGER,
-            support_coverage_pct REAL,
-            isi_index REAL
-        )
-    ''')
-    
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS support_measures (
-            support_id INTEGER PRIMARY KEY,
-            program_name TEXT,
-            measure_type TEXT,
-            recipient_name TEXT,
-            amount_rub INTEGER,
-            approval_date DATE,
-            disbursement_date DATE,
-            roi_pct REAL,
-            cost_per_impl INTEGER
-        )
-    ''')
-    
-    # Создание таблиц для реальных данных
-    create_real_data_tables(conn)
-    
-    conn.commit()
-    return conn
+@st.cache_resource
+def get_database():
+    """Инициализация локальной базы данных SQLite - один раз на процесс
+    
+    Схема, миграции и демонстрационные данные создаются при первом вызове;
+    последующие перезапуски скрипта получают готовый менеджер соединений.
+    """
+    database = ConnectionManager(DB_PATH)
+    with database.writer() as conn:
+        generate_and_load_data(conn)
+        # История старше горизонта хранится в сжатом архиве (см. archive.py)
+        archive_cold_partitions(conn)
+    return database
 
 def generate_and_load_data(conn):
     """Генерация и загрузка демонстрационных данных"""
@@ -184,148 +147,142 @@ def generate_and_load_data(conn):
     # Проверяем, есть ли уже данные
     cursor.execute('SELECT COUNT(*) FROM implementations')
     if cursor.fetchone()[0] > 0:
-        return  # Данные уже загружены
-    
-    # Генерация данных по внедрениям
-    np.random.seed(42)
-    n_implementations = 1250
-    
-    regions = ['Москва', 'Санкт-Петербург', 'Новосибирск', 'Екатеринбург', 'Казань', 'Нижний Новгород', 'Челябинск', 'Самара']
-    industries = ['Производство', 'Логистика', 'Розничная торговля', 'Оптовая торговля', 'Строительство', 'Энергетика']
-    vendors = ['1C', 'SAP', 'Oracle', 'Microsoft', 'Логика', 'Галактика', 'Битрикс24', 'АйТи']
-    solutions = ['1C:Управление складом', 'SAP WMS', 'Oracle TMS', 'Microsoft Dynamics', 'Логика SCM', 'Галактика ERP']
-    scm_classes = ['WMS', 'TMS', 'S&OP', 'APS', 'OMS', 'Procurement']
-    
-    implementations = []
-    for i in range(n_implementations):
-        impl = (
-            i + 1,
-            f'ООО "Компания {i+1}"',
-            random.choice(solutions),
-            random.choice(vendors),
-            random.choice(scm_classes),
-            random.choice(regions),
-            random.choice(industries),
-            (datetime.now() - timedelta(days=random.randint(30, 1095))).strftime('%Y-%m-%d'),
-            random.choices(['go-live', 'pilot_ok', 'pilot', 'planned'], weights=[60, 20, 15, 5])[0],
-            random.choice([True, False]),
-            random.randint(500000, 50000000),
-            random.randint(1000000, 20000000),
-            random.randint(-500000, 2000000),
-            random.uniform(0.1, 2.0),
-            random.uniform(-5, 15),
-            random.randint(-100000, 500000)
-        )
-        implementations.append(impl)
+        # Данные уже загружены; KPI, отмеченные миграцией или прерванной загрузкой, пересчитываются
+        if refresh_kpi_monthly(conn):
+            bump_data_version(conn)
+        return
     
-    # Загрузка данных о внедрениях
-    cursor.executemany('''
-        INSERT INTO implementations VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-    ''', implementations)
+    # Векторизованный генератор с фиксированным зерном (см. synthetic_data.py)
+    load_synthetic_data(conn, n_implementations=1250, n_support=500, seed=42)
+
+def current_data_version():
+    """Версия данных в базе; входит в ключи кэша запросов"""
+    return get_database().data_version()
+
+@st.cache_resource
+def get_storage():
+    """Хранилище для запросов дашборда (SQLite или DuckDB, см. storage.py)"""
+    storage = create_storage(get_database())
+    # Графики вида по умолчанию готовы до открытия страницы
+    prewarm_figures(storage)
+    return storage
+
+@st.cache_resource
+def get_refresh_worker():
+    """Единый на процесс фоновый обработчик обновления данных
+    
+    После каждой загрузки обработчик строит индекс фильтров и графики вида
+    по умолчанию для новой версии данных, и страницы получают их уже из кэша.
+    """
+    return RefreshWorker(get_database(), on_refresh=lambda: prewarm_figures(get_storage()))
+
+def poll_fragment(interval):
+    """Фрагмент страницы, перерисовываемый каждые interval секунд отдельно от нее"""
+    def decorate(func):
+        return _fragment(func, run_every=interval) if _fragment else func
+    return decorate
+
+@poll_fragment(3)
+def render_refresh_status():
+    """Статус фонового обновления данных (не блокирует страницу)"""
+    job = get_refresh_worker().get_job()
+    if not job:
+        return
     
-    # Генерация KPI данных
-    months = pd.date_range(start='2023-01-01', end='2024-12-31', freq='ME')
-    kpi_data = []
+    if job['status'] in ACTIVE_STATUSES:
+        st.session_state['refresh_job_id'] = job['job_id']
+        st.progress(job['progress'] or 0.0, text=f"Обновление данных: {job['message']}")
+        return
     
-    for month in months:
-        month_impl = [impl for impl in implementations 
-                     if impl[7][:7] == month.strftime('%Y-%m')]
-        
-        domestic_count = sum(1 for impl in month_impl if impl[9])
-        total_count = len(month_impl)
-        
-        kpi = (
-            month.strftime('%Y-%m-%d'),  # Конвертируем в строку
-            month.year,
-            (month.month - 1) // 3 + 1,
-            total_count,
-            domestic_count,
-            (domestic_count / total_count * 100) if total_count > 0 else 0,
-            sum(impl[11] + impl[12] for impl in month_impl),
-            (sum(impl[11] + impl[12] for impl in month_impl) / total_count) if total_count > 0 else 0,
-            random.randint(10, 50),
-            random.randint(50000000, 200000000),
-            random.uniform(60, 85),
-            random.uniform(0.6, 0.8)
-        )
-        kpi_data.append(kpi)
-    
-    # Загрузка KPI данных
-    cursor.executemany('''
-        INSERT INTO kpi_monthly VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-    ''', kpi_data)
-    
-    # Генерация данных по поддержке
-    support_data = []
-    programs = ['Поддержка SCM-решений 2024', 'Цифровизация промышленности', 'Импортозамещение ПО', 'Инновационные проекты']
-    measure_types = ['subsidy', 'grant', 'tax_benefit', 'state_order']
-    
-    for i in range(500):
-        support = (
-            i + 1,
-            random.choice(programs),
-            random.choice(measure_types),
-            f'ООО "Получатель {i+1}"',
-            random.randint(1000000, 10000000),
-            (datetime.now() - timedelta(days=random.randint(30, 365))).strftime('%Y-%m-%d'),
-            (datetime.now() - timedelta(days=random.randint(10, 300))).strftime('%Y-%m-%d'),
-            random.uniform(50, 200),
-            random.randint(500000, 5000000)
-        )
-        support_data.append(support)
-    
-    # Загрузка данных о поддержке
-    cursor.executemany('''
-        INSERT INTO support_measures VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-    ''', support_data)
-    
-    conn.commit()
-
-def collect_real_data():
-    """Сбор реальных данных из источников"""
-    try:
-        aggregator = DataAggregator()
-        data = aggregator.collect_all_data()
-        return data
-    except Exception as e:
-        st.error(f"Ошибка сбора реальных данных: {e}")
-        return None
-
-@st.cache_data
-def get_kpi_data(_conn, months_back=12):
-    """Получение KPI данных"""
-    cutoff_date = datetime.now() - timedelta(days=months_back * 30)
-    
-    query = '''
-        SELECT * FROM kpi_monthly 
-        WHERE date_month >= ? 
-        ORDER BY date_month
-    '''
-    
-    df = pd.read_sql_query(query, _conn, params=[cutoff_date])
-    df['date_month'] = pd.to_datetime(df['date_month'])
-    return df
-
-@st.cache_data
-def get_implementation_data(_conn, months_back=12):
-    """Получение данных о внедрениях"""
-    cutoff_date = datetime.now() - timedelta(days=months_back * 30)
-    
-    query = '''
-        SELECT * FROM implementations 
-        WHERE date_go_live >= ? 
-        ORDER BY date_go_live
-    '''
-    
-    df = pd.read_sql_query(query, _conn, params=[cutoff_date])
-    df['date_go_live'] = pd.to_datetime(df['date_go_live'])
-    return df
-
-@st.cache_data
-def get_support_data(_conn):
-    """Получение данных о поддержке"""
-    query = 'SELECT * FROM support_measures ORDER BY approval_date'
-    return pd.read_sql_query(query, _conn)
+    if job['status'] == 'done':
+        st.caption(f"Обновлено {job['finished_at']}: {job['message']}")
+    else:
+        st.caption(f"Обновление не удалось: {job['message']}")
+    
+    # Задание, за которым следила сессия, завершилось - перечитываем данные
+    # (загрузка увеличила версию данных, кэш прежней версии не используется)
+    if st.session_state.get('refresh_job_id') == job['job_id']:
+        del st.session_state['refresh_job_id']
+        st.rerun()
+
+# Показатели kpi_monthly по мерам поддержки: меры не относятся к регионам, отраслям
+# и вендорам, поэтому при фильтрах берутся из kpi_monthly без отбора
+KPI_SUPPORT_COLUMNS = ['support_count', 'total_support_amount', 'support_coverage_pct']
+
+@cached_query(current_data_version)
+def get_kpi_data(_storage, period_start, filters=None):
+    """Получение KPI данных с месяца period_start ('YYYY-MM')
+    
+    Период задается первым месяцем, а не числом месяцев: после смены
+    месяца ключ кэша меняется и без новой загрузки данных.
+    С фильтрами показатели внедрений пересчитываются по месяцам из индекса
+    перекрестной фильтрации, показатели поддержки - из kpi_monthly.
+    """
+    # Первое число месяца строкой в формате столбца (date_month - последний день месяца),
+    # чтобы сравнение шло по индексу
+    cutoff_date = f'{period_start}-01'
+    
+    # Типы столбцов (даты, категории, узкие числа) задаются при чтении, см. storage.COLUMN_TYPES
+    kpi_data = _storage.read(KPI_QUERY, [cutoff_date], name='kpi_monthly')
+    if not filters:
+        return kpi_data
+    
+    filtered = get_crossfilter_index(get_database()).monthly_kpi(period_start, filters)
+    return filtered.merge(kpi_data[['date_month'] + KPI_SUPPORT_COLUMNS], on='date_month', how='left')
+
+@cached_query(current_data_version)
+def get_crossfilter_index(_database):
+    """Индекс перекрестной фильтрации внедрений (см. crossfilter.py); строится заново при смене версии данных"""
+    return CrossfilterIndex.from_database(_database)
+
+@cached_query(current_data_version)
+def get_scenario_model(_database):
+    """Модель сценариев бюджета поддержки (см. scenarios.py)"""
+    return ScenarioModel.from_database(_database)
+
+@cached_query(current_data_version)
+def get_chart_data(_storage, chart, period_start=None, filters=None):
+    """Агрегированные данные графика: группировка и отбор выполняются в базе
+    
+    period_start - первый месяц периода 'YYYY-MM', filters - {столбец: значения}.
+    Графики внедрений с фильтрами и периодом пересчитываются по индексу в
+    памяти: он покрывает горизонт базы без архивных месяцев.
+    """
+    if filters and period_start and CHART_QUERIES[chart]['source'] == 'implementations':
+        return get_crossfilter_index(get_database()).chart(chart, period_start, filters)
+    query, params = chart_query(chart, period_start, filters)
+    return _storage.read(query, params, name=chart)
+
+def period_start_month(months_back):
+    """Первый месяц периода из последних months_back месяцев"""
+    return (datetime.now() - timedelta(days=months_back * 30)).strftime('%Y-%m')
+
+def figure_state(state):
+    """Значения входов раздела для ключа кэша графиков
+    
+    Период входит в ключ первым месяцем: при смене месяца окно сдвигается
+    без новой загрузки (версия данных та же), и график строится заново.
+    """
+    state = dict(state)
+    if 'period_months' in state:
+        state['period_start'] = period_start_month(state.pop('period_months'))
+    return state
+
+def show_chart(name, state, data):
+    """Вывод графика name по данным раздела из кэша графиков
+    
+    state - значения входов раздела (период, фильтры): вместе с версией
+    данных они определяют график, поэтому при попадании он не строится.
+    """
+    spec = cached_figure(name, figure_state(state), current_data_version(), lambda: serialize_figure(name, data))
+    st.plotly_chart(json.loads(spec), use_container_width=True)
+
+def serialize_figure(name, data):
+    """Построение графика name и его JSON; размер JSON пишется в лог (см. charts.py)"""
+    fig = FIGURES[name](data)
+    payload = fig.to_json()
+    log_payload(name, fig, payload)
+    return payload
 
 def render_kpi_cards(kpi_data):
     """Отображение KPI карточек"""
@@ -362,166 +319,467 @@ def render_kpi_cards(kpi_data):
         st.metric(
             label="Охват поддержкой",
             value=f"{latest_data['support_coverage_pct']:.1f}%",
-            delta=f"{latest_data['support_count']:,.0f} мер поддержки"
+            delta=f"{latest_data['support_count']:,.0f} мер поддержки",
+            help="Меры поддержки не относятся к регионам, отраслям и вендорам: фильтры на показатель не влияют"
         )
 
-def render_trend_charts(kpi_data):
+def build_impl_trend(kpi_data):
+    """График динамики внедрений (длинные ряды прореживаются, см. charts.py)"""
+    fig = line_chart(
+        kpi_data,
+        x='date_month', 
+        y='impl_count',
+        title='Динамика внедрений SCM-решений',
+        labels={'impl_count': 'Количество внедрений', 'date_month': 'Месяц'}
+    )
+    fig.update_layout(height=400)
+    return fig
+
+def build_domestic_trend(kpi_data):
+    """График доли отечественного ПО"""
+    fig = line_chart(
+        kpi_data,
+        x='date_month', 
+        y='domestic_share_pct',
+        title='Доля отечественного ПО (%)',
+        labels={'domestic_share_pct': 'Доля (%)', 'date_month': 'Месяц'}
+    )
+    fig.update_layout(height=400)
+    return fig
+
+def build_regions(regional_summary):
+    """Топ-10 регионов по внедрениям (доля и отбор посчитаны в запросе)"""
+    fig = px.bar(
+        regional_summary,
+        x='impl_count',
+        y='region_name',
+        orientation='h',
+        title='Топ-10 регионов по внедрениям',
+        labels={'impl_count': 'Количество внедрений', 'region_name': 'Регион'}
+    )
+    fig.update_layout(height=500)
+    return fig
+
+def build_regions_domestic_share(regional_summary):
+    fig = px.bar(
+        regional_summary,
+        x='domestic_share',
+        y='region_name',
+        orientation='h',
+        title='Доля отечественного ПО по регионам (%)',
+        labels={'domestic_share': 'Доля (%)', 'region_name': 'Регион'}
+    )
+    fig.update_layout(height=500)
+    return fig
+
+def build_industries(industry_summary):
+    """Распределение внедрений по отраслям (топ-10 по числу внедрений)"""
+    fig = px.pie(
+        industry_summary,
+        values='impl_count',
+        names='industry_name',
+        title='Распределение внедрений по отраслям'
+    )
+    fig.update_layout(height=500)
+    return fig
+
+def build_industries_effect(industry_summary):
+    fig = px.bar(
+        industry_summary,
+        x='revenue_uplift',
+        y='industry_name',
+        orientation='h',
+        title='Экономический эффект по отраслям (₽)',
+        labels={'revenue_uplift': 'Эффект (₽)', 'industry_name': 'Отрасль'}
+    )
+    fig.update_layout(height=500)
+    return fig
+
+def build_programs(program_summary):
+    """Объем поддержки по программам (топ-10 по объему)"""
+    fig = px.bar(
+        program_summary,
+        x='amount_rub',
+        y='program_name',
+        orientation='h',
+        title='Объем поддержки по программам (₽)',
+        labels={'amount_rub': 'Сумма (₽)', 'program_name': 'Программа'}
+    )
+    fig.update_layout(height=500)
+    return fig
+
+def build_programs_roi(program_summary):
+    fig = px.bar(
+        program_summary,
+        x='roi_pct',
+        y='program_name',
+        orientation='h',
+        title='ROI по программам (%)',
+        labels={'roi_pct': 'ROI (%)', 'program_name': 'Программа'}
+    )
+    fig.update_layout(height=500)
+    return fig
+
+def build_scenario_frontier(scenario_data):
+    """Эффект в зависимости от общего бюджета: оптимальное и базовое распределение"""
+    fig = px.line(
+        scenario_data['frontier'],
+        x='budget_mln',
+        y='effect_bln',
+        color='allocation',
+        title='Экономический эффект от бюджета поддержки',
+        labels={'budget_mln': 'Бюджет (млн ₽)', 'effect_bln': 'Эффект (млрд ₽)', 'allocation': 'Распределение'}
+    )
+    current = scenario_data['current']
+    fig.add_scatter(x=[current['budget_mln']], y=[current['effect_bln']], mode='markers',
+                    marker={'size': 12, 'symbol': 'diamond'}, name='Сценарий')
+    fig.update_layout(height=450)
+    return fig
+
+def build_scenario_allocation(scenario_data):
+    """Бюджеты программ в сценарии и в оптимальном распределении того же бюджета"""
+    fig = px.bar(
+        scenario_data['allocation'],
+        x='amount_mln',
+        y='program_name',
+        color='allocation',
+        barmode='group',
+        orientation='h',
+        title='Распределение бюджета по программам (млн ₽)',
+        labels={'amount_mln': 'Бюджет (млн ₽)', 'program_name': 'Программа', 'allocation': 'Распределение'}
+    )
+    fig.update_layout(height=450)
+    return fig
+
+# Построение графиков страницы по данным раздела: имя графика -> функция
+FIGURES = {
+    'impl_trend': build_impl_trend,
+    'domestic_trend': build_domestic_trend,
+    'regions': build_regions,
+    'regions_domestic_share': build_regions_domestic_share,
+    'industries': build_industries,
+    'industries_effect': build_industries_effect,
+    'programs': build_programs,
+    'programs_roi': build_programs_roi,
+    'scenario_frontier': build_scenario_frontier,
+    'scenario_allocation': build_scenario_allocation
+}
+
+def render_chart_pair(names, state, data):
+    """Два графика раздела рядом"""
+    for column, name in zip(st.columns(2), names):
+        with column:
+            show_chart(name, state, data)
+
+def render_trend_charts(kpi_data, state):
     """Отображение трендовых графиков"""
     if kpi_data.empty:
         return
-    
-    col1, col2 = st.columns(2)
-    
-    with col1:
-        # График динамики внедрений
-        fig_impl = px.line(
-            kpi_data, 
-            x='date_month', 
-            y='impl_count',
-            title='Динамика внедрений SCM-решений',
-            labels={'impl_count': 'Количество внедрений', 'date_month': 'Месяц'}
-        )
-        fig_impl.update_layout(height=400)
-        st.plotly_chart(fig_impl, use_container_width=True)
-    
-    with col2:
-        # График доли отечественного ПО
-        fig_domestic = px.line(
-            kpi_data, 
-            x='date_month', 
-            y='domestic_share_pct',
-            title='Доля отечественного ПО (%)',
-            labels={'domestic_share_pct': 'Доля (%)', 'date_month': 'Месяц'}
-        )
-        fig_domestic.update_layout(height=400)
-        st.plotly_chart(fig_domestic, use_container_width=True)
+    render_chart_pair(['impl_trend', 'domestic_trend'], state, kpi_data)
 
-def render_regional_analysis(impl_data):
+def render_regional_analysis(regional_summary, state):
     """Отображение регионального анализа"""
-    if impl_data.empty:
+    if regional_summary.empty:
         return
     
     st.subheader("Региональный анализ")
-    
-    # Топ-10 регионов по внедрениям
-    regional_summary = impl_data.groupby('region_name').agg({
-        'impl_id': 'count',
-        'is_domestic': 'sum',
-        'capex': 'sum'
-    }).reset_index()
-    
-    regional_summary['domestic_share'] = (regional_summary['is_domestic'] / regional_summary['impl_id'] * 100).round(1)
-    regional_summary = regional_summary.sort_values('impl_id', ascending=False).head(10)
-    
-    col1, col2 = st.columns(2)
-    
-    with col1:
-        fig_regions = px.bar(
-            regional_summary,
-            x='impl_id',
-            y='region_name',
-            orientation='h',
-            title='Топ-10 регионов по внедрениям',
-            labels={'impl_id': 'Количество внедрений', 'region_name': 'Регион'}
-        )
-        fig_regions.update_layout(height=500)
-        st.plotly_chart(fig_regions, use_container_width=True)
-    
-    with col2:
-        fig_domestic_share = px.bar(
-            regional_summary,
-            x='domestic_share',
-            y='region_name',
-            orientation='h',
-            title='Доля отечественного ПО по регионам (%)',
-            labels={'domestic_share': 'Доля (%)', 'region_name': 'Регион'}
-        )
-        fig_domestic_share.update_layout(height=500)
-        st.plotly_chart(fig_domestic_share, use_container_width=True)
+    render_chart_pair(['regions', 'regions_domestic_share'], state, regional_summary)
 
-def render_industry_analysis(impl_data):
+def render_industry_analysis(industry_summary, state):
     """Отображение отраслевого анализа"""
-    if impl_data.empty:
+    if industry_summary.empty:
         return
     
     st.subheader("Отраслевой анализ")
-    
-    # Анализ по отраслям
-    industry_summary = impl_data.groupby('industry_name').agg({
-        'impl_id': 'count',
-        'is_domestic': 'sum',
-        'capex': 'sum',
-        'revenue_uplift': 'sum'
-    }).reset_index()
-    
-    industry_summary['domestic_share'] = (industry_summary['is_domestic'] / industry_summary['impl_id'] * 100).round(1)
-    industry_summary = industry_summary.sort_values('impl_id', ascending=False).head(10)
-    
-    col1, col2 = st.columns(2)
-    
-    with col1:
-        fig_industry = px.pie(
-            industry_summary,
-            values='impl_id',
-            names='industry_name',
-            title='Распределение внедрений по отраслям'
-        )
-        fig_industry.update_layout(height=500)
-        st.plotly_chart(fig_industry, use_container_width=True)
-    
-    with col2:
-        fig_industry_effect = px.bar(
-            industry_summary,
-            x='revenue_uplift',
-            y='industry_name',
-            orientation='h',
-            title='Экономический эффект по отраслям (₽)',
-            labels={'revenue_uplift': 'Эффект (₽)', 'industry_name': 'Отрасль'}
-        )
-        fig_industry_effect.update_layout(height=500)
-        st.plotly_chart(fig_industry_effect, use_container_width=True)
+    render_chart_pair(['industries', 'industries_effect'], state, industry_summary)
 
-def render_support_analysis(support_data):
+def render_support_analysis(program_summary, state):
     """Отображение анализа поддержки"""
-    if support_data.empty:
+    if program_summary.empty:
         return
     
     st.subheader("Анализ эффективности поддержки")
+    render_chart_pair(['programs', 'programs_roi'], state, program_summary)
+
+def render_period_totals(storage, period_months, filters):
+    """Число внедрений за период с учетом фильтров рядом с фильтрами"""
+    impl_total = get_chart_data(storage, 'implementation_totals', period_start_month(period_months), filters)
+    st.metric("Всего внедрений за период", f"{impl_total['impl_count'].iloc[0] if len(impl_total) else 0:,.0f}")
+
+def render_kpi_section(storage, period_months, filters):
+    st.header("Ключевые показатели")
+    render_kpi_cards(get_kpi_data(storage, period_start_month(period_months), filters))
+
+def load_trend_data(storage, period_months, filters):
+    return get_kpi_data(storage, period_start_month(period_months), filters)
+
+def load_regional_data(storage, period_months, filters):
+    # Графики получают только агрегаты: из базы (см. queries.py) или из индекса фильтров
+    return get_chart_data(storage, 'regions', period_start_month(period_months), filters)
+
+def load_industry_data(storage, period_months, filters):
+    return get_chart_data(storage, 'industries', period_start_month(period_months), filters)
+
+def load_support_data(storage):
+    return get_chart_data(storage, 'programs')
+
+def render_trend_section(storage, period_months, filters):
+    st.header("Динамика показателей")
+    state = {'period_months': period_months, 'filters': filters}
+    render_trend_charts(load_trend_data(storage, **state), state)
+
+def render_regional_section(storage, period_months, filters):
+    state = {'period_months': period_months, 'filters': filters}
+    render_regional_analysis(load_regional_data(storage, **state), state)
+
+def render_industry_section(storage, period_months, filters):
+    state = {'period_months': period_months, 'filters': filters}
+    render_industry_analysis(load_industry_data(storage, **state), state)
+
+def render_support_section(storage):
+    render_support_analysis(load_support_data(storage), {})
+
+def scenario_data(model, allocation):
+    """Данные графиков сценария: кривые эффекта от бюджета, текущая точка и распределения по программам"""
+    budget = allocation.sum()
+    budgets = np.linspace(0, 2 * max(budget, model.baseline_budget), 61)
+    # Все бюджеты кривой считаются одним вызовом (массив распределений)
+    curves = {
+        'Оптимальное': model.optimize(budgets),
+        'Пропорционально базовому': budgets[:, None] * model.baseline / model.baseline_budget
+    }
+    frontier = pd.concat([
+        pd.DataFrame({'budget_mln': budgets / 1e6, 'effect_bln': model.evaluate(allocations)['econ_effect'] / 1e9,
+                      'allocation': name})
+        for name, allocations in curves.items()
+    ], ignore_index=True)
+    allocations = {'Сценарий': allocation, 'Оптимальное': model.optimize(budget)}
+    return {
+        'frontier': frontier,
+        'current': {'budget_mln': budget / 1e6, 'effect_bln': model.evaluate(allocation)['econ_effect'] / 1e9},
+        'allocation': pd.concat([
+            pd.DataFrame({'program_name': model.programs, 'amount_mln': amounts / 1e6, 'allocation': name})
+            for name, amounts in allocations.items()
+        ], ignore_index=True)
+    }
+
+def render_scenario_section(storage, scenario):
+    """Показатели сценария против базового распределения и графики сценария"""
+    model = get_scenario_model(get_database())
+    if not model.programs:
+        st.info("Нет данных о мерах поддержки для сценариев")
+        return
+    allocation = np.asarray(scenario, dtype=float)
+    baseline, current = (
+        {name: values[row] for name, values in model.evaluate(np.vstack([model.baseline, allocation])).items()}
+        for row in (0, 1)
+    )
     
-    # Сводка по программам поддержки
-    program_summary = support_data.groupby('program_name').agg({
-        'support_id': 'count',
-        'amount_rub': 'sum',
-        'roi_pct': 'mean'
-    }).reset_index()
-    
-    program_summary = program_summary.sort_values('amount_rub', ascending=False).head(10)
-    
-    col1, col2 = st.columns(2)
-    
+    col1, col2, col3, col4 = st.columns(4)
     with col1:
-        fig_programs = px.bar(
-            program_summary,
-            x='amount_rub',
-            y='program_name',
-            orientation='h',
-            title='Объем поддержки по программам (₽)',
-            labels={'amount_rub': 'Сумма (₽)', 'program_name': 'Программа'}
-        )
-        fig_programs.update_layout(height=500)
-        st.plotly_chart(fig_programs, use_container_width=True)
-    
+        st.metric("Внедрений с поддержкой", f"{current['implementations']:,.0f}",
+                  delta=f"{current['implementations'] - baseline['implementations']:+,.0f}")
     with col2:
-        fig_roi = px.bar(
-            program_summary,
-            x='roi_pct',
-            y='program_name',
-            orientation='h',
-            title='ROI по программам (%)',
-            labels={'roi_pct': 'ROI (%)', 'program_name': 'Программа'}
+        st.metric("Охват поддержкой", f"{current['coverage_pct']:.1f}%",
+                  delta=f"{current['coverage_pct'] - baseline['coverage_pct']:+.1f}%")
+    with col3:
+        st.metric("ROI", f"{current['roi_pct']:.1f}%" if current['budget'] else "-",
+                  delta=f"{current['roi_pct'] - baseline['roi_pct']:+.1f}%" if current['budget'] else None)
+    with col4:
+        st.metric("Экономический эффект", f"{current['econ_effect'] / 1e9:,.2f} млрд ₽",
+                  delta=f"{(current['econ_effect'] - baseline['econ_effect']) / 1e9:+,.2f} млрд ₽")
+    
+    render_chart_pair(['scenario_frontier', 'scenario_allocation'], {'scenario': scenario},
+                      scenario_data(model, allocation))
+    
+    # Сетка распределений того же бюджета считается одной пачкой; при многих
+    # программах ее шаг укрупняется до scenarios.GRID_MAX_ROWS распределений
+    started = time.perf_counter()
+    best, allocations, results = grid_search(model, allocation.sum())
+    elapsed = (time.perf_counter() - started) * 1000
+    st.caption(
+        f"Сетка распределений бюджета: {len(allocations):,} вариантов за {elapsed:.0f} мс; "
+        f"лучший дает эффект {results['econ_effect'].max() / 1e9:,.2f} млрд ₽ "
+        f"({', '.join(f'{program}: {amount / 1e6:,.0f}' for program, amount in zip(model.programs, best))} млн ₽)"
+    )
+
+# Вид страницы по умолчанию - значения входов до изменения виджетов
+DEFAULT_VIEW = {'period_months': 12, 'filters': {}}
+
+# Графики вида по умолчанию для прогрева кэша: (входы, данные раздела, графики)
+PREWARM_FIGURES = [
+    (('period_months', 'filters'), load_trend_data, ['impl_trend', 'domestic_trend']),
+    (('period_months', 'filters'), load_regional_data, ['regions', 'regions_domestic_share']),
+    (('period_months', 'filters'), load_industry_data, ['industries', 'industries_effect']),
+    ((), load_support_data, ['programs', 'programs_roi'])
+]
+
+def prewarm_figures(storage, view=DEFAULT_VIEW):
+    """Построение индекса фильтров и графиков вида по умолчанию для текущей версии данных
+    
+    Вызывается при запуске и после каждой загрузки (из потока обновления):
+    первая сессия новой версии получает индекс и графики из кэша. Графики,
+    уже находящиеся в кэше, не строятся заново. Возвращает число графиков.
+    """
+    version = current_data_version()
+    # Значения фильтров на каждой странице берутся из индекса, а его построение
+    # по всей таблице внедрений занимает секунды - страница не должна его ждать
+    get_crossfilter_index(get_database())
+    count = 0
+    for inputs, load, names in PREWARM_FIGURES:
+        state = {name: view[name] for name in inputs}
+        data = load(storage, **state)
+        if data.empty:
+            continue
+        for name in names:
+            cached_figure(name, figure_state(state), version, lambda: serialize_figure(name, data))
+            count += 1
+    return count
+
+# Подписи значений фильтров, отличные от самих значений
+FILTER_LABELS = {
+    'region_name': "Регион",
+    'industry_name': "Отрасль",
+    'vendor_name': "Вендор",
+    'class_scm': "Класс SCM",
+    'status': "Статус",
+    'is_domestic': "Происхождение ПО"
+}
+FILTER_FORMATS = {
+    'is_domestic': lambda value: "Отечественное" if value else "Зарубежное"
+}
+
+def render_period_input(storage):
+    column, _ = st.columns(2)
+    with column:
+        return st.slider(
+            "Период (месяцы)",
+            min_value=1,
+            max_value=24,
+            value=DEFAULT_VIEW['period_months'],
+            key='period_months',
+            help="Количество месяцев для анализа"
         )
-        fig_roi.update_layout(height=500)
-        st.plotly_chart(fig_roi, use_container_width=True)
+
+def render_filter_inputs(storage):
+    """Фильтры по измерениям внедрений; значения - из индекса перекрестной фильтрации"""
+    st.subheader("Фильтры")
+    index = get_crossfilter_index(get_database())
+    filters = {}
+    columns = st.columns(3)
+    for position, dimension in enumerate(DIMENSIONS):
+        with columns[position % 3]:
+            selected = st.multiselect(
+                FILTER_LABELS[dimension],
+                index.categories[dimension],
+                key=f'filter_{dimension}',
+                format_func=FILTER_FORMATS.get(dimension, str),
+                placeholder="Все"
+            )
+        if selected:
+            filters[dimension] = selected
+    return filters
+
+def scenario_key(program):
+    return f'scenario_{program}'
+
+def scenario_max(baseline):
+    """Верхняя граница ползунка программы, млн ₽: три базовых бюджета"""
+    return int(np.ceil(3 * baseline / 1e6))
+
+def set_scenario(model, allocation):
+    """Запись распределения (₽) в ползунки сценария (вызывается до их вывода, из on_click)
+    
+    Значения ограничиваются диапазоном ползунков: оптимум может отдать одной
+    программе больше трех ее базовых бюджетов.
+    """
+    for program, amount, baseline in zip(model.programs, allocation, model.baseline):
+        st.session_state[scenario_key(program)] = min(max(round(float(amount) / 1e6), 0), scenario_max(baseline))
+
+def optimize_scenario(model):
+    """Оптимальное распределение текущего общего бюджета сценария"""
+    budget = sum(st.session_state[scenario_key(program)] for program in model.programs) * 1e6
+    set_scenario(model, model.optimize(budget))
+
+def render_scenario_inputs(storage):
+    """Бюджеты программ поддержки (млн ₽) для сценария; возвращает распределение в ₽"""
+    st.header("Сценарии (What-if)")
+    model = get_scenario_model(get_database())
+    if not model.programs:
+        return ()
+    if any(scenario_key(program) not in st.session_state for program in model.programs):
+        set_scenario(model, model.baseline)
+    
+    col1, col2, _ = st.columns([1, 1, 2])
+    with col1:
+        st.button("Базовое распределение", on_click=set_scenario, args=(model, model.baseline))
+    with col2:
+        st.button("Оптимизировать распределение", on_click=optimize_scenario, args=(model,),
+                  help="Распределение того же общего бюджета с максимальным экономическим эффектом")
+    
+    columns = st.columns(len(model.programs))
+    for column, program, baseline in zip(columns, model.programs, model.baseline):
+        with column:
+            st.slider(
+                program,
+                min_value=0,
+                max_value=scenario_max(baseline),
+                step=1,
+                key=scenario_key(program),
+                help=f"Бюджет программы, млн ₽ (базовый: {baseline / 1e6:,.0f})"
+            )
+    return tuple(st.session_state[scenario_key(program)] * 1e6 for program in model.programs)
+
+# Входы разделов страницы: имя -> виджет (или группа виджетов), возвращающий значение входа
+SECTION_INPUTS = {
+    'period_months': render_period_input,
+    'filters': render_filter_inputs,
+    'scenario': render_scenario_inputs
+}
+
+# Разделы страницы в порядке вывода: (функция отрисовки, входы, от которых зависит раздел).
+# Подряд идущие разделы с общим входом выводятся одним фрагментом вместе с его виджетом,
+# следующий вход раздела - вложенным фрагментом: изменение фильтров перезапускает и
+# пересылает в браузер только разделы, зависящие от фильтров, а не весь период
+PAGE_SECTIONS = [
+    (render_period_totals, ('period_months', 'filters')),
+    (render_kpi_section, ('period_months', 'filters')),
+    (render_trend_section, ('period_months', 'filters')),
+    (render_regional_section, ('period_months', 'filters')),
+    (render_industry_section, ('period_months', 'filters')),
+    (render_support_section, ()),
+    (render_scenario_section, ('scenario',))
+]
+
+def section_fragment(func):
+    """Фрагмент страницы, перезапускаемый отдельно от нее (без st.fragment - обычная функция)"""
+    return _fragment(func) if _fragment else func
+
+@section_fragment
+def render_section_group(storage, name, sections, values):
+    """Виджет входа name и зависящие от него разделы; разделы получают значения входов аргументами"""
+    values = dict(values, **{name: SECTION_INPUTS[name](storage)})
+    render_sections(storage, sections, values)
+
+def render_sections(storage, sections=PAGE_SECTIONS, values=None):
+    """Вывод разделов страницы группами по очередному входу (values - значения уже выведенных входов)"""
+    values = values or {}
+    depth = len(values)
+    groups = []
+    for section, inputs in sections:
+        name = inputs[depth] if len(inputs) > depth else None
+        if name and groups and groups[-1][0] == name:
+            groups[-1][1].append((section, inputs))
+        else:
+            groups.append((name, [(section, inputs)]))
+    
+    for index, (name, group) in enumerate(groups):
+        if index:
+            st.markdown("---")
+        if name:
+            render_section_group(storage, name, group, values)
+        else:
+            group[0][0](storage, **values)
 
 def main():
     """Главная функция приложения"""
@@ -541,51 +799,29 @@ def main():
     
     # Инициализация базы данных
     with st.spinner("Инициализация базы данных..."):
-        conn = init_database()
-        generate_and_load_data(conn)
+        storage = get_storage()
     
-    # Фильтры в верхней части
-    st.subheader("Фильтры и управление данными")
+    # Управление данными; фильтры выводятся вместе с зависящими от них разделами
+    st.subheader("Управление данными")
     
-    col1, col2, col3, col4, col5 = st.columns(5)
+    col1, col2, col3, col4 = st.columns(4)
     
     with col1:
-        period_months = st.slider(
-            "Период (месяцы)",
-            min_value=1,
-            max_value=24,
-            value=12,
-            help="Количество месяцев для анализа"
-        )
-    
-    with col2:
         if st.button("Обновить данные", type="primary"):
-            with st.spinner("Сбор данных из источников..."):
-                real_data = collect_real_data()
-                if real_data:
-                    aggregator = DataAggregator()
-                    aggregator.save_to_database(conn, real_data)
-                    st.success("Данные успешно обновлены!")
-                    st.rerun()
-                else:
-                    st.error("Не удалось собрать данные")
-    
-    # Загрузка данных
-    with st.spinner("Загрузка данных..."):
-        kpi_data = get_kpi_data(conn, period_months)
-        impl_data = get_implementation_data(conn, period_months)
-        support_data = get_support_data(conn)
+            # Сбор идет в фоновом потоке; повторные нажатия не запускают второй сбор
+            st.session_state['refresh_job_id'] = get_refresh_worker().request_refresh()
+        render_refresh_status()
     
     with col2:
-        st.metric("Всего внедрений", f"{len(impl_data):,}")
+        support_total = get_chart_data(storage, 'support_totals')['measure_count'].iloc[0]
+        st.metric("Мер поддержки", f"{support_total or 0:,.0f}")
     
     with col3:
-        st.metric("Мер поддержки", f"{len(support_data):,}")
+        last_job = get_refresh_worker().get_job(status='done')
+        last_update = last_job['finished_at'][:16] if last_job and last_job['finished_at'] else datetime.now().strftime('%Y-%m-%d %H:%M')
+        st.metric("Последнее обновление", last_update)
     
     with col4:
-        st.metric("Последнее обновление", datetime.now().strftime('%Y-%m-%d %H:%M'))
-    
-    with col5:
         st.info("Нажмите 'Обновить данные' для загрузки актуальной информации из источников")
     
     # Информация об источниках данных
@@ -596,53 +832,36 @@ def main():
         1. **Реестр российского ПО** (Минцифры)
            - URL: https://reestr.digital.gov.ru
            - Данные: SCM-решения, вендоры, статусы
-           
+        
         2. **ЕИС** (Единая информационная система закупок)
            - URL: https://zakupki.gov.ru
            - Данные: Закупки SCM-решений, цены, заказчики
-           
+        
         3. **Федстат** (ЕМИСС)
            - URL: https://fedstat.ru
            - Данные: Макроэкономические показатели ИТ-отрасли
-           
+        
         4. **ГИСП** (Государственная информационная система промышленности)
            - URL: https://gisp.gov.ru
            - Данные: Меры поддержки для ИТ-отрасли
-           
+        
         **Частота обновления:** По запросу (кнопка "Обновить данные")
         **Тип данных:** Публичные API и веб-скрапинг
         """)
     
     st.markdown("---")
     
-    # Основные KPI
-    st.header("Ключевые показатели")
-    render_kpi_cards(kpi_data)
-    
-    st.markdown("---")
-    
-    # Трендовые графики
-    st.header("Динамика показателей")
-    render_trend_charts(kpi_data)
-    
-    st.markdown("---")
-    
-    # Региональный анализ
-    render_regional_analysis(impl_data)
-    
-    st.markdown("---")
+    # Разделы с периодом и анализ поддержки (не зависит от периода) - отдельные фрагменты
+    render_sections(storage)
     
-    # Отраслевой анализ
-    render_industry_analysis(impl_data)
-    
-    st.markdown("---")
-    
-    # Анализ поддержки
-    render_support_analysis(support_data)
-    
-    
-    # Закрытие соединения
-    conn.close()
+    # Статистика кэша запросов (общего для всех сессий процесса)
+    for title, cache in (("Кэш запросов", QUERY_CACHE), ("Кэш графиков", FIGURE_CACHE)):
+        stats = cache.stats()
+        st.caption(
+            f"{title}: {stats['entries']} записей, {stats['bytes'] / 2 ** 20:.1f} из "
+            f"{stats['max_bytes'] / 2 ** 20:.0f} МБ; попаданий {stats['hits']}, промахов {stats['misses']} "
+            f"({stats['hit_rate']:.0%}), вытеснено {stats['evictions']}"
+        )
 
 if __name__ == "__main__":
     main()
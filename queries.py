@@ -0,0 +1,140 @@
+"""
+Построитель агрегирующих запросов для графиков SCM Dashboard
+Каждый график описывается группировкой и показателями; запрос выбирает
+только нужные столбцы и группирует на стороне базы, а если измерения
+графика и фильтров покрывает помесячная сводная таблица - читает ее
+вместо исходных строк
+"""
+
+from database import ROLLUPS, DASHBOARD_QUERIES
+
+# Исходные таблицы: столбец даты периода
+SOURCES = {
+    'implementations': 'date_go_live',
+    'support_measures': 'approval_date'
+}
+
+# Показатели: имя -> (выражение по исходной таблице, выражение по сводной таблице,
+# столбцы сводной таблицы, нужные для него); число строк по сводной таблице без строк - 0, как COUNT(*)
+MEASURES = {
+    'implementations': {
+        'impl_count': ('COUNT(*)', 'COALESCE(SUM(impl_count), 0)', ['impl_count']),
+        'domestic_count': ('SUM(is_domestic)', 'SUM(domestic_count)', ['domestic_count']),
+        'domestic_share': ('ROUND(100.0 * SUM(is_domestic) / COUNT(*), 1)',
+                           'ROUND(100.0 * SUM(domestic_count) / SUM(impl_count), 1)',
+                           ['domestic_count', 'impl_count']),
+        'capex': ('SUM(capex)', 'SUM(capex_sum)', ['capex_sum']),
+        'revenue_uplift': ('SUM(revenue_uplift)', 'SUM(revenue_uplift_sum)', ['revenue_uplift_sum'])
+    },
+    'support_measures': {
+        'measure_count': ('COUNT(*)', 'COALESCE(SUM(measure_count), 0)', ['measure_count']),
+        'amount_rub': ('SUM(amount_rub)', 'SUM(amount_sum)', ['amount_sum']),
+        'roi_pct': ('AVG(roi_pct)', 'SUM(roi_sum) / SUM(measure_count)', ['roi_sum', 'measure_count'])
+    }
+}
+
+# Графики дашборда: исходная таблица, группировка, показатели, сортировка и число групп
+CHART_QUERIES = {
+    'regions': {
+        'source': 'implementations',
+        'group_by': ['region_name'],
+        'measures': ['impl_count', 'domestic_share', 'capex'],
+        'order_by': 'impl_count DESC',
+        'limit': 10
+    },
+    'industries': {
+        'source': 'implementations',
+        'group_by': ['industry_name'],
+        'measures': ['impl_count', 'domestic_share', 'capex', 'revenue_uplift'],
+        'order_by': 'impl_count DESC',
+        'limit': 10
+    },
+    'programs': {
+        'source': 'support_measures',
+        'group_by': ['program_name'],
+        'measures': ['measure_count', 'amount_rub', 'roi_pct'],
+        'order_by': 'amount_rub DESC',
+        'limit': 10
+    },
+    'implementation_totals': {
+        'source': 'implementations',
+        'group_by': [],
+        'measures': ['impl_count']
+    },
+    'support_totals': {
+        'source': 'support_measures',
+        'group_by': [],
+        'measures': ['measure_count']
+    }
+}
+
+def find_rollup(source, dimensions, measures):
+    """Наименьшая сводная таблица, покрывающая измерения и показатели, или None"""
+    candidates = []
+    for rollup, (rollup_source, _, rollup_dimensions, rollup_measures) in ROLLUPS.items():
+        if rollup_source != source or not set(dimensions) <= set(rollup_dimensions):
+            continue
+        needed = {column for measure in measures for column in MEASURES[source][measure][2]}
+        if needed <= set(rollup_measures):
+            candidates.append((len(rollup_dimensions), rollup))
+    return min(candidates)[1] if candidates else None
+
+def build_query(source, group_by=(), measures=(), period_start=None, filters=None,
+                order_by=None, limit=None, use_rollups=True):
+    """Агрегирующий запрос: (SQL, параметры)
+    
+    period_start - первый месяц периода 'YYYY-MM': сводные таблицы хранят
+    месяцы, поэтому и по исходной таблице период отсчитывается с первого
+    числа месяца - результат не зависит от того, откуда он прочитан.
+    filters - {столбец: значение или список значений}.
+    """
+    filters = {column: value for column, value in (filters or {}).items() if value not in (None, [], ())}
+    rollup = find_rollup(source, list(group_by) + list(filters), measures) if use_rollups else None
+    
+    table = rollup or source
+    expressions = [f'{MEASURES[source][measure][1 if rollup else 0]} AS {measure}' for measure in measures]
+    conditions = []
+    params = []
+    
+    if period_start:
+        if rollup:
+            conditions.append('month >= ?')
+            params.append(period_start[:7])
+        else:
+            conditions.append(f'{SOURCES[source]} >= ?')
+            params.append(f'{period_start[:7]}-01')
+    
+    for column, value in filters.items():
+        values = list(value) if isinstance(value, (list, tuple, set)) else [value]
+        conditions.append(f'{column} IN ({", ".join("?" * len(values))})')
+        params.extend(values)
+    
+    sql = f'SELECT {", ".join(list(group_by) + expressions)} FROM {table}'
+    if conditions:
+        sql += f' WHERE {" AND ".join(conditions)}'
+    if group_by:
+        sql += f' GROUP BY {", ".join(group_by)}'
+    if order_by:
+        # Группы - вторым ключом: при равенстве показателя порядок (и топ-N) детерминирован
+        sql += f' ORDER BY {", ".join([order_by] + list(group_by))}'
+    if limit:
+        sql += f' LIMIT {int(limit)}'
+    return sql, params
+
+def chart_query(chart, period_start=None, filters=None, use_rollups=True):
+    """Запрос данных графика из CHART_QUERIES с периодом и фильтрами"""
+    spec = CHART_QUERIES[chart]
+    return build_query(
+        spec['source'], spec['group_by'], spec['measures'], period_start, filters,
+        spec.get('order_by'), spec.get('limit'), use_rollups
+    )
+
+def dashboard_queries():
+    """Все запросы дашборда с типовыми параметрами (проверка планов, бенчмарки)"""
+    queries = dict(DASHBOARD_QUERIES)
+    for chart in CHART_QUERIES:
+        queries[f'chart_{chart}'] = chart_query(chart, '2024-01')
+        queries[f'chart_{chart}_raw'] = chart_query(chart, '2024-01', use_rollups=False)
+    # Фильтр по измерению, которого нет в сводной таблице графика
+    queries['chart_regions_by_vendor'] = chart_query('regions', '2024-01', {'vendor_name': ['1C', 'SAP']})
+    return queries
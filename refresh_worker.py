@@ -0,0 +1,173 @@
+"""
+Фоновое обновление данных для SCM Dashboard
+Один поток-обработчик с очередью заданий; статус и прогресс заданий
+хранятся в SQLite и доступны всем сессиям Streamlit
+"""
+
+import json
+import queue
+import sqlite3
+import threading
+import logging
+from datetime import datetime
+
+from data_sources import DataAggregator
+from database import bump_data_version
+from kpi_engine import refresh_kpi_monthly
+from archive import archive_cold_partitions
+
+logger = logging.getLogger(__name__)
+
+# Статусы, при которых задание считается активным
+ACTIVE_STATUSES = ('queued', 'running')
+
+def create_refresh_jobs_table(conn):
+    """Таблица заданий на обновление данных"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS refresh_jobs (
+            job_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            status TEXT,
+            requested_at TIMESTAMP,
+            started_at TIMESTAMP,
+            finished_at TIMESTAMP,
+            progress REAL DEFAULT 0,
+            message TEXT,
+            result TEXT
+        )
+    ''')
+    conn.commit()
+
+def _now():
+    return datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+class RefreshWorker:
+    """Фоновый обработчик заданий на обновление данных
+    
+    Повторные запросы, пока задание в очереди или выполняется, не создают
+    нового задания, а возвращают номер текущего - одновременные нажатия
+    "Обновить данные" в разных сессиях запускают один сбор. on_refresh
+    вызывается в потоке обработчика после загрузки, до отметки о
+    завершении задания (прогрев кэшей новой версии данных).
+    """
+    
+    def __init__(self, database, on_refresh=None):
+        # database - ConnectionManager: загрузка идет через его соединение-писатель
+        self.database = database
+        self.on_refresh = on_refresh
+        self.jobs = queue.Queue()
+        self.lock = threading.Lock()
+        
+        with database.writer() as conn:
+            create_refresh_jobs_table(conn)
+            # Задания, прерванные остановкой предыдущего процесса
+            conn.execute('''
+                UPDATE refresh_jobs SET status = 'failed', finished_at = ?, message = 'Прервано перезапуском'
+                WHERE status IN ('queued', 'running')
+            ''', (_now(),))
+        
+        self.thread = threading.Thread(target=self._run, name='refresh-worker', daemon=True)
+        self.thread.start()
+    
+    def request_refresh(self):
+        """Постановка задания в очередь; возвращает номер (нового или текущего) задания"""
+        with self.lock:
+            # Отдельное короткое соединение: писатель может быть занят загрузкой
+            conn = self.database.connect()
+            try:
+                # BEGIN IMMEDIATE сериализует проверку и вставку между процессами
+                conn.execute('BEGIN IMMEDIATE')
+                active = conn.execute(f'''
+                    SELECT job_id FROM refresh_jobs
+                    WHERE status IN ({', '.join('?' * len(ACTIVE_STATUSES))})
+                    ORDER BY job_id DESC LIMIT 1
+                ''', ACTIVE_STATUSES).fetchone()
+                if active:
+                    conn.commit()
+                    return active[0]
+                
+                job_id = conn.execute('''
+                    INSERT INTO refresh_jobs (status, requested_at, message)
+                    VALUES ('queued', ?, 'В очереди')
+                ''', (_now(),)).lastrowid
+                conn.commit()
+            finally:
+                conn.close()
+        
+        self.jobs.put(job_id)
+        logger.info(f"Задание на обновление данных #{job_id} поставлено в очередь")
+        return job_id
+    
+    def get_job(self, job_id=None, status=None):
+        """Задание по номеру (по умолчанию - последнее, с нужным статусом) в виде словаря"""
+        with self.database.reader() as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = sqlite3.Row
+            if job_id is None:
+                row = cursor.execute(
+                    'SELECT * FROM refresh_jobs WHERE ? IS NULL OR status = ? ORDER BY job_id DESC LIMIT 1',
+                    (status, status)
+                ).fetchone()
+            else:
+                row = cursor.execute('SELECT * FROM refresh_jobs WHERE job_id = ?', (job_id,)).fetchone()
+        return dict(row) if row else None
+    
+    def _update(self, conn, job_id, **fields):
+        assignments = ', '.join(f'{name} = ?' for name in fields)
+        conn.execute(f'UPDATE refresh_jobs SET {assignments} WHERE job_id = ?', (*fields.values(), job_id))
+        conn.commit()
+    
+    def _run(self):
+        while True:
+            job_id = self.jobs.get()
+            with self.database.writer() as conn:
+                try:
+                    self._execute(conn, job_id)
+                except Exception as e:
+                    logger.error(f"Ошибка задания на обновление данных #{job_id}: {e}")
+                    if conn.in_transaction:
+                        conn.rollback()
+                    self._update(conn, job_id, status='failed', finished_at=_now(), message=f'Ошибка: {e}')
+    
+    def _execute(self, conn, job_id):
+        """Выполнение задания: потоковая загрузка всех источников"""
+        self._update(conn, job_id, status='running', started_at=_now(), message='Сбор данных из источников...')
+        
+        def report(status):
+            finished = sum(1 for source in status.values() if source['status'] != 'pending')
+            records = sum(source['records'] for source in status.values())
+            # Прогресс пишется через соединение загрузки (второе соединение ждало бы
+            # ее транзакцию); коммит заодно фиксирует уже записанные пачки
+            self._update(
+                conn, job_id,
+                progress=finished / len(status),
+                message=f'Источников обработано: {finished} из {len(status)}, записей: {records}'
+            )
+        
+        status = DataAggregator().stream_to_database(conn, progress=report)
+        # KPI пересчитываются только за месяцы, которые затронула загрузка
+        refresh_kpi_monthly(conn)
+        bump_data_version(conn)
+        # Месяцы, вышедшие за горизонт, переносятся в архив
+        archive_cold_partitions(conn)
+        # Прогрев читает данные через соединения-читатели: они видят KPI и новую
+        # версию данных только после фиксации (архивация без холодных месяцев не фиксирует)
+        conn.commit()
+        
+        # Прогрев до отметки о завершении: сессии, перечитывающие данные по статусу, получают готовые графики
+        if self.on_refresh:
+            try:
+                self.on_refresh()
+            except Exception as e:
+                logger.error(f"Ошибка прогрева после задания #{job_id}: {e}")
+        
+        records = sum(source['records'] for source in status.values())
+        failed = [key for key, source in status.items() if source['status'] not in ('ok', 'empty')]
+        self._update(
+            conn, job_id,
+            status='done' if records or not failed else 'failed',
+            finished_at=_now(),
+            progress=1.0,
+            message=f'Загружено записей: {records}' + (f'; с ошибками: {", ".join(failed)}' if failed else ''),
+            result=json.dumps(status, ensure_ascii=False)
+        )
+        logger.info(f"Задание на обновление данных #{job_id} завершено")
@@ -0,0 +1,238 @@
+"""
+Сценарии (What-if) распределения бюджета поддержки по программам
+Модель калибруется по support_measures: для каждой программы - бюджет,
+число профинансированных внедрений (∑amount_rub / cost_per_impl) и ROI.
+Отдача бюджета насыщается: внедрения программы n(x) = K × (1 - exp(-x / s)),
+где емкость K - CAPACITY_MULTIPLE базовых внедрений, а масштаб s подобран
+так, что базовый бюджет дает базовое число внедрений. Распределения
+считаются пачками - массивами NumPy (распределение - строка, программа -
+столбец), оптимум для бюджета находится выравниванием предельной отдачи
+
+Запуск: python scenarios.py [--budget 3000] [--steps 40]
+"""
+
+import time
+import logging
+import argparse
+from math import comb
+from functools import lru_cache
+from itertools import combinations
+
+import numpy as np
+import pandas as pd
+
+from database import DB_PATH, ConnectionManager
+from kpi_engine import COUNTED_STATUSES
+
+logger = logging.getLogger(__name__)
+
+# Емкость программы: во сколько раз больше базового число внедрений при неограниченном бюджете
+CAPACITY_MULTIPLE = 2.0
+
+# Показатели сценария, которые может максимизировать оптимизатор
+OBJECTIVES = ('econ_effect', 'implementations')
+
+# Предел числа распределений сетки: сетка считается на каждое движение ползунка,
+# а при 40 шагах 8 программ дали бы 63 млн распределений (около 4 ГБ)
+GRID_MAX_ROWS = 50000
+
+class ScenarioModel:
+    """Модель отдачи бюджета поддержки по программам
+    
+    programs - названия программ, baseline - базовый бюджет программы (₽),
+    funded - базовое число профинансированных внедрений, effect_per_impl -
+    экономический эффект одного внедрения (₽), impl_total - все засчитанные
+    внедрения (знаменатель охвата).
+    """
+    
+    def __init__(self, programs, baseline, funded, effect_per_impl, impl_total):
+        self.programs = list(programs)
+        self.baseline = np.asarray(baseline, dtype=float)
+        self.funded = np.asarray(funded, dtype=float)
+        self.effect_per_impl = np.asarray(effect_per_impl, dtype=float)
+        self.impl_total = float(impl_total)
+        self.capacity = CAPACITY_MULTIPLE * self.funded
+        # K × (1 - exp(-B / s)) = funded при x = B
+        self.scale = self.baseline / -np.log1p(-1 / CAPACITY_MULTIPLE)
+    
+    @classmethod
+    def from_frame(cls, support, impl_total):
+        """Модель по мерам поддержки (program_name, amount_rub, cost_per_impl, roi_pct)
+        
+        ROI программы - среднее roi_pct, взвешенное по сумме; эффект программы
+        по формуле ROI: бюджет × (1 + ROI / 100). Программы без суммы или без
+        стоимости внедрения в модель не входят.
+        """
+        support = support.assign(
+            amount_rub=support['amount_rub'].fillna(0).astype(float),
+            funded=support['amount_rub'].fillna(0) / support['cost_per_impl'].where(support['cost_per_impl'] > 0),
+            weighted_roi=support['amount_rub'].fillna(0) * support['roi_pct'].fillna(0)
+        )
+        programs = support.groupby('program_name', sort=True)[['amount_rub', 'funded', 'weighted_roi']].sum()
+        programs = programs[(programs['amount_rub'] > 0) & (programs['funded'] > 0)]
+        
+        baseline = programs['amount_rub'].to_numpy()
+        funded = programs['funded'].to_numpy()
+        roi = programs['weighted_roi'].to_numpy() / baseline
+        return cls(programs.index, baseline, funded, baseline * (1 + roi / 100) / funded, impl_total)
+    
+    @classmethod
+    def from_database(cls, database):
+        """Модель по мерам поддержки и внедрениям в базе (горизонт без архивных месяцев)"""
+        with database.reader() as conn:
+            support = pd.read_sql_query(
+                'SELECT program_name, amount_rub, cost_per_impl, roi_pct FROM support_measures', conn
+            )
+            impl_total = conn.execute(
+                f'SELECT COUNT(*) FROM implementations WHERE status IN ({", ".join("?" * len(COUNTED_STATUSES))})',
+                COUNTED_STATUSES
+            ).fetchone()[0]
+        return cls.from_frame(support, impl_total)
+    
+    @property
+    def baseline_budget(self):
+        return float(self.baseline.sum())
+    
+    def implementations(self, allocations):
+        """Профинансированные внедрения по программам для распределений (..., программы)"""
+        allocations = np.maximum(np.asarray(allocations, dtype=float), 0)
+        return self.capacity * -np.expm1(-allocations / self.scale)
+    
+    def evaluate(self, allocations):
+        """Показатели распределений бюджета (₽): массив (..., программы) -> {показатель: массив (...)}
+        
+        implementations - внедрения с поддержкой, coverage_pct - охват
+        внедрений поддержкой (не больше 100%), econ_effect - экономический
+        эффект (₽), roi_pct - ROI всего бюджета, budget - бюджет распределения.
+        """
+        allocations = np.asarray(allocations, dtype=float)
+        funded = self.implementations(allocations)
+        implementations = funded.sum(axis=-1)
+        effect = (funded * self.effect_per_impl).sum(axis=-1)
+        budget = allocations.sum(axis=-1)
+        
+        with np.errstate(divide='ignore', invalid='ignore'):
+            coverage = np.minimum(implementations, self.impl_total) / self.impl_total * 100
+            roi = np.where(budget > 0, (effect - budget) / budget * 100, np.nan)
+        return {
+            'implementations': implementations,
+            'coverage_pct': coverage,
+            'econ_effect': effect,
+            'roi_pct': roi,
+            'budget': budget
+        }
+    
+    def optimize(self, budgets, objective='econ_effect', iterations=100):
+        """Оптимальные распределения бюджетов (₽): скаляр или массив (m,) -> массив (..., программы)
+        
+        Отдача программ вогнута, поэтому оптимум - распределение с равной
+        предельной отдачей λ всех финансируемых программ:
+        x = max(0, s × ln(v × K / (s × λ))), где v - эффект внедрения
+        (или 1 для objective='implementations'). λ находится делением
+        пополам по логарифму одновременно для всех бюджетов.
+        """
+        if objective not in OBJECTIVES:
+            raise ValueError(f'Неизвестный показатель оптимизации: {objective}')
+        budgets = np.asarray(budgets, dtype=float)
+        if not self.programs:
+            return np.zeros(budgets.shape + (0,))
+        value = self.effect_per_impl if objective == 'econ_effect' else np.ones(len(self.programs))
+        # Предельная отдача программы при нулевом бюджете
+        marginal = value * self.capacity / self.scale
+        
+        def allocate(log_lambda):
+            return np.maximum(0, self.scale * (np.log(marginal) - log_lambda[..., None]))
+        
+        # При λ = max(marginal) бюджет нулевой; на нижней границе одна программа с максимальной
+        # отдачей получает s × (budget / min(s) + 1) > budget
+        high = np.full(budgets.shape, np.log(marginal.max()))
+        low = high - budgets / self.scale.min() - 1
+        for _ in range(iterations):
+            middle = (low + high) / 2
+            over = allocate(middle).sum(axis=-1) > budgets
+            low = np.where(over, middle, low)
+            high = np.where(over, high, middle)
+        allocations = allocate(high)
+        
+        # Остаток от деления пополам распределяется пропорционально, сумма точно равна бюджету
+        total = allocations.sum(axis=-1, keepdims=True)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(total > 0, allocations * (budgets[..., None] / total), 0)
+
+@lru_cache(maxsize=8)
+def _grid_steps(programs, steps):
+    """Все разбиения steps шагов по programs программам: массив (n, программы), только для чтения"""
+    # "Звезды и перегородки": позиции перегородок задают число шагов каждой программы
+    bars = np.array(list(combinations(range(steps + programs - 1), programs - 1)), dtype=np.int64)
+    bars = bars.reshape(len(bars), programs - 1)
+    bounds = np.hstack([np.full((len(bars), 1), -1), bars, np.full((len(bars), 1), steps + programs - 1)])
+    counts = np.diff(bounds, axis=1) - 1
+    counts.flags.writeable = False
+    return counts
+
+def grid_steps(programs, steps, max_rows=GRID_MAX_ROWS):
+    """Наибольшее число шагов не больше steps, при котором сетка programs программ не больше max_rows"""
+    while steps > 1 and comb(steps + programs - 1, programs - 1) > max_rows:
+        steps -= 1
+    return steps
+
+def allocation_grid(budget, programs, steps):
+    """Все распределения бюджета по programs программам с шагом budget / steps: массив (n, программы)
+    
+    Число распределений - C(steps + programs - 1, programs - 1)
+    (например, 12 341 для 4 программ и 40 шагов). Разбиения на шаги
+    перечисляются один раз для пары (programs, steps).
+    """
+    return _grid_steps(programs, steps) * (budget / steps)
+
+def grid_search(model, budget, steps=40, objective='econ_effect', max_rows=GRID_MAX_ROWS):
+    """Лучшее распределение бюджета на сетке allocation_grid и показатели всей сетки
+    
+    Если сетка из steps шагов больше max_rows распределений, шаг сетки
+    укрупняется (см. grid_steps); точный оптимум дает ScenarioModel.optimize.
+    """
+    if objective not in OBJECTIVES:
+        raise ValueError(f'Неизвестный показатель оптимизации: {objective}')
+    programs = len(model.programs)
+    limited = grid_steps(programs, steps, max_rows)
+    if limited < steps:
+        logger.debug(f"Сетка {programs} программ: {limited} шагов вместо {steps} (не больше {max_rows:,} распределений)")
+    allocations = allocation_grid(budget, programs, limited)
+    results = model.evaluate(allocations)
+    return allocations[int(np.argmax(results[objective]))], allocations, results
+
+def main():
+    parser = argparse.ArgumentParser(description='Сценарии распределения бюджета поддержки SCM Dashboard')
+    parser.add_argument('--db', default=DB_PATH, help='Путь к базе SQLite')
+    parser.add_argument('--budget', type=float, help='Общий бюджет, млн ₽ (по умолчанию базовый)')
+    parser.add_argument('--steps', type=int, default=40, help='Шагов сетки распределений')
+    parser.add_argument('--objective', choices=OBJECTIVES, default='econ_effect', help='Максимизируемый показатель')
+    args = parser.parse_args()
+    
+    database = ConnectionManager(args.db)
+    model = ScenarioModel.from_database(database)
+    database.close()
+    budget = args.budget * 1e6 if args.budget else model.baseline_budget
+    
+    started = time.perf_counter()
+    best, allocations, _ = grid_search(model, budget, args.steps, args.objective)
+    grid_time = time.perf_counter() - started
+    started = time.perf_counter()
+    optimum = model.optimize(budget, args.objective)
+    optimize_time = time.perf_counter() - started
+    
+    scenarios = {
+        'Базовое': model.baseline * budget / model.baseline_budget,
+        f'Лучшее на сетке ({len(allocations):,} за {grid_time * 1000:.0f} мс)': best,
+        f'Оптимум ({optimize_time * 1000:.1f} мс)': optimum
+    }
+    table = pd.DataFrame(
+        {name: allocation / 1e6 for name, allocation in scenarios.items()}, index=model.programs
+    ).T.round(1)
+    results = pd.DataFrame(model.evaluate(np.array(list(scenarios.values()))), index=list(scenarios))
+    print(f"Бюджет: {budget / 1e6:,.1f} млн ₽, внедрений всего: {model.impl_total:,.0f}")
+    print(table.to_string())
+    print(results.round(1).to_string())
+
+if __name__ == '__main__':
+    main()
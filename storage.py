@@ -0,0 +1,311 @@
+"""
+Хранилища для запросов дашборда
+SQLite (по умолчанию) и аналитическое DuckDB поверх Parquet-выгрузки
+таблиц: колоночное чтение только нужных столбцов, многопоточные агрегации
+
+Выбор хранилища: SCM_STORAGE_BACKEND=sqlite|duckdb
+"""
+
+import os
+import json
+import time
+import shutil
+import logging
+import threading
+
+import pandas as pd
+
+from database import ROLLUPS, get_data_version
+
+logger = logging.getLogger(__name__)
+
+STORAGE_BACKEND = os.environ.get('SCM_STORAGE_BACKEND', 'sqlite')
+PARQUET_DIR = os.environ.get('SCM_PARQUET_DIR', 'scm_parquet')
+
+# Таблицы, которые читает дашборд (выгружаются в Parquet)
+DASHBOARD_TABLES = ['implementations', 'kpi_monthly', 'support_measures'] + list(ROLLUPS)
+
+# Объявленные типы SQLite -> типы DuckDB; даты хранятся строками ISO, как в SQLite,
+# чтобы запросы и их параметры работали одинаково в обоих хранилищах
+DUCKDB_TYPES = {
+    'INTEGER': 'BIGINT',
+    'BOOLEAN': 'BIGINT',
+    'REAL': 'DOUBLE'
+}
+
+EXPORT_CHUNK_SIZE = 500000
+
+# Типы столбцов DataFrame дашборда по имени столбца (для исходных строк и сводок):
+# category - строки с малым числом значений, date - даты ISO, integer/float -
+# числа, сужаемые до наименьшего вмещающего значения типа, bool - флаги 0/1
+COLUMN_TYPES = {
+    'solution_name': 'category',
+    'vendor_name': 'category',
+    'class_scm': 'category',
+    'region_name': 'category',
+    'industry_name': 'category',
+    'status': 'category',
+    'program_name': 'category',
+    'measure_type': 'category',
+    'date_go_live': 'date',
+    'date_month': 'date',
+    'approval_date': 'date',
+    'disbursement_date': 'date',
+    'is_domestic': 'bool',
+    'impl_id': 'integer',
+    'support_id': 'integer',
+    'year': 'integer',
+    'quarter': 'integer',
+    'impl_count': 'integer',
+    'domestic_count': 'integer',
+    'domestic_impl_count': 'integer',
+    'measure_count': 'integer',
+    'support_count': 'integer',
+    'capex': 'integer',
+    'revenue_uplift': 'integer',
+    'opex_delta': 'integer',
+    'penalties_delta': 'integer',
+    'amount_rub': 'integer',
+    'cost_per_impl': 'integer',
+    'inv_turnover_delta': 'float',
+    'lead_time_delta': 'float',
+    'roi_pct': 'float',
+    'domestic_share_pct': 'float',
+    'support_coverage_pct': 'float',
+    'isi_index': 'float'
+}
+
+DATE_COLUMNS = [column for column, kind in COLUMN_TYPES.items() if kind == 'date']
+
+def apply_column_types(df):
+    """Приведение столбцов к компактным типам по COLUMN_TYPES
+    
+    Целые сужаются, только если все значения целые и без пропусков (иначе
+    столбец остается как есть), поэтому суммы в сводках не переполняются.
+    Дробные показатели (проценты, дельты) хранятся во float32.
+    """
+    for column in df.columns:
+        kind = COLUMN_TYPES.get(column)
+        if kind == 'category':
+            df[column] = df[column].astype('category')
+        elif kind == 'date' and not pd.api.types.is_datetime64_any_dtype(df[column]):
+            df[column] = pd.to_datetime(df[column], format='ISO8601')
+        elif kind == 'integer':
+            values = df[column]
+            # Суммы из SQL приходят дробными; в целые - только без пропусков и дробной части
+            if pd.api.types.is_float_dtype(values) and values.notna().all() and (values % 1 == 0).all():
+                values = values.astype('int64')
+            if pd.api.types.is_integer_dtype(values):
+                df[column] = pd.to_numeric(values, downcast='integer')
+        elif kind == 'float':
+            df[column] = pd.to_numeric(df[column], downcast='float')
+        elif kind == 'bool' and not df[column].isna().any():
+            df[column] = df[column].astype(bool)
+    return df
+
+def frame_memory_mb(df):
+    """Память DataFrame в МБ (с учетом содержимого строк)"""
+    return df.memory_usage(deep=True).sum() / 2 ** 20
+
+def log_frame(name, df):
+    if name:
+        logger.info(f"Загружен {name}: {len(df):,} строк, {frame_memory_mb(df) * 1024:,.1f} КБ")
+
+def duckdb_columns(conn, table):
+    """Столбцы таблицы SQLite с типами DuckDB: [(имя, тип)]"""
+    return [
+        (name, DUCKDB_TYPES.get((declared or '').upper(), 'VARCHAR'))
+        for _, name, declared, *_ in conn.execute(f'PRAGMA table_info({table})')
+    ]
+
+class SQLiteBackend:
+    """Запросы напрямую к SQLite через пул соединений для чтения"""
+    
+    name = 'sqlite'
+    
+    def __init__(self, database):
+        self.database = database
+    
+    def read(self, query, params=(), name=None):
+        """Результат запроса в виде DataFrame с компактными типами столбцов"""
+        with self.database.reader() as conn:
+            # Даты разбираются при чтении, остальные типы - сразу после
+            df = pd.read_sql_query(query, conn, params=list(params),
+                                   parse_dates={column: '%Y-%m-%d' for column in DATE_COLUMNS})
+        df = apply_column_types(df)
+        log_frame(name, df)
+        return df
+    
+    def sync(self):
+        """Данные читаются из SQLite напрямую - синхронизировать нечего"""
+        return False
+    
+    def close(self):
+        pass
+
+class DuckDBBackend:
+    """Запросы DuckDB к Parquet-выгрузке таблиц дашборда
+    
+    Каждая таблица выгружается частями с явными типами столбцов в новый
+    каталог parquet_dir/<таблица>.<поколение>/; в DuckDB на него заводится
+    представление с тем же именем, поэтому запросы дашборда выполняются
+    без изменений. Выгрузка проверяется при смене версии данных и
+    повторяется, когда меняется отпечаток таблиц SQLite; каталоги
+    текущей выгрузки записываются в манифест.
+    """
+    
+    name = 'duckdb'
+    
+    def __init__(self, database, parquet_dir=PARQUET_DIR, threads=None):
+        import duckdb
+        
+        self.database = database
+        self.parquet_dir = parquet_dir
+        self.sync_lock = threading.Lock()
+        self.data_version = None
+        # Каталоги выгрузки, на которые указывают представления: {таблица: каталог}
+        self.tables = {}
+        self.conn = duckdb.connect()
+        if threads:
+            self.conn.execute(f'SET threads = {int(threads)}')
+        
+        self.sync()
+    
+    def read(self, query, params=(), name=None):
+        """Результат запроса в виде DataFrame с компактными типами столбцов"""
+        if self.database.data_version() != self.data_version:
+            self.sync()
+        # Курсор - отдельное соединение к той же базе DuckDB, безопасное для потока сессии
+        cursor = self.conn.cursor()
+        try:
+            df = cursor.execute(query, list(params)).df()
+        finally:
+            cursor.close()
+        df = apply_column_types(df)
+        log_frame(name, df)
+        return df
+    
+    def _fingerprint(self, conn):
+        """Отпечаток таблиц: число строк и максимальный rowid, для сводных - суммы показателей"""
+        fingerprint = {}
+        for table in DASHBOARD_TABLES:
+            columns = ['COUNT(*)', 'MAX(rowid)']
+            if table in ROLLUPS:
+                columns += [f'SUM({measure})' for measure in ROLLUPS[table][3]]
+            fingerprint[table] = list(conn.execute(f'SELECT {", ".join(columns)} FROM {table}').fetchone())
+        return fingerprint
+    
+    def _manifest_path(self):
+        return os.path.join(self.parquet_dir, 'manifest.json')
+    
+    def _load_manifest(self, fingerprint):
+        """Каталоги выгрузки {таблица: каталог} из манифеста, если он соответствует отпечатку, иначе None"""
+        try:
+            with open(self._manifest_path(), encoding='utf-8') as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if not isinstance(manifest, dict) or manifest.get('fingerprint') != fingerprint:
+            return None
+        tables = manifest.get('tables') or {}
+        if any(not os.path.isdir(os.path.join(self.parquet_dir, tables.get(table, ''))) for table in DASHBOARD_TABLES):
+            return None
+        return tables
+    
+    def sync(self):
+        """Выгрузка таблиц в Parquet, если данные SQLite изменились; True - была выгрузка
+        
+        Новая выгрузка пишется в новые каталоги, и представления переводятся
+        на них только после записи всех таблиц: запросы других сессий, идущие
+        без блокировки, читают прежнюю выгрузку целиком. Прежние каталоги
+        удаляются при следующей выгрузке - к этому времени их запросы завершены.
+        """
+        with self.sync_lock, self.database.reader() as conn:
+            data_version = get_data_version(conn)
+            fingerprint = self._fingerprint(conn)
+            tables = self._load_manifest(fingerprint)
+            stale = tables is None
+            
+            if stale:
+                logger.info(f"Выгрузка таблиц дашборда в Parquet: {self.parquet_dir}")
+                os.makedirs(self.parquet_dir, exist_ok=True)
+                generation = f'{data_version}-{time.time_ns()}'
+                tables = {table: self._export_table(conn, table, generation) for table in DASHBOARD_TABLES}
+                # Манифест заменяется целиком: после сбоя он указывает на полную выгрузку
+                staging = self._manifest_path() + '.tmp'
+                with open(staging, 'w', encoding='utf-8') as f:
+                    json.dump({'fingerprint': fingerprint, 'tables': tables}, f)
+                os.replace(staging, self._manifest_path())
+            
+            previous = self.tables
+            for table in DASHBOARD_TABLES:
+                path = os.path.join(self.parquet_dir, tables[table], '*.parquet').replace("'", "''")
+                self.conn.execute(f"CREATE OR REPLACE VIEW {table} AS SELECT * FROM read_parquet('{path}')")
+            self.tables = tables
+            self.data_version = data_version
+            if stale:
+                self._remove_exports(keep=set(tables.values()) | set(previous.values()))
+        return stale
+    
+    def _remove_exports(self, keep):
+        """Удаление каталогов выгрузки таблиц дашборда, кроме keep"""
+        for entry in os.listdir(self.parquet_dir):
+            if entry in keep or entry.split('.', 1)[0] not in DASHBOARD_TABLES:
+                continue
+            path = os.path.join(self.parquet_dir, entry)
+            if os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
+    
+    def _export_table(self, conn, table, generation):
+        """Выгрузка таблицы частями в новый каталог <таблица>.<поколение>; возвращает имя каталога
+        
+        Части пишутся во временный каталог, который переименовывается
+        целиком: каталог выгрузки либо отсутствует, либо полон.
+        """
+        columns = duckdb_columns(conn, table)
+        names = [name for name, _ in columns]
+        # Явные типы: части с пустыми столбцами не должны расходиться по схеме
+        select = ', '.join(f'CAST({name} AS {column_type}) AS {name}' for name, column_type in columns)
+        
+        directory = f'{table}.{generation}'
+        target = os.path.join(self.parquet_dir, directory)
+        staging = target + '.tmp'
+        shutil.rmtree(staging, ignore_errors=True)
+        os.makedirs(staging)
+        
+        cursor = conn.execute(f'SELECT {", ".join(names)} FROM {table}')
+        part = 0
+        while True:
+            rows = cursor.fetchmany(EXPORT_CHUNK_SIZE)
+            # Пустая таблица выгружается одной пустой частью, чтобы представление имело схему
+            if not rows and part:
+                break
+            chunk = pd.DataFrame.from_records(rows, columns=names)
+            path = os.path.join(staging, f'part-{part:05d}.parquet').replace("'", "''")
+            self.conn.register('export_chunk', chunk)
+            self.conn.execute(f"COPY (SELECT {select} FROM export_chunk) TO '{path}' (FORMAT PARQUET, COMPRESSION ZSTD)")
+            self.conn.unregister('export_chunk')
+            part += 1
+            if not rows:
+                break
+        
+        os.replace(staging, target)
+        return directory
+    
+    def close(self):
+        self.conn.close()
+
+def create_storage(database, backend=None, **options):
+    """Хранилище по имени (по умолчанию - SCM_STORAGE_BACKEND)
+    
+    Если DuckDB не установлен, используется SQLite.
+    """
+    backend = backend or STORAGE_BACKEND
+    if backend == 'duckdb':
+        try:
+            return DuckDBBackend(database, **options)
+        except ImportError:
+            logger.warning("DuckDB не установлен, используется SQLite")
+    elif backend != 'sqlite':
+        raise ValueError(f'Неизвестное хранилище: {backend}')
+    return SQLiteBackend(database)
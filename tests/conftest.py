@@ -0,0 +1,29 @@
+"""
+Общие фикстуры тестов: модули проекта импортируются из корня репозитория
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import ConnectionManager
+from kpi_engine import refresh_kpi_monthly
+from synthetic_data import load_synthetic_data
+
+@pytest.fixture
+def database(tmp_path):
+    """Пустая временная база со схемой дашборда"""
+    database = ConnectionManager(str(tmp_path / 'test.db'))
+    yield database
+    database.close()
+
+@pytest.fixture
+def loaded(database):
+    """Временная база с небольшим синтетическим набором и пересчитанными KPI"""
+    with database.writer() as conn:
+        load_synthetic_data(conn, n_implementations=2000, n_support=200, seed=42, as_of='2025-01-01')
+        refresh_kpi_monthly(conn)
+    return database
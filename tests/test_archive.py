@@ -0,0 +1,64 @@
+"""
+Архивирование холодных месяцев: строки уходят в файлы, KPI и сводные таблицы сохраняются
+"""
+
+import pandas as pd
+import pytest
+
+from archive import archive_boundary, archive_cold_partitions, archived_months, read_period
+from database import ROLLUPS
+from kpi_engine import refresh_kpi_monthly
+
+AS_OF = '2025-01-01'
+HORIZON = 12
+
+def snapshot(conn):
+    tables = ['kpi_monthly'] + list(ROLLUPS)
+    return {table: pd.read_sql_query(f'SELECT * FROM {table} ORDER BY 1, 2, 3', conn) for table in tables}
+
+def triggers(conn):
+    return {name for name, in conn.execute("SELECT name FROM sqlite_master WHERE type = 'trigger'")}
+
+@pytest.fixture
+def archived(loaded, tmp_path):
+    archive_dir = str(tmp_path / 'archive')
+    with loaded.writer() as conn:
+        before = snapshot(conn)
+        total = conn.execute('SELECT COUNT(*) FROM implementations').fetchone()[0]
+        result = archive_cold_partitions(conn, HORIZON, archive_dir, as_of=AS_OF)
+    return loaded, archive_dir, before, total, result
+
+def test_archive_keeps_kpi_and_rollups(archived):
+    database, archive_dir, before, total, result = archived
+    boundary = archive_boundary(HORIZON, AS_OF)
+    assert result['implementations'] > 0
+    
+    with database.reader() as conn:
+        assert conn.execute(
+            'SELECT COUNT(*) FROM implementations WHERE date_go_live < ?', (f'{boundary}-01',)
+        ).fetchone()[0] == 0
+        assert archived_months(conn, 'implementations')[-1] < boundary
+        after = snapshot(conn)
+    for table, frame in before.items():
+        pd.testing.assert_frame_equal(after[table], frame, obj=table)
+    
+    # Архив и горизонт вместе - все исходные строки
+    assert len(read_period(database, 'implementations', archive_dir=archive_dir)) == total
+
+def test_repeated_archive_is_noop(archived):
+    database, archive_dir, before, total, result = archived
+    with database.writer() as conn:
+        existing = triggers(conn)
+        assert archive_cold_partitions(conn, HORIZON, archive_dir, as_of=AS_OF) == {}
+        assert triggers(conn) == existing
+        assert any(name.startswith('kpi_dirty_') for name in existing)
+        assert any(name.startswith('rollup_') for name in existing)
+
+def test_refresh_keeps_kpi_of_archived_months(archived):
+    database, archive_dir, before, total, result = archived
+    with database.writer() as conn:
+        months = archived_months(conn, 'implementations')
+        conn.executemany('INSERT OR IGNORE INTO kpi_dirty_months (month) VALUES (?)', [(month,) for month in months])
+        refresh_kpi_monthly(conn)
+        conn.commit()
+        pd.testing.assert_frame_equal(snapshot(conn)['kpi_monthly'], before['kpi_monthly'])
@@ -0,0 +1,74 @@
+"""
+LRU-кэши запросов и графиков: вытеснение по объему и числу записей, ключ по версии данных
+"""
+
+import numpy as np
+
+from caching import LRUCache, cached_figure, cached_query
+
+def array(kb):
+    return np.zeros(kb * 1024, dtype=np.uint8)
+
+def test_lru_evicts_least_recently_used_by_size():
+    cache = LRUCache(max_bytes=3 * 1024)
+    for key in 'abc':
+        cache.put(key, array(1))
+    # Обращение к "a" делает вытесняемой "b"
+    assert cache.get('a') is not None
+    cache.put('d', array(1))
+    
+    assert list(cache.entries) == ['c', 'a', 'd']
+    stats = cache.stats()
+    assert stats['evictions'] == 1
+    assert stats['bytes'] == 3 * 1024
+    assert (stats['hits'], stats['misses']) == (1, 0)
+
+def test_lru_limits_entries_and_skips_oversized_values():
+    cache = LRUCache(max_bytes=4 * 1024, max_entries=2)
+    cache.put('a', array(1))
+    cache.put('b', array(1))
+    cache.put('c', array(1))
+    assert list(cache.entries) == ['b', 'c']
+    
+    cache.put('huge', array(5))
+    assert cache.get('huge') is None
+    # Замена значения по ключу не учитывает прежний размер дважды
+    cache.put('c', array(2))
+    assert cache.stats()['bytes'] == 3 * 1024
+
+def test_cached_query_keys_on_version_and_public_arguments():
+    cache = LRUCache(max_bytes=2 ** 20)
+    version = {'value': 1}
+    calls = []
+    
+    @cached_query(lambda: version['value'], cache=cache)
+    def load(_conn, period, filters=None):
+        calls.append((period, filters))
+        return array(1)
+    
+    first = load(object(), 12, {'region': ['Москва']})
+    # Соединение (аргумент на "_") в ключ не входит, словари фильтров сравниваются по значению
+    assert load(object(), 12, {'region': ['Москва']}) is first
+    load(None, 24)
+    assert len(calls) == 2
+    
+    version['value'] = 2
+    assert load(None, 12, {'region': ['Москва']}) is not first
+    assert len(calls) == 3
+    # Записи прежней версии удалены при первом промахе новой
+    assert [key[2] for key in cache.entries] == [2]
+
+def test_cached_figure_rebuilds_on_new_version():
+    cache = LRUCache(max_bytes=2 ** 20)
+    builds = []
+    
+    def build():
+        builds.append(1)
+        return f'{{"figure": {len(builds)}}}'
+    
+    state = {'period_start': '2024-01', 'filters': {}}
+    assert cached_figure('trend', state, 1, build, cache=cache) == '{"figure": 1}'
+    assert cached_figure('trend', dict(state), 1, build, cache=cache) == '{"figure": 1}'
+    assert cached_figure('trend', state, 2, build, cache=cache) == '{"figure": 2}'
+    assert len(builds) == 2
+    assert [key[2] for key in cache.entries] == [2]
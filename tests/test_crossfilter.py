@@ -0,0 +1,71 @@
+"""
+Индекс перекрестной фильтрации: те же агрегаты, что и запросы к базе
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from crossfilter import CrossfilterIndex
+from kpi_engine import COUNTED_STATUSES
+from queries import CHART_QUERIES, chart_query
+from storage import SQLiteBackend
+
+CASES = [
+    ('2024-01', {'region_name': ['Москва']}),
+    ('2023-06', {'vendor_name': ['1C', 'SAP'], 'class_scm': ['WMS', 'TMS']}),
+    ('2024-06', {'industry_name': ['Логистика'], 'status': ['go-live'], 'is_domestic': [1]}),
+    ('2024-01', {'region_name': ['Нет такого региона']})
+]
+
+@pytest.fixture
+def index(loaded):
+    return CrossfilterIndex.from_database(loaded, chunk_size=500)
+
+@pytest.mark.parametrize('chart', [chart for chart, spec in CHART_QUERIES.items() if spec['source'] == 'implementations'])
+@pytest.mark.parametrize('period_start, filters', CASES)
+def test_chart_matches_sql(loaded, index, chart, period_start, filters):
+    query, params = chart_query(chart, period_start, filters)
+    expected = SQLiteBackend(loaded).read(query, params)
+    
+    actual = index.chart(chart, period_start, filters)
+    
+    pd.testing.assert_frame_equal(actual, expected, check_dtype=False, check_categorical=False)
+
+def sql_monthly_kpi(database, period_start, filters):
+    """Показатели внедрений по месяцам запросом к implementations"""
+    filters = dict(filters, status=[status for status in filters.get('status', COUNTED_STATUSES)
+                                    if status in COUNTED_STATUSES])
+    conditions = ['date_go_live >= ?'] + [f'{column} IN ({", ".join("?" * len(values))})'
+                                          for column, values in filters.items()]
+    params = [f'{period_start}-01'] + [value for values in filters.values() for value in values]
+    with database.reader() as conn:
+        return pd.read_sql_query(f'''
+            SELECT substr(date_go_live, 1, 7) AS month, COUNT(*) AS impl_count,
+                   SUM(is_domestic) AS domestic_impl_count,
+                   SUM(revenue_uplift + opex_delta) AS total_econ_effect
+            FROM implementations WHERE {" AND ".join(conditions)}
+            GROUP BY 1 ORDER BY 1
+        ''', conn, params=params)
+
+@pytest.mark.parametrize('period_start, filters', CASES)
+def test_monthly_kpi_matches_sql(loaded, index, period_start, filters):
+    expected = sql_monthly_kpi(loaded, period_start, filters)
+    
+    actual = index.monthly_kpi(period_start, filters)
+    
+    assert pd.to_datetime(actual['date_month']).dt.strftime('%Y-%m').tolist() == expected['month'].tolist()
+    for column in ['impl_count', 'domestic_impl_count', 'total_econ_effect']:
+        np.testing.assert_array_equal(actual[column].to_numpy(dtype=float), expected[column].to_numpy(dtype=float))
+
+def test_monthly_kpi_without_filters_matches_kpi_monthly(loaded, index):
+    with loaded.reader() as conn:
+        expected = pd.read_sql_query(
+            "SELECT * FROM kpi_monthly WHERE date_month >= '2023-01-01' ORDER BY date_month", conn
+        )
+    
+    actual = index.monthly_kpi('2023-01')
+    
+    assert pd.to_datetime(actual['date_month']).dt.strftime('%Y-%m-%d').tolist() == expected['date_month'].tolist()
+    for column in ['impl_count', 'domestic_impl_count', 'domestic_share_pct', 'total_econ_effect']:
+        np.testing.assert_allclose(actual[column].to_numpy(dtype=float), expected[column].to_numpy(dtype=float))
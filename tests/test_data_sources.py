@@ -0,0 +1,93 @@
+"""
+Сбор данных из источников: статусы источников и водяные метки
+"""
+
+import pytest
+
+from data_sources import DataAggregator, FedstatConnector, get_watermarks, save_watermarks
+
+def failing(*args, **kwargs):
+    raise ConnectionError('источник недоступен')
+
+@pytest.fixture
+def aggregator():
+    """Агрегатор, все источники которого недоступны"""
+    aggregator = DataAggregator()
+    aggregator.reestr.iter_scm_solutions = failing
+    aggregator.eis.iter_scm_procurements = failing
+    aggregator.fedstat.iter_it_indicators = failing
+    aggregator.gisp.iter_support_measures = failing
+    return aggregator
+
+@pytest.mark.parametrize('concurrent', [True, False])
+def test_failing_sources_reported_as_errors(aggregator, concurrent):
+    all_data = aggregator.collect_all_data(concurrent=concurrent)
+    
+    assert {key: status['status'] for key, status in all_data['status'].items()} == {
+        'solutions': 'error', 'procurements': 'error', 'indicators': 'error', 'support_measures': 'error'
+    }
+    assert all_data['status']['solutions']['error'] == 'источник недоступен'
+
+class FedstatResponse:
+    def __init__(self, data):
+        self.data = data
+    
+    def raise_for_status(self):
+        pass
+    
+    def json(self):
+        return {'data': self.data}
+
+class FedstatSession:
+    """Ответы Федстат по показателю; показатели без ответа - ошибка запроса"""
+    
+    def __init__(self, responses):
+        self.responses = responses
+    
+    def get(self, url, params=None, timeout=None):
+        indicator = url.rsplit('/', 1)[-1]
+        if indicator not in self.responses:
+            raise ConnectionError('показатель недоступен')
+        return FedstatResponse(self.responses[indicator])
+
+INVESTMENT = [
+    {'year': 2023, 'value': 1.0, 'unit': 'млрд ₽', 'region': 'Москва'},
+    {'year': 2021, 'value': 2.0, 'unit': 'млрд ₽', 'region': 'Москва'},
+    {'year': 2023, 'value': 3.0, 'unit': 'млрд ₽'},
+    {'year': 2024, 'value': 4.0, 'unit': 'млрд ₽'},
+    {'year': 2010, 'value': 5.0, 'unit': 'млрд ₽', 'region': 'Казань'}
+]
+
+def test_indicator_watermark_applies_per_region():
+    connector = FedstatConnector(indicators=['IT_INVESTMENT'])
+    connector.session = FedstatSession({'IT_INVESTMENT': INVESTMENT})
+    since = {'IT_INVESTMENT|Москва': '2022', 'IT_INVESTMENT|Российская Федерация': '2024'}
+    
+    records = connector.iter_it_indicators(since=since)
+    
+    # Отстающий регион (Москва) получает значение за 2023 год, регион без метки - все значения
+    assert sorted((record['region'], record['year']) for record in records) == [
+        ('Казань', 2010), ('Москва', 2023), ('Российская Федерация', 2024)
+    ]
+
+def test_indicator_watermarks_saved_per_region(database):
+    aggregator = DataAggregator()
+    aggregator.reestr.iter_scm_solutions = lambda since=None: iter(())
+    aggregator.eis.iter_scm_procurements = lambda since=None: iter(())
+    aggregator.gisp.iter_support_measures = lambda: iter(())
+    aggregator.fedstat = FedstatConnector(indicators=['IT_INVESTMENT', 'IT_EMPLOYMENT'])
+    aggregator.fedstat.session = FedstatSession({'IT_INVESTMENT': INVESTMENT})
+    with database.writer() as conn:
+        save_watermarks(conn, 'fedstat', {'IT_EMPLOYMENT|Москва': '2020'})
+        
+        status = aggregator.stream_to_database(conn)
+        
+        assert status['indicators']['status'] == 'ok'
+        assert aggregator.fedstat.incomplete_indicators == {'IT_EMPLOYMENT'}
+        # Метки полученных пар сдвигаются, метка недоступного показателя остается прежней
+        assert get_watermarks(conn, 'fedstat') == {
+            'IT_INVESTMENT|Москва': '2023',
+            'IT_INVESTMENT|Российская Федерация': '2024',
+            'IT_INVESTMENT|Казань': '2010',
+            'IT_EMPLOYMENT|Москва': '2020'
+        }
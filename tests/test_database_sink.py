@@ -0,0 +1,60 @@
+"""
+Пакетная запись записей источников: дедупликация и идемпотентный upsert
+"""
+
+import pytest
+
+from data_sources import DatabaseSink, create_real_data_tables, save_records
+
+def procurement(number, price=100000.0, keyword='WMS'):
+    return {
+        'title': f'Поставка WMS для учреждения {number}',
+        'url': f'https://zakupki.gov.ru/epz/order/notice/view.html?regNumber={number:019d}',
+        'customer': f'ГБУ "Учреждение {number}"',
+        'price': price,
+        'publication_date': '15.03.2024',
+        'keyword': keyword,
+        'source': 'eis'
+    }
+
+@pytest.fixture
+def conn(database):
+    with database.writer() as conn:
+        create_real_data_tables(conn)
+        yield conn
+
+def count(conn):
+    return conn.execute('SELECT COUNT(*) FROM real_procurements').fetchone()[0]
+
+def test_repeats_across_batches_are_upserted(conn):
+    # Закупка 1 найдена по трем ключевым словам: в той же пачке и в следующих
+    records = [procurement(1), procurement(1, keyword='TMS'), procurement(2),
+               procurement(3), procurement(1, price=150000.0, keyword='склад'), procurement(4)]
+    
+    with DatabaseSink(conn, batch_size=2, track_watermarks=False) as sink:
+        for record in records:
+            sink.add('procurements', record)
+            # Ключи для дедупликации хранятся только для текущего буфера
+            assert len(sink.seen['procurements']) <= sink.batch_size
+    
+    assert count(conn) == 4
+    assert conn.execute('SELECT price FROM real_procurements WHERE title LIKE ?', ('%учреждения 1',)).fetchone()[0] == 150000.0
+    assert sink.stats['procurements'] == {'inserted': 4, 'updated': 1, 'rejected': 0, 'duplicates': 1}
+
+def test_repeated_load_is_idempotent(conn):
+    data = {'procurements': [procurement(number) for number in range(10)]}
+    
+    first = save_records(conn, data, batch_size=3)
+    second = save_records(conn, data, batch_size=3)
+    
+    assert count(conn) == 10
+    assert first['procurements']['inserted'] == 10
+    assert second['procurements'] == {'inserted': 0, 'updated': 10, 'rejected': 0, 'duplicates': 0}
+
+def test_records_without_key_are_rejected(conn):
+    records = [procurement(1), dict(procurement(2), url=''), {'title': 'без полей'}]
+    
+    stats = save_records(conn, {'procurements': records})
+    
+    assert count(conn) == 1
+    assert stats['procurements']['rejected'] == 2
@@ -0,0 +1,67 @@
+"""
+Инкрементальный пересчет kpi_monthly: месяцы, отмеченные триггерами, против полного пересчета
+"""
+
+import numpy as np
+import pandas as pd
+
+from kpi_engine import KPI_COLUMNS, compute_kpi_monthly, refresh_kpi_monthly
+from synthetic_data import load_synthetic_data
+
+def full_recompute(conn):
+    months = [month for month, in conn.execute(
+        'SELECT DISTINCT substr(date_go_live, 1, 7) FROM implementations WHERE date_go_live IS NOT NULL'
+    )]
+    return compute_kpi_monthly(conn, months)
+
+def assert_kpi_matches_full_recompute(conn):
+    actual = pd.read_sql_query(f'SELECT {", ".join(KPI_COLUMNS)} FROM kpi_monthly ORDER BY date_month', conn)
+    expected = full_recompute(conn)
+    assert actual['date_month'].tolist() == expected['date_month'].tolist()
+    for column in KPI_COLUMNS[1:]:
+        np.testing.assert_allclose(
+            actual[column].to_numpy(dtype=float), expected[column].to_numpy(dtype=float), err_msg=column
+        )
+
+def test_loaded_kpi_matches_full_recompute(loaded):
+    with loaded.reader() as conn:
+        assert conn.execute('SELECT COUNT(*) FROM kpi_dirty_months').fetchone()[0] == 0
+        assert_kpi_matches_full_recompute(conn)
+
+def test_changes_recompute_only_dirty_months(loaded):
+    with loaded.writer() as conn:
+        # Дозагрузка меньше имеющихся данных идет через триггеры, без массового режима
+        load_synthetic_data(conn, n_implementations=100, n_support=20, seed=7, as_of='2025-01-01')
+        
+        # Перенос внедрения в другой месяц отмечает и прежний, и новый месяц
+        conn.execute('''
+            UPDATE implementations SET date_go_live = '2019-06-15', status = 'go-live'
+            WHERE impl_id = (SELECT MIN(impl_id) FROM implementations WHERE date_go_live >= '2024-01-01')
+        ''')
+        conn.execute("UPDATE implementations SET status = 'planned' WHERE impl_id % 17 = 0")
+        conn.execute('DELETE FROM implementations WHERE impl_id % 23 = 0')
+        conn.execute('UPDATE support_measures SET amount_rub = amount_rub * 2 WHERE support_id % 5 = 0')
+        # Вендор в реестре отечественного ПО меняет KPI всех месяцев его внедрений
+        vendor = conn.execute('SELECT vendor_name FROM implementations LIMIT 1').fetchone()[0]
+        conn.execute("INSERT INTO real_solutions (name, vendor, is_domestic) VALUES ('WMS', ?, 1)", (vendor,))
+        
+        dirty = conn.execute('SELECT COUNT(*) FROM kpi_dirty_months').fetchone()[0]
+        assert dirty
+        assert refresh_kpi_monthly(conn) == dirty
+        conn.commit()
+        assert conn.execute('SELECT COUNT(*) FROM kpi_dirty_months').fetchone()[0] == 0
+        assert_kpi_matches_full_recompute(conn)
+
+def test_month_without_counted_implementations_is_removed(loaded):
+    with loaded.writer() as conn:
+        month = conn.execute('SELECT substr(MIN(date_month), 1, 7) FROM kpi_monthly').fetchone()[0]
+        conn.execute(
+            "DELETE FROM implementations WHERE date_go_live >= ? AND date_go_live < ?",
+            (f'{month}-01', f'{np.datetime64(month, "M") + 1}-01')
+        )
+        refresh_kpi_monthly(conn)
+        conn.commit()
+        assert conn.execute(
+            'SELECT COUNT(*) FROM kpi_monthly WHERE substr(date_month, 1, 7) = ?', (month,)
+        ).fetchone()[0] == 0
+        assert_kpi_matches_full_recompute(conn)
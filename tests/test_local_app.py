@@ -0,0 +1,37 @@
+"""
+Ключи кэша дашборда: период входит в них первым месяцем окна
+"""
+
+from datetime import datetime
+
+import pytest
+
+import local_app
+
+def frozen_now(moment):
+    class FrozenDatetime(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return moment
+    return FrozenDatetime
+
+def test_figure_state_follows_month_rollover(monkeypatch):
+    state = {'period_months': 12, 'filters': {'region_name': ['Москва']}}
+    
+    monkeypatch.setattr(local_app, 'datetime', frozen_now(datetime(2025, 1, 31)))
+    before = local_app.figure_state(state)
+    monkeypatch.setattr(local_app, 'datetime', frozen_now(datetime(2025, 3, 10)))
+    after = local_app.figure_state(state)
+    
+    assert before == {'period_start': '2024-02', 'filters': {'region_name': ['Москва']}}
+    assert after['period_start'] == '2024-03'
+    assert state == {'period_months': 12, 'filters': {'region_name': ['Москва']}}
+
+@pytest.mark.parametrize('period_start, first_month', [('2024-03', '2024-03-31'), ('2024-12', '2024-12-31')])
+def test_kpi_data_starts_at_period_month(loaded, period_start, first_month):
+    storage = local_app.create_storage(loaded, 'sqlite')
+    
+    # Без кэша запросов: его ключ - версия данных базы приложения
+    kpi_data = local_app.get_kpi_data.__wrapped__(storage, period_start)
+    
+    assert str(kpi_data['date_month'].min())[:10] == first_month
@@ -0,0 +1,17 @@
+"""
+Планы запросов дашборда: каждый запрос использует индексы
+(то же, что python database.py, но в составе тестов)
+
+Запуск: python -m pytest tests
+"""
+
+from database import check_query_plans
+from queries import dashboard_queries
+
+def test_dashboard_queries_use_indexes(loaded):
+    with loaded.reader() as conn:
+        report = check_query_plans(conn, dashboard_queries())
+    
+    assert report
+    problems = {name: problems for name, (_, problems) in report.items() if problems}
+    assert not problems
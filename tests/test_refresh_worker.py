@@ -0,0 +1,35 @@
+"""
+Фоновое обновление: прогрев кэшей видит данные завершенной загрузки
+"""
+
+import time
+
+import refresh_worker
+from refresh_worker import RefreshWorker
+
+class EmptyAggregator:
+    """Загрузка без новых записей: архивировать нечего, коммита архивации нет"""
+    
+    def stream_to_database(self, conn, progress=None):
+        return {'solutions': {'status': 'empty', 'records': 0}}
+
+def wait_for_job(worker, job_id, timeout=10):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = worker.get_job(job_id)
+        if job['status'] not in refresh_worker.ACTIVE_STATUSES:
+            return job
+        time.sleep(0.05)
+    raise TimeoutError(f'Задание #{job_id} не завершилось')
+
+def test_on_refresh_sees_committed_version(database, monkeypatch):
+    monkeypatch.setattr(refresh_worker, 'DataAggregator', EmptyAggregator)
+    seen = []
+    worker = RefreshWorker(database, on_refresh=lambda: seen.append(database.data_version()))
+    before = database.data_version()
+    
+    job = wait_for_job(worker, worker.request_refresh())
+    
+    assert job['status'] == 'done'
+    assert seen == [before + 1]
+    assert database.data_version() == before + 1
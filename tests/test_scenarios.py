@@ -0,0 +1,69 @@
+"""
+Сценарии бюджета поддержки: оптимизатор соблюдает бюджет и не хуже сетки, сетка ограничена по размеру
+"""
+
+from math import comb
+
+import numpy as np
+import pytest
+
+from scenarios import GRID_MAX_ROWS, ScenarioModel, grid_search, grid_steps
+
+@pytest.fixture
+def model():
+    return ScenarioModel(
+        programs=['Гранты', 'Льготные кредиты', 'Субсидии', 'Инновационные проекты'],
+        baseline=[400e6, 250e6, 150e6, 80e6],
+        funded=[40, 20, 30, 4],
+        effect_per_impl=[15e6, 30e6, 6e6, 50e6],
+        impl_total=500
+    )
+
+@pytest.mark.parametrize('objective', ['econ_effect', 'implementations'])
+def test_optimize_spends_exactly_the_budget(model, objective):
+    budgets = np.array([0, 1e6, model.baseline_budget, 5 * model.baseline_budget])
+    allocations = model.optimize(budgets, objective)
+    
+    assert allocations.shape == (len(budgets), len(model.programs))
+    assert (allocations >= 0).all()
+    np.testing.assert_allclose(allocations.sum(axis=-1), budgets, rtol=1e-9)
+    np.testing.assert_allclose(model.optimize(budgets[2], objective), allocations[2])
+
+@pytest.mark.parametrize('objective', ['econ_effect', 'implementations'])
+@pytest.mark.parametrize('share', [0.5, 1.0, 2.0])
+def test_optimize_is_not_worse_than_grid(model, objective, share):
+    budget = share * model.baseline_budget
+    best, allocations, results = grid_search(model, budget, steps=40, objective=objective)
+    optimum = model.evaluate(model.optimize(budget, objective))
+    
+    np.testing.assert_allclose(allocations.sum(axis=-1), budget)
+    assert optimum[objective] >= results[objective].max() * (1 - 1e-9)
+    assert optimum['budget'] == pytest.approx(budget)
+
+def test_grid_is_capped_by_max_rows():
+    programs = 8
+    steps = grid_steps(programs, 40)
+    assert steps < 40
+    assert comb(steps + programs - 1, programs - 1) <= GRID_MAX_ROWS
+    assert comb(steps + programs, programs - 1) > GRID_MAX_ROWS
+    assert grid_steps(4, 40) == 40
+    
+    model = ScenarioModel([f'Программа {i}' for i in range(programs)], [1e6] * programs, [10] * programs,
+                          [1e6] * programs, 100)
+    best, allocations, results = grid_search(model, 8e6, steps=40, max_rows=1000)
+    assert len(allocations) <= 1000
+    np.testing.assert_allclose(best.sum(), 8e6)
+
+def test_unknown_objective(model):
+    with pytest.raises(ValueError):
+        model.optimize(1e6, 'roi_pct')
+    with pytest.raises(ValueError):
+        grid_search(model, 1e6, objective='roi_pct')
+
+def test_model_from_database(loaded):
+    model = ScenarioModel.from_database(loaded)
+    assert model.programs
+    # При базовом бюджете каждая программа финансирует базовое число внедрений
+    np.testing.assert_allclose(model.implementations(model.baseline), model.funded)
+    assert model.evaluate(model.optimize(model.baseline_budget))['econ_effect'] >= \
+        model.evaluate(model.baseline)['econ_effect'] * (1 - 1e-9)
@@ -0,0 +1,27 @@
+"""
+Хранилища дашборда: DuckDB поверх Parquet отдает то же, что SQLite
+"""
+
+import pandas as pd
+import pytest
+
+from queries import dashboard_queries
+from storage import SQLiteBackend, DuckDBBackend
+
+pytest.importorskip('duckdb')
+
+@pytest.fixture
+def backends(loaded, tmp_path):
+    duckdb_backend = DuckDBBackend(loaded, parquet_dir=str(tmp_path / 'parquet'))
+    yield SQLiteBackend(loaded), duckdb_backend
+    duckdb_backend.close()
+
+@pytest.mark.parametrize('name', list(dashboard_queries()))
+def test_duckdb_matches_sqlite(backends, name):
+    query, params = dashboard_queries()[name]
+    sqlite_backend, duckdb_backend = backends
+    
+    expected = sqlite_backend.read(query, params)
+    actual = duckdb_backend.read(query, params)
+    
+    pd.testing.assert_frame_equal(actual, expected, check_dtype=False, check_categorical=False)